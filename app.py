@@ -1,33 +1,179 @@
+import argparse
 import asyncio
+from datetime import date
+
 from libs.http_client import HTTPXClient
+from libs.bulk_ingest import ingest_partitions
 from libs.db import PostgresConnector
+from libs.fda_fetcher import FDAFetcher
+from libs.ingest import DeviceEventLoader
+from libs.logger import logger
+from libs.rate_limit import AsyncTokenBucket
+from libs.sync import SyncWorker
 
+from app.core.config import settings
 from config.config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
 
 
-async def main():
-    await fetch_data()
-    await connect_to_db()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sync openFDA device events into the local database"
+    )
+    parser.add_argument(
+        "--product-code",
+        action="append",
+        dest="product_codes",
+        help="Product code to sync (repeatable, default: SYNC_PRODUCT_CODES)",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser(
+        "sync", help="Incremental sync since the stored high-water mark (default)"
+    )
+
+    backfill = subparsers.add_parser(
+        "backfill", help="Load an arbitrary date range with resumable checkpoints"
+    )
+    backfill.add_argument("--start", type=date.fromisoformat, required=True)
+    backfill.add_argument("--end", type=date.fromisoformat, default=date.today())
+    backfill.add_argument(
+        "--job",
+        help="Checkpoint name; re-running with the same name resumes the job",
+    )
+
+    bulk = subparsers.add_parser(
+        "bulk-ingest",
+        help="Ingest openFDA bulk download partitions (device-event-*.json.zip)",
+    )
+    bulk.add_argument("paths", nargs="+", help="Partition files to ingest")
+    bulk.add_argument("--output", choices=["csv", "db"], default="db")
+    bulk.add_argument("--output-dir", default="exports", help="Folder for CSV output")
+    bulk.add_argument(
+        "--workers", type=int, help="Worker processes (default: CPU count)"
+    )
+
+    rollups = subparsers.add_parser(
+        "rebuild-rollups",
+        help="Recompute the daily aggregate rollups from the stored events",
+    )
+    rollups.add_argument("--start", type=date.fromisoformat)
+    rollups.add_argument("--end", type=date.fromisoformat)
+
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    product_codes = args.product_codes or settings.SYNC_PRODUCT_CODES
+
+    if args.command == "bulk-ingest":
+        await bulk_ingest(args, product_codes)
+        return
+
+    if args.command == "rebuild-rollups":
+        await rebuild_rollups(args)
+        return
+
+    db_connector = connect_to_db()
+    if db_connector is None:
+        raise SystemExit(1)
+
+    try:
+        async with HTTPXClient(
+            rate_limiter=AsyncTokenBucket.per_minute(
+                settings.FDA_RATE_LIMIT_PER_MINUTE, settings.FDA_RATE_LIMIT_BURST
+            )
+        ) as http_client:
+            worker = create_worker(http_client, db_connector)
+            worker.ensure_schema()
+
+            for product_code in product_codes:
+                if args.command == "backfill":
+                    await worker.backfill(
+                        product_code, args.start, args.end, job_name=args.job
+                    )
+                else:
+                    await worker.sync(product_code)
+    finally:
+        db_connector.close()
+
+
+async def bulk_ingest(args, product_codes):
+    if args.output == "db":
+        # Make sure the tables exist before the workers start loading
+        db_connector = connect_to_db()
+        if db_connector is None:
+            raise SystemExit(1)
+        DeviceEventLoader(db_connector).ensure_schema()
+        db_connector.close()
+
+    summaries = await asyncio.to_thread(
+        ingest_partitions,
+        args.paths,
+        product_codes,
+        args.output,
+        output_dir=args.output_dir,
+        db_config=get_db_config(),
+        workers=args.workers,
+        batch_size=settings.SYNC_BATCH_SIZE,
+    )
+    failed = [summary for summary in summaries if "error" in summary]
+    emitted = sum(summary.get("emitted", 0) for summary in summaries)
+    logger.info(
+        f"Bulk ingest done: {emitted} records from {len(summaries)} partitions, "
+        f"{len(failed)} failed"
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+async def rebuild_rollups(args):
+    db_connector = connect_to_db()
+    if db_connector is None:
+        raise SystemExit(1)
+    try:
+        loader = DeviceEventLoader(db_connector)
+        loader.ensure_schema()
+        await asyncio.to_thread(loader.rebuild_rollups, args.start, args.end)
+    finally:
+        db_connector.close()
 
 
-async def connect_to_db():
-    db_config = {
+def get_db_config():
+    return {
         "host": DB_HOST,
         "port": DB_PORT,
         "database": DB_NAME,
         "user": DB_USER,
         "password": DB_PASSWORD,
     }
-    db_connector = PostgresConnector(db_config)
-    db_connector.connect()
 
 
-async def fetch_data():
-    http_client = HTTPXClient()
-    response = await http_client.async_get(
-        "https://api.fda.gov/device/event.json?limit=1&search=device.device_report_product_code:FKX+AND+date_received:[2024-07-01+TO+2024-07-31]"
+def connect_to_db():
+    db_connector = PostgresConnector(get_db_config())
+    if not db_connector.connect():
+        logger.error("Sync aborted: could not connect to the database")
+        return None
+    return db_connector
+
+
+def create_worker(
+    http_client: HTTPXClient, db_connector: PostgresConnector
+) -> SyncWorker:
+    fetcher = FDAFetcher(
+        http_client,
+        settings.FDA_BASE_URL,
+        page_size=settings.FDA_PAGE_SIZE,
+        max_concurrency=settings.FDA_MAX_CONCURRENCY,
+    )
+    loader = DeviceEventLoader(db_connector, batch_size=settings.SYNC_BATCH_SIZE)
+    return SyncWorker(
+        fetcher,
+        loader,
+        window_days=settings.SYNC_WINDOW_DAYS,
+        concurrency=settings.SYNC_CONCURRENCY,
+        initial_start=settings.SYNC_INITIAL_START,
     )
-    print(type(response))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""
+Shared dependencies injected into the API endpoints.
+"""
+
+import re
+from concurrent.futures import Executor
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Query, Request
+
+from app.core.config import settings
+from libs.cache import TieredCache
+from libs.event_store import DeviceEventStore
+from libs.export_jobs import ExportJobManager
+from libs.fda_fetcher import FDAFetcher
+from libs.http_client import HTTPXClient
+from libs.rate_limit import ConcurrencyLimiter
+from libs.search_index import SearchIndex
+
+# openFDA device product codes: three letters
+PRODUCT_CODE_PATTERN = re.compile(r"^[A-Z]{3}$")
+
+
+def get_product_codes(
+    product_codes: List[str] = Query(
+        default=settings.DEFAULT_PRODUCT_CODES,
+        alias="productCode",
+        description="Device product codes, repeated or comma-separated",
+    ),
+) -> List[str]:
+    """Return the requested product codes, validated, deduplicated and sorted"""
+    codes = set()
+    for value in product_codes:
+        for code in value.split(","):
+            code = code.strip().upper()
+            if not code:
+                continue
+            if not PRODUCT_CODE_PATTERN.match(code):
+                raise HTTPException(
+                    status_code=422, detail=f"Invalid product code: {code}"
+                )
+            codes.add(code)
+    if not codes:
+        raise HTTPException(status_code=422, detail="No product code given")
+    if len(codes) > settings.MAX_PRODUCT_CODES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.MAX_PRODUCT_CODES} product codes per request",
+        )
+    return sorted(codes)
+
+
+def get_http_client(request: Request) -> HTTPXClient:
+    """Return the application-wide HTTP client created in the lifespan hook"""
+    return request.app.state.http_client
+
+
+def get_cache(request: Request) -> Optional[TieredCache]:
+    """Return the application-wide response cache, if enabled"""
+    return request.app.state.cache
+
+
+def get_search_index(request: Request) -> Optional[SearchIndex]:
+    """Return the embedded full-text search index, if enabled"""
+    return request.app.state.search_index
+
+
+def get_fda_fetcher(
+    request: Request,
+    http_client: HTTPXClient = Depends(get_http_client),
+    cache: Optional[TieredCache] = Depends(get_cache),
+    search_index: Optional[SearchIndex] = Depends(get_search_index),
+) -> FDAFetcher:
+    """
+    Return an openFDA fetcher backed by the shared HTTP client and cache.
+
+    Fetchers are cheap and built per request, but share the application's
+    semaphore so FDA_MAX_CONCURRENCY caps upstream requests across all of them.
+    """
+    return FDAFetcher(
+        http_client,
+        settings.FDA_BASE_URL,
+        page_size=settings.FDA_PAGE_SIZE,
+        max_concurrency=settings.FDA_MAX_CONCURRENCY,
+        cache=cache,
+        recent_days=settings.CACHE_RECENT_DAYS,
+        recent_ttl=settings.CACHE_RECENT_TTL,
+        historical_ttl=settings.CACHE_HISTORICAL_TTL,
+        prefetch_pages=settings.FDA_PREFETCH_PAGES,
+        search_index=search_index,
+        semaphore=request.app.state.fda_semaphore,
+    )
+
+
+def get_event_store(request: Request) -> Optional[DeviceEventStore]:
+    """Return a reader for the local database mirror, if the pool is enabled"""
+    pool = request.app.state.db_pool
+    if pool is None:
+        return None
+    return DeviceEventStore(pool, prefetch=settings.DB_CURSOR_PREFETCH)
+
+
+def get_export_executor(request: Request) -> Optional[Executor]:
+    """Return the CSV conversion worker pool, or None to convert inline"""
+    return request.app.state.export_executor
+
+
+def get_export_slots(request: Request) -> ConcurrencyLimiter:
+    """Return the limiter capping simultaneous exports"""
+    return request.app.state.export_slots
+
+
+def get_export_jobs(request: Request) -> ExportJobManager:
+    """Return the background export job manager"""
+    return request.app.state.export_jobs
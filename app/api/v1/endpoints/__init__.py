@@ -2,6 +2,14 @@
 API v1 endpoints package containing all endpoint routers.
 """
 
+from .aggregates import router as aggregates_router
 from .downloads import router as downloads_router
+from .exports import router as exports_router
+from .search import router as search_router
 
-__all__ = ["downloads_router"]
+__all__ = [
+    "aggregates_router",
+    "downloads_router",
+    "exports_router",
+    "search_router",
+]
@@ -0,0 +1,98 @@
+from datetime import date
+from typing import Dict, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from libs.event_store import DeviceEventStore
+from libs.fda_fetcher import MAX_PAGE_SIZE, FDAFetcher
+from libs.http_client import HTTPError
+from app.api.deps import get_event_store, get_fda_fetcher, get_product_codes
+from app.api.v1.endpoints.downloads import (
+    require_event_store,
+    upstream_http_exception,
+)
+from app.core.config import settings
+
+router = APIRouter(prefix="/aggregates", tags=["aggregates"])
+
+# openFDA field counted for each dimension
+COUNT_FIELDS = {
+    "event_type": "event_type.exact",
+    "manufacturer": "device.manufacturer_d_name.exact",
+    "patient_problem": "patient.patient_problems.exact",
+    "month": "date_received",
+}
+
+
+@router.get("")
+async def get_aggregates(
+    start_date: date = Query(
+        ..., description="Start date (YYYY-MM-DD)", alias="startDate"
+    ),
+    end_date: date = Query(..., description="End date (YYYY-MM-DD)", alias="endDate"),
+    dimension: Literal["event_type", "manufacturer", "patient_problem", "month"] = (
+        Query(default="event_type", description="What to count events by")
+    ),
+    limit: int = Query(
+        default=100,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Number of values to return (all months are returned)",
+    ),
+    source: Literal["api", "db"] = Query(
+        default=settings.DOWNLOAD_SOURCE,
+        description="Count with openFDA (api) or the local mirror's rollups (db)",
+    ),
+    product_codes: List[str] = Depends(get_product_codes),
+    fetcher: FDAFetcher = Depends(get_fda_fetcher),
+    store: Optional[DeviceEventStore] = Depends(get_event_store),
+):
+    """
+    Count device events per event type, manufacturer, patient problem or
+    month.
+
+    From openFDA, counts come from `count=` queries, cached like record
+    queries (for as long as the date range is settled). From the local
+    mirror, they are summed from the daily rollup tables, which loads keep
+    up to date for the months they touch. Reports are counted once across
+    the product codes; a report with several patient problems counts
+    towards each of them.
+    """
+    if source == "db":
+        results = await require_event_store(store).count_by(
+            dimension, product_codes, start_date, end_date, limit
+        )
+    else:
+        try:
+            counts = await fetcher.fetch_counts(
+                product_codes,
+                start_date,
+                end_date,
+                COUNT_FIELDS[dimension],
+                limit=None if dimension == "month" else limit,
+            )
+        except HTTPError as e:
+            raise upstream_http_exception(e)
+        if dimension == "month":
+            results = counts_per_month(counts)
+        else:
+            results = [{"term": c["term"], "count": c["count"]} for c in counts]
+
+    return {
+        "dimension": dimension,
+        "product_codes": product_codes,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "source": source,
+        "results": results,
+    }
+
+
+def counts_per_month(daily_counts: List[dict]) -> List[dict]:
+    """Sum openFDA's daily {"time": "YYYYMMDD", "count"} items per YYYY-MM"""
+    months: Dict[str, int] = {}
+    for item in daily_counts:
+        time = item["time"]
+        month = f"{time[0:4]}-{time[4:6]}"
+        months[month] = months.get(month, 0) + item["count"]
+    return [{"term": month, "count": months[month]} for month in sorted(months)]
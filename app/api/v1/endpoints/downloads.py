@@ -1,79 +1,434 @@
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import StreamingResponse
-from datetime import date
-import io
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from concurrent.futures import Executor
+from datetime import date, datetime, timezone
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 import json
-import csv
 
-from libs.http_client import HTTPXClient
+import orjson
+
+from libs.cache import TieredCache
+from libs.columnar import MEDIA_TYPES as COLUMNAR_MEDIA_TYPES
+from libs.columnar import columnar_available, iter_columnar
+from libs.compression import aiter_gzip
+from libs.conditional import http_date, is_not_modified, make_etag
+from libs.event_store import DeviceEventStore
+from libs.fda_fetcher import MAX_PAGE_SIZE, FDAFetcher
+from libs.fda_records import extract_row, parse_field_paths, project_record
+from libs.csv_export import aprepend, iter_csv, iter_csv_rows
+from libs.http_client import HTTPError, iter_body
+from libs.metrics import observe_export, stage_timer, track_export
+from libs.rate_limit import ConcurrencyLimiter
+from app.api.deps import (
+    get_cache,
+    get_event_store,
+    get_export_executor,
+    get_export_slots,
+    get_fda_fetcher,
+    get_product_codes,
+)
 from app.core.config import settings
 
 router = APIRouter(prefix="/downloads", tags=["downloads"])
 
+# Export formats: file extension and media type
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", COLUMNAR_MEDIA_TYPES["parquet"]),
+    "arrow": ("arrows", COLUMNAR_MEDIA_TYPES["arrow"]),
+}
+
+
+class ExportParams:
+    def __init__(
+        self,
+        request: Request,
+        start_date: date = Query(
+            ..., description="Start date (YYYY-MM-DD)", alias="startDate"
+        ),
+        end_date: date = Query(
+            ..., description="End date (YYYY-MM-DD)", alias="endDate"
+        ),
+        limit: int = Query(
+            default=100,
+            ge=1,
+            le=settings.FDA_MAX_RECORDS,
+            description="Number of records to fetch",
+        ),
+        source: Literal["api", "db"] = Query(
+            default=settings.DOWNLOAD_SOURCE,
+            description="Serve from openFDA (api) or the local mirror (db)",
+        ),
+        since: Optional[datetime] = Query(
+            default=None,
+            description=(
+                "Only reports added or changed since the last sync "
+                "(ISO date or timestamp)"
+            ),
+        ),
+        product_codes: List[str] = Depends(get_product_codes),
+        fetcher: FDAFetcher = Depends(get_fda_fetcher),
+        store: Optional[DeviceEventStore] = Depends(get_event_store),
+        executor: Optional[Executor] = Depends(get_export_executor),
+        export_slots: ConcurrencyLimiter = Depends(get_export_slots),
+    ):
+        """
+        Query parameters and dependencies shared by the file downloads.
+
+        Args:
+            start_date: Start date for data filtering
+            end_date: End date for data filtering
+            limit: Maximum number of records to return (1-FDA_MAX_RECORDS)
+            source: Where to read the events from
+            since: Time of the client's last sync, for a delta export
+                (taken as UTC without a time zone)
+        """
+        self.request = request
+        self.start_date = start_date
+        self.end_date = end_date
+        self.limit = limit
+        self.source = source
+        self.since = as_utc(since)
+        self.product_codes = product_codes
+        self.fetcher = fetcher
+        self.store = store
+        self.executor = executor
+        self.export_slots = export_slots
+
 
 @router.get("/csv")
 async def download_csv(
-    start_date: date = Query(
-        ..., description="Start date (YYYY-MM-DD)", alias="startDate"
-    ),
-    end_date: date = Query(..., description="End date (YYYY-MM-DD)", alias="endDate"),
-    limit: int = Query(
-        default=100, ge=1, le=5000, description="Number of records to fetch"
+    compressed: bool = Query(
+        default=False, description="Download a gzip-compressed .csv.gz file"
     ),
+    params: ExportParams = Depends(),
 ):
     """
     Download FDA device event data as CSV file.
 
+    From openFDA, records are streamed page by page so exports are not
+    capped by the upstream page size, and converted to CSV on the export
+    worker pool as they arrive. From the local mirror, rows are streamed
+    through a server-side cursor straight into the response.
+
+    Clients sending Accept-Encoding get the CSV compressed on the fly by the
+    compression middleware; `compressed` returns a .csv.gz file instead.
+
+    Only MAX_CONCURRENT_EXPORTS exports run at once; the slot is held until
+    the whole file has been sent.
+
+    Responses carry an ETag and Last-Modified fingerprinting the data in the
+    range, so scheduled pulls can send If-None-Match/If-Modified-Since and
+    get a 304 when nothing changed (see EXPORT_VALIDATORS). With `since`,
+    only the reports added or changed after the client's last sync are
+    exported: from the local mirror, rows written after that time; from
+    openFDA, reports received or changed (date_changed) on or after that
+    day. A delta without changes is an empty file, not a 404.
+
     Args:
-        start_date: Start date for data filtering
-        end_date: End date for data filtering
-        limit: Maximum number of records to return (1-5000)
+        compressed: Whether to send a .csv.gz attachment
+        params: Date range, limit, source and `since` (see ExportParams)
 
     Returns:
         CSV file as downloadable response
     """
+    return await stream_export("csv.gz" if compressed else "csv", params)
+
+
+@router.get("/parquet")
+async def download_parquet(params: ExportParams = Depends()):
+    """
+    Download FDA device event data as a Parquet file.
+
+    Same columns as the CSV export, with dates as date32 and the number of
+    events as int32. Written in row groups of COLUMNAR_BATCH_ROWS rows.
+    Conditional requests and `since` work as for the CSV export.
+    """
+    return await stream_export("parquet", params)
+
+
+@router.get("/arrow")
+async def download_arrow(params: ExportParams = Depends()):
+    """
+    Download FDA device event data as an Arrow IPC stream.
+
+    Same typed columns as the Parquet export, in record batches of
+    COLUMNAR_BATCH_ROWS rows (read with pyarrow.ipc.open_stream).
+    Conditional requests and `since` work as for the CSV export.
+    """
+    return await stream_export("arrow", params)
+
+
+async def stream_export(fmt: str, params: ExportParams) -> Response:
+    """
+    Stream an export as an attachment, holding an export slot until sent.
+
+    Conditional requests whose validators still match get a 304 before a
+    slot is taken or anything is fetched.
+    """
+    extension, media_type = EXPORT_FORMATS[fmt]
+    filename = export_filename(params.start_date, params.end_date, extension)
+
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if settings.EXPORT_VALIDATORS:
+        etag, last_modified = await export_validators(fmt, params)
+        validators = {"ETag": etag}
+        if last_modified is not None:
+            validators["Last-Modified"] = http_date(last_modified)
+        if is_not_modified(
+            params.request.headers.get("if-none-match"),
+            params.request.headers.get("if-modified-since"),
+            etag,
+            last_modified,
+        ):
+            return Response(status_code=304, headers=validators)
+        headers.update(validators)
+
+    export_slots = params.export_slots
+    await acquire_export_slot(export_slots)
+    try:
+        chunks = await open_export(
+            fmt,
+            params.product_codes,
+            params.start_date,
+            params.end_date,
+            params.limit,
+            params.source,
+            params.fetcher,
+            params.store,
+            params.executor,
+            since=params.since,
+        )
+    except BaseException:
+        # No response was created that would release the slot
+        export_slots.release()
+        raise
+
+    return ExportStreamingResponse(
+        chunks, export_slots, media_type=media_type, headers=headers
+    )
 
-    # Format dates for FDA API (they expect YYYY-MM-DD format)
-    start_date_str = start_date.strftime("%Y-%m-%d")
-    end_date_str = end_date.strftime("%Y-%m-%d")
 
-    # Construct FDA API URL with query parameters
-    fda_url = (
-        f"{settings.FDA_BASE_URL}"
-        f"?limit={limit}"
-        f"&search=device.device_report_product_code:FKX+AND+date_received:[{start_date_str}+TO+{end_date_str}]"
+async def export_validators(
+    fmt: str, params: ExportParams
+) -> Tuple[str, Optional[datetime]]:
+    """
+    ETag and Last-Modified of an export, without producing it.
+
+    The ETag fingerprints the query together with the number of matching
+    reports and when they last changed: in the local mirror, the latest
+    updated_at in the range; on openFDA, the date the dataset was last
+    updated (one cached one-record request). Ranges without data fail with
+    404 here, before an export slot is taken, unless they are a `since`
+    delta.
+    """
+    since = params.since
+    if params.source == "db":
+        count, last_modified = await require_event_store(params.store).version(
+            params.product_codes, params.start_date, params.end_date, since
+        )
+        stamp = last_modified.isoformat() if last_modified else ""
+    else:
+        try:
+            count, stamp = await params.fetcher.fetch_version(
+                params.product_codes,
+                params.start_date,
+                params.end_date,
+                since.date() if since else None,
+            )
+        except HTTPError as e:
+            raise upstream_http_exception(e)
+        last_modified = parse_last_updated(stamp)
+
+    # A delta without changes is an empty export, not missing data
+    if not count and since is None:
+        raise HTTPException(
+            status_code=404, detail="No data found for the specified date range"
+        )
+    etag = make_etag(
+        settings.VERSION,
+        fmt,
+        params.source,
+        ",".join(params.product_codes),
+        params.start_date,
+        params.end_date,
+        params.limit,
+        since.isoformat() if since else "",
+        count,
+        stamp or "",
     )
+    return etag, last_modified
 
+
+def parse_last_updated(value: Optional[str]) -> Optional[datetime]:
+    """openFDA's meta.last_updated (YYYY-MM-DD) as a UTC timestamp"""
     try:
-        # Fetch data from FDA API
-        http_client = HTTPXClient()
-        response = await http_client.async_get(fda_url)
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps sent without a time zone are taken as UTC"""
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def export_filename(start_date: date, end_date: date, extension: str) -> str:
+    """Create filename with date range"""
+    return f"fda_raw_data_{start_date:%Y-%m-%d}_to_{end_date:%Y-%m-%d}.{extension}"
+
+
+async def open_export(
+    fmt: str,
+    product_codes: Sequence[str],
+    start_date: date,
+    end_date: date,
+    limit: int,
+    source: str,
+    fetcher: FDAFetcher,
+    store: Optional[DeviceEventStore],
+    executor: Optional[Executor] = None,
+    progress: Optional[Callable[[int], None]] = None,
+    since: Optional[datetime] = None,
+) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Start an export and return the chunks of the file.
 
-        # Parse JSON response
-        if isinstance(response, str):
-            data = json.loads(response)
-        else:
-            data = response
+    Missing data, a disabled source and upstream errors are raised here,
+    before the first chunk, so they can still be reported with a status.
+    A `since` delta without changes is not missing data: it gives a file
+    without records (a CSV header, or an empty Parquet/Arrow file).
 
-        # Check if response has results
-        if "results" not in data or not data["results"]:
+    Args:
+        fmt: One of EXPORT_FORMATS
+        product_codes: Device product codes to export
+        start_date: Start date for data filtering
+        end_date: End date for data filtering
+        limit: Maximum number of records to export
+        source: "api" (openFDA) or "db" (local mirror)
+        fetcher: openFDA fetcher
+        store: Local mirror reader, if enabled
+        executor: Worker pool for CSV conversion, or None for inline
+        progress: Called with the number of records read so far
+        since: Only export reports added or changed after this time
+
+    Returns:
+        Async iterator over the file contents
+    """
+    if fmt in COLUMNAR_MEDIA_TYPES and not columnar_available():
+        raise HTTPException(
+            status_code=501, detail="Columnar exports need pyarrow installed"
+        )
+
+    if source == "db":
+        store = require_event_store(store)
+        if since is None and not await store.has_events(
+            product_codes, start_date, end_date
+        ):
             raise HTTPException(
                 status_code=404, detail="No data found for the specified date range"
             )
+        # The database renders CSV-ready rows
+        items = store.iter_csv_rows(product_codes, start_date, end_date, limit, since)
+    else:
+        items = await fetch_record_stream(
+            fetcher,
+            product_codes,
+            start_date,
+            end_date,
+            limit,
+            since.date() if since else None,
+        )
+    exported = 0
+
+    def counted(records: int):
+        nonlocal exported
+        exported = records
+        if progress is not None:
+            progress(records)
+
+    items = count_items(items, counted)
+
+    if fmt in COLUMNAR_MEDIA_TYPES:
+        chunks = iter_columnar(
+            items,
+            fmt,
+            settings.COLUMNAR_BATCH_ROWS,
+            to_row=extract_row if source == "api" else None,
+        )
+        return track_export(chunks, fmt, lambda: exported)
+
+    if source == "db":
+        chunks = iter_csv_rows(items, settings.CSV_CHUNK_SIZE)
+    else:
+        # Stream CSV chunks to the client as the worker pool renders them
+        chunks = iter_csv(
+            items,
+            settings.CSV_CHUNK_SIZE,
+            executor=executor,
+            chunk_records=settings.EXPORT_CHUNK_RECORDS,
+        )
+    if fmt == "csv.gz":
+        chunks = aiter_gzip(chunks, settings.COMPRESSION_GZIP_LEVEL)
+    return track_export(chunks, fmt, lambda: exported)
+
+
+async def count_items(
+    items: AsyncIterable, progress: Callable[[int], None]
+) -> AsyncIterator:
+    """Pass items through, reporting how many have been read"""
+    count = 0
+    async for item in items:
+        count += 1
+        progress(count)
+        yield item
+
+
+async def fetch_record_stream(
+    fetcher: FDAFetcher,
+    product_codes: Sequence[str],
+    start_date: date,
+    end_date: date,
+    limit: int,
+    since: Optional[date] = None,
+) -> AsyncIterator[dict]:
+    """Start streaming the records from openFDA as they download"""
+    try:
+        # Wait for the first record only, so upstream errors and empty
+        # ranges are still reported with a proper status code
+        records = fetcher.iter_records_multi(
+            product_codes, start_date, end_date, limit, since
+        )
+        first = await anext(records, None)
 
-        # Convert JSON data to CSV
-        csv_content = await json_to_csv(data["results"])
-
-        # Create filename with date range
-        filename = f"fda_raw_data_{start_date_str}_to_{end_date_str}.csv"
+        # Check if response has results
+        if first is None:
+            if since is not None:
+                # A delta without changes is an empty export
+                return records
+            raise HTTPException(
+                status_code=404, detail="No data found for the specified date range"
+            )
 
-        # Return CSV as downloadable file
-        return StreamingResponse(
-            io.StringIO(csv_content),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        return aprepend(first, records)
 
+    except HTTPException:
+        raise
+    except HTTPError as e:
+        raise upstream_http_exception(e)
     except json.JSONDecodeError:
         raise HTTPException(
             status_code=500, detail="Invalid JSON response from FDA API"
@@ -84,184 +439,86 @@ async def download_csv(
         )
 
 
-async def json_to_csv(json_data: list) -> str:
-    """
-    Convert JSON data to CSV format with specific fields only.
+class ExportStreamingResponse(StreamingResponse):
+    def __init__(self, content, export_slots: ConcurrencyLimiter, **kwargs):
+        """Streaming response that gives its export slot back once sent"""
+        super().__init__(content, **kwargs)
+        self.export_slots = export_slots
 
-    Args:
-        json_data: List of dictionaries containing FDA device event data
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.export_slots.release()
 
-    Returns:
-        CSV content as string
+
+async def acquire_export_slot(export_slots: ConcurrencyLimiter):
+    """Wait for a free export slot, failing with 503 when none frees up in time"""
+    if not await export_slots.acquire(settings.EXPORT_QUEUE_TIMEOUT):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exports in progress, please retry later",
+            headers={"Retry-After": str(max(1, int(settings.EXPORT_QUEUE_TIMEOUT)))},
+        )
+
+
+def upstream_http_exception(error: HTTPError) -> HTTPException:
     """
-    if not json_data:
-        return ""
+    Map an upstream error that survived all retries to an HTTP response.
 
-    # Create CSV in memory
-    output = io.StringIO()
-
-    # Extract specific fields from each record
-    extracted_data = []
-    for item in json_data:
-        extracted_item = extract_specific_fields(item)
-        extracted_data.append(extracted_item)
-
-    if extracted_data:
-        # Define the exact field order we want
-        fieldnames = [
-            "Web Address",
-            "Report Number",
-            "Event Date",
-            "Event Type",
-            "Manufacturer",
-            "Date Received",
-            "Product Code",
-            "Brand Name",
-            "Device Problem",
-            "Patient Problem",
-            "PMA/PMN Number",
-            "Exemption Number",
-            "Number of Events",
-            "Event Text",
-        ]
-
-        # Write CSV
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(extracted_data)
-
-    csv_content = output.getvalue()
-    output.close()
-
-    return csv_content
-
-
-def extract_specific_fields(record: dict) -> dict:
+    Rate limiting and upstream outages become a 503 with Retry-After so
+    clients back off instead of seeing a generic 500.
     """
-    Extract only the specific fields we need from FDA device event record.
+    if error.status_code == 429 or (error.status_code or 0) >= 500:
+        retry_after = 60
+        if error.retry_after is not None:
+            retry_after = max(1, int(error.retry_after))
+        return HTTPException(
+            status_code=503,
+            detail="FDA API is busy or rate limited, please retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+    return HTTPException(status_code=502, detail=f"FDA API error: {str(error)}")
 
-    Args:
-        record: Single FDA device event record
 
-    Returns:
-        Dictionary with only the required fields
-    """
-    from datetime import datetime
+def require_event_store(store: Optional[DeviceEventStore]) -> DeviceEventStore:
+    """Fail with 503 when the local mirror was requested but is not enabled"""
+    if store is None:
+        raise HTTPException(
+            status_code=503, detail="Database source is not enabled on this server"
+        )
+    return store
 
-    # Helper function to format date
-    def format_date(date_str: str) -> str:
-        if not date_str or date_str == "":
-            return ""
-        try:
-            # FDA dates are in YYYYMMDD format
-            if len(date_str) == 8:
-                date_obj = datetime.strptime(date_str, "%Y%m%d")
-                return date_obj.strftime("%m-%d-%Y %H:%M:%S")
-            return date_str
-        except (ValueError, TypeError):
-            return date_str
-
-    # Helper function to safely get nested values
-    def safe_get(data, *keys, default=""):
-        for key in keys:
-            if isinstance(data, dict) and key in data:
-                data = data[key]
-            elif isinstance(data, list) and len(data) > 0:
-                data = data[0]  # Take first item from list
-                if isinstance(data, dict) and key in data:
-                    data = data[key]
-                else:
-                    return default
-            else:
-                return default
-        return data if data is not None else default
-
-    # Extract mdr_report_key for web address
-    mdr_report_key = record.get("mdr_report_key", "")
-    product_code = safe_get(record, "device", "device_report_product_code")
-
-    # Construct web address
-    web_address = ""
-    if mdr_report_key and product_code:
-        web_address = f"https://www.accessdata.fda.gov/scripts/cdrh/cfdocs/cfMAUDE/Detail.CFM?MDRFOI__ID={mdr_report_key}&pc={product_code}"
-
-    # Extract event text (combine Description and Manufacturer Narrative)
-    event_text = extract_event_text(record.get("mdr_text", []))
-
-    # Extract device problems
-    device_problems = record.get("product_problems", [])
-    device_problem_str = ", ".join(device_problems) if device_problems else ""
-
-    # Extract patient problems
-    patient_problems = []
-    patients = record.get("patient", [])
-    if patients:
-        for patient in patients:
-            if "patient_problems" in patient:
-                patient_problems.extend(patient["patient_problems"])
-    patient_problem_str = ", ".join(set(patient_problems)) if patient_problems else ""
 
-    return {
-        "Web Address": web_address,
-        "Report Number": record.get("report_number", ""),
-        "Event Date": format_date(record.get("date_of_event", "")),
-        "Event Type": record.get("event_type", ""),
-        "Manufacturer": safe_get(record, "device", "manufacturer_d_name"),
-        "Date Received": format_date(record.get("date_received", "")),
-        "Product Code": product_code,
-        "Brand Name": safe_get(record, "device", "brand_name"),
-        "Device Problem": device_problem_str,
-        "Patient Problem": patient_problem_str,
-        "PMA/PMN Number": record.get("pma_pmn_number", ""),
-        "Exemption Number": record.get("exemption_number", ""),
-        "Number of Events": "1",  # Each record represents one event
-        "Event Text": event_text,
-    }
+async def iter_json_document(raw_records: AsyncIterable[str], limit: int):
+    """
+    Stream an openFDA-shaped JSON document from already-encoded records.
+
+    The records are emitted as-is, without decoding. The meta block goes last
+    because the total is only known once every record has been sent.
+    """
+    total = 0
+    yield '{"results":['
+    async for raw in raw_records:
+        yield raw if total == 0 else "," + raw
+        total += 1
+    yield (f'],"meta":{{"results":{{"skip":0,"limit":{limit},"total":{total}}}}}}}')
 
 
-def extract_event_text(mdr_text_list: list) -> str:
+async def json_to_csv(json_data: list) -> str:
     """
-    Extract and combine event description and manufacturer narrative from MDR text entries.
-    Ensures only the first unique 'Description of Event or Problem' is included,
-    while all 'Additional Manufacturer Narrative' entries are concatenated.
+    Convert JSON data to CSV format with specific fields only.
 
     Args:
-        mdr_text_list: List of MDR text entries
+        json_data: List of dictionaries containing FDA device event data
 
     Returns:
-        Combined event text string
+        CSV content as string
     """
-    event_description = ""
-    manufacturer_narratives = []  # List to collect all narratives
-    seen_descriptions = set()  # Set to track unique descriptions
-
-    # Process each text entry
-    for text_entry in mdr_text_list:
-        text_type = text_entry.get("text_type_code", "")
-        text_content = text_entry.get("text", "").strip()
-
-        if text_type == "Description of Event or Problem" and text_content:
-            # Add only if not seen before
-            if text_content not in seen_descriptions:
-                event_description = text_content
-                seen_descriptions.add(text_content)
-        elif text_type == "Additional Manufacturer Narrative" and text_content:
-            # Collect all narratives
-            manufacturer_narratives.append(text_content)
-
-    # Build the combined text
-    combined_text = ""
-    if event_description:
-        combined_text += f"Event Description: {event_description}"
-    if manufacturer_narratives:
-        # Join all narratives with a space
-        narrative_text = " ".join(manufacturer_narratives)
-        if combined_text:
-            combined_text += f" Manufacturer Narrative: {narrative_text}"
-        else:
-            combined_text = f"Manufacturer Narrative: {narrative_text}"
-
-    return combined_text
+    if not json_data:
+        return ""
+
+    return "".join([chunk async for chunk in iter_csv(json_data)])
 
 
 # Alternative endpoint that returns JSON (for testing/debugging)
@@ -274,26 +531,117 @@ async def get_json_data(
     limit: int = Query(
         default=100, ge=1, le=5000, description="Number of records to fetch"
     ),
+    source: Literal["api", "db"] = Query(
+        default=settings.DOWNLOAD_SOURCE,
+        description="Serve from openFDA (api) or the local mirror (db)",
+    ),
+    fields: Optional[str] = Query(
+        default=None,
+        description=(
+            "Comma-separated fields to keep, dotted paths allowed "
+            "(e.g. mdr_report_key,device.brand_name)"
+        ),
+    ),
+    raw: bool = Query(
+        default=False,
+        description=(
+            "Stream openFDA's response body unchanged, meta block included "
+            f"(api source, one product code, at most {MAX_PAGE_SIZE} records, "
+            "no fields)"
+        ),
+    ),
+    product_codes: List[str] = Depends(get_product_codes),
+    fetcher: FDAFetcher = Depends(get_fda_fetcher),
+    store: Optional[DeviceEventStore] = Depends(get_event_store),
 ):
     """
     Get FDA device event data as JSON (for testing purposes).
-    """
-    start_date_str = start_date.strftime("%Y-%m-%d")
-    end_date_str = end_date.strftime("%Y-%m-%d")
 
-    fda_url = (
-        f"{settings.FDA_BASE_URL}"
-        f"?limit={limit}"
-        f"&search=device.device_report_product_code:FKX+AND+date_received:[{start_date_str}+TO+{end_date_str}]"
-    )
+    Records are never re-encoded through FastAPI's JSON encoder: the mirror
+    and raw mode pass the stored/upstream bytes through, and decoded
+    records are serialized with orjson.
 
-    try:
-        http_client = HTTPXClient()
-        response = await http_client.async_get(fda_url)
+    The limit stays at 5000 rather than FDA_MAX_RECORDS: results from
+    openFDA are built in memory as one document (so they can be cached
+    whole), and this endpoint takes no export slot. Larger pulls go through
+    the streamed file exports.
+    """
+    projection = parse_field_paths(fields) if fields else None
 
-        if isinstance(response, str):
-            return json.loads(response)
-        return response
+    if source == "db":
+        store = require_event_store(store)
+        raw_records = store.iter_raw_json(product_codes, start_date, end_date, limit)
+        if projection:
+            raw_records = project_raw_records(raw_records, projection)
+        return StreamingResponse(
+            iter_json_document(raw_records, limit),
+            media_type="application/json",
+        )
 
+    if raw:
+        if projection or limit > MAX_PAGE_SIZE or len(product_codes) > 1:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"raw supports one product code, at most {MAX_PAGE_SIZE} "
+                    "records and no fields"
+                ),
+            )
+        try:
+            upstream = await fetcher.open_page_stream(
+                product_codes[0], start_date, end_date, limit
+            )
+        except HTTPError as e:
+            raise upstream_http_exception(e)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error fetching data: {str(e)}"
+            )
+        if upstream is None:
+            return Response(
+                content=orjson.dumps(json_document([], limit)),
+                media_type="application/json",
+            )
+        return StreamingResponse(iter_body(upstream), media_type="application/json")
+
+    try:
+        results = await fetcher.fetch_records_multi(
+            product_codes, start_date, end_date, limit
+        )
+        if projection:
+            results = [project_record(record, projection) for record in results]
+        with stage_timer("json_encode"):
+            content = orjson.dumps(json_document(results, limit))
+        observe_export("json", len(results), len(content))
+        return Response(content=content, media_type="application/json")
+
+    except HTTPError as e:
+        raise upstream_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching data: {str(e)}")
+
+
+def json_document(results: list, limit: int) -> dict:
+    """Wrap records in the openFDA response shape"""
+    return {
+        "meta": {"results": {"skip": 0, "limit": limit, "total": len(results)}},
+        "results": results,
+    }
+
+
+async def project_raw_records(
+    raw_records: AsyncIterable[str], projection: dict
+) -> AsyncIterator[str]:
+    """Apply a field projection to records stored as JSON text"""
+    async for raw in raw_records:
+        yield orjson.dumps(project_record(orjson.loads(raw), projection)).decode()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(cache: Optional[TieredCache] = Depends(get_cache)):
+    """
+    Get hit/miss counters of the openFDA response cache.
+    """
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -0,0 +1,162 @@
+from concurrent.futures import Executor
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+
+from libs.columnar import MEDIA_TYPES as COLUMNAR_MEDIA_TYPES
+from libs.columnar import columnar_available
+from libs.event_store import DeviceEventStore
+from libs.export_jobs import COMPLETED, ExportJob, ExportJobManager
+from libs.fda_fetcher import FDAFetcher, cache_ttl_for_range
+from app.api.deps import (
+    get_event_store,
+    get_export_executor,
+    get_export_jobs,
+    get_fda_fetcher,
+    get_product_codes,
+)
+from app.api.v1.endpoints.downloads import (
+    EXPORT_FORMATS,
+    export_filename,
+    open_export,
+    require_event_store,
+)
+from app.core.config import settings
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+
+@router.post("", status_code=202)
+async def create_export(
+    request: Request,
+    start_date: date = Query(
+        ..., description="Start date (YYYY-MM-DD)", alias="startDate"
+    ),
+    end_date: date = Query(..., description="End date (YYYY-MM-DD)", alias="endDate"),
+    limit: int = Query(
+        default=100,
+        ge=1,
+        le=settings.FDA_MAX_RECORDS,
+        description="Number of records to fetch",
+    ),
+    source: Literal["api", "db"] = Query(
+        default=settings.DOWNLOAD_SOURCE,
+        description="Serve from openFDA (api) or the local mirror (db)",
+    ),
+    format: Literal["csv", "csv.gz", "parquet", "arrow"] = Query(
+        default="csv", description="File format of the export"
+    ),
+    product_codes: List[str] = Depends(get_product_codes),
+    fetcher: FDAFetcher = Depends(get_fda_fetcher),
+    store: Optional[DeviceEventStore] = Depends(get_event_store),
+    executor: Optional[Executor] = Depends(get_export_executor),
+    jobs: ExportJobManager = Depends(get_export_jobs),
+):
+    """
+    Start a background export and return its job.
+
+    The export runs on the job worker pool instead of inside the request, so
+    it is not bound by proxy timeouts. Poll the status URL until the job is
+    completed, then fetch the file from the download URL (Range requests
+    are supported, so interrupted downloads can resume). A job with the same
+    parameters that is pending or running is returned instead of starting a
+    new one, and so is a completed one while its file is as fresh as a
+    cached response for the range (CACHE_RECENT_TTL for ranges ending in
+    the last CACHE_RECENT_DAYS, else CACHE_HISTORICAL_TTL).
+    """
+    if format in COLUMNAR_MEDIA_TYPES and not columnar_available():
+        raise HTTPException(
+            status_code=501, detail="Columnar exports need pyarrow installed"
+        )
+    if source == "db":
+        require_event_store(store)
+
+    params = {
+        "product_codes": product_codes,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "limit": limit,
+        "source": source,
+        "format": format,
+    }
+    extension, media_type = EXPORT_FORMATS[format]
+
+    async def open_chunks(progress):
+        return await open_export(
+            format,
+            product_codes,
+            start_date,
+            end_date,
+            limit,
+            source,
+            fetcher,
+            store,
+            executor,
+            progress=progress,
+        )
+
+    job, created = jobs.submit(
+        params,
+        export_filename(start_date, end_date, extension),
+        media_type,
+        limit,
+        open_chunks,
+        # Completed files are as fresh as a cached response for the range
+        max_age=cache_ttl_for_range(
+            end_date,
+            settings.CACHE_RECENT_DAYS,
+            settings.CACHE_RECENT_TTL,
+            settings.CACHE_HISTORICAL_TTL,
+        ),
+    )
+    return {"created": created, **job_status(request, job)}
+
+
+@router.get("/{job_id}")
+async def get_export(
+    job_id: str,
+    request: Request,
+    jobs: ExportJobManager = Depends(get_export_jobs),
+):
+    """
+    Get the status and progress of an export job.
+    """
+    return job_status(request, get_job(jobs, job_id))
+
+
+@router.get("/{job_id}/file")
+async def download_export(
+    job_id: str,
+    jobs: ExportJobManager = Depends(get_export_jobs),
+):
+    """
+    Download the file of a completed export job (supports Range requests).
+    """
+    job = get_job(jobs, job_id)
+    if job.status != COMPLETED:
+        raise HTTPException(
+            status_code=409, detail=f"Export job is {job.status}, not completed"
+        )
+    return FileResponse(
+        jobs.file_path(job), media_type=job.media_type, filename=job.filename
+    )
+
+
+def get_job(jobs: ExportJobManager, job_id: str) -> ExportJob:
+    """Look a job up, failing with 404 if it is unknown or expired"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+def job_status(request: Request, job: ExportJob) -> dict:
+    """Job state plus the URLs to poll and to download the file"""
+    status = job.to_dict()
+    status["status_url"] = str(request.url_for("get_export", job_id=job.id))
+    status["download_url"] = None
+    if job.status == COMPLETED:
+        status["download_url"] = str(request.url_for("download_export", job_id=job.id))
+    return status
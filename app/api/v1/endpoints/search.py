@@ -0,0 +1,85 @@
+import asyncio
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from libs.event_store import DeviceEventStore
+from libs.search_index import SearchIndex
+from app.api.deps import get_event_store, get_product_codes, get_search_index
+from app.api.v1.endpoints.downloads import require_event_store
+from app.core.config import settings
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("")
+async def search_events(
+    q: str = Query(
+        ...,
+        min_length=1,
+        max_length=500,
+        description='Keywords; "quoted phrases", OR, -excluded and prefix* terms',
+    ),
+    page: int = Query(default=1, ge=1, description="Page number, starting at 1"),
+    page_size: int = Query(
+        default=20,
+        ge=1,
+        le=settings.SEARCH_MAX_PAGE_SIZE,
+        alias="pageSize",
+        description="Hits per page",
+    ),
+    start_date: Optional[date] = Query(
+        default=None, description="Start date (YYYY-MM-DD)", alias="startDate"
+    ),
+    end_date: Optional[date] = Query(
+        default=None, description="End date (YYYY-MM-DD)", alias="endDate"
+    ),
+    source: Literal["db", "index"] = Query(
+        default=settings.SEARCH_SOURCE,
+        description="Search the local mirror (db) or the embedded index (index)",
+    ),
+    product_codes: List[str] = Depends(get_product_codes),
+    store: Optional[DeviceEventStore] = Depends(get_event_store),
+    search_index: Optional[SearchIndex] = Depends(get_search_index),
+):
+    """
+    Search event text, manufacturer and brand name, best matches first.
+
+    The local mirror is searched through its tsvector/GIN index, which
+    Postgres keeps up to date as reports are loaded. The embedded SQLite
+    index covers every report downloaded from openFDA by this server, added
+    as the downloads happen. Brand name matches rank above manufacturer
+    matches, which rank above event text matches.
+    """
+    offset = (page - 1) * page_size
+    # One extra hit tells whether there is a next page, without counting
+    # every match
+    if source == "db":
+        hits = await require_event_store(store).search(
+            q, product_codes, start_date, end_date, page_size + 1, offset
+        )
+    else:
+        if search_index is None:
+            raise HTTPException(
+                status_code=503, detail="Search index is not enabled on this server"
+            )
+        hits = await asyncio.to_thread(
+            search_index.search,
+            q,
+            product_codes,
+            start_date,
+            end_date,
+            page_size + 1,
+            offset,
+        )
+
+    return {
+        "query": q,
+        "product_codes": product_codes,
+        "source": source,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(hits) > page_size,
+        "results": hits[:page_size],
+    }
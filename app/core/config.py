@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from datetime import date
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -16,9 +17,109 @@ class Settings(BaseSettings):
 
     DATABASE_URL: Optional[str] = None
 
+    # Async database pool used to serve downloads from the local mirror
+    DB_POOL_ENABLED: bool = False
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_CURSOR_PREFETCH: int = 1000
+
+    # Default source for downloads: "api" (openFDA) or "db" (local mirror)
+    DOWNLOAD_SOURCE: Literal["api", "db"] = "api"
+
     # FDA base URL
     FDA_BASE_URL: str = "https://api.fda.gov/device/event.json"
 
+    # Product codes served when a request names none, and the most a single
+    # request may fan out to
+    DEFAULT_PRODUCT_CODES: List[str] = ["FKX"]
+    MAX_PRODUCT_CODES: int = 20
+
+    # Upstream HTTP connection pool, shared for the application lifetime
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+
+    # Process-wide pacing of openFDA calls (openFDA allows 240 requests per
+    # minute per client) - sustained rate plus allowed burst
+    FDA_RATE_LIMIT_PER_MINUTE: int = 240
+    FDA_RATE_LIMIT_BURST: int = 10
+
+    # FDA pagination - records per upstream page, pages in flight at once
+    # (across all requests), and the largest export a single request may ask for
+    FDA_PAGE_SIZE: int = 1000
+    FDA_MAX_CONCURRENCY: int = 4
+    FDA_MAX_RECORDS: int = 100000
+    # Pages a streamed export downloads ahead of the one being sent
+    FDA_PREFETCH_PAGES: int = 2
+
+    # Response cache - in-process LRU bounded by size, plus an on-disk tier.
+    # Ranges ending within CACHE_RECENT_DAYS of today use the short TTL.
+    # Streamed exports from openFDA cache the raw body of each page.
+    # Memory usage is measured by JSON encoded size, so it is approximate.
+    CACHE_ENABLED: bool = True
+    CACHE_MEMORY_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_DIR: Optional[str] = ".cache/openfda"
+    CACHE_DISK_MAX_BYTES: Optional[int] = 2 * 1024 * 1024 * 1024
+    CACHE_RECENT_DAYS: int = 90
+    CACHE_RECENT_TTL: int = 60 * 60
+    CACHE_HISTORICAL_TTL: int = 30 * 24 * 60 * 60
+
+    # Incremental sync of the local mirror (app.py)
+    SYNC_PRODUCT_CODES: List[str] = ["FKX"]
+    SYNC_INITIAL_START: date = date(2015, 1, 1)
+    SYNC_WINDOW_DAYS: int = 7
+    SYNC_CONCURRENCY: int = 4
+    SYNC_BATCH_SIZE: int = 10000
+
+    # CSV streaming - characters buffered before a chunk is sent
+    CSV_CHUNK_SIZE: int = 64 * 1024
+
+    # Background export jobs - folder for the files, jobs run at once, and
+    # how long finished jobs (and their files) are kept, in seconds
+    EXPORT_JOBS_DIR: str = "exports/jobs"
+    EXPORT_JOB_WORKERS: int = 2
+    EXPORT_JOB_RETENTION: int = 24 * 60 * 60
+
+    # ETag/Last-Modified on CSV, Parquet and Arrow downloads, so conditional
+    # requests get a 304 when nothing changed. From openFDA this costs one
+    # one-record request per download (cached with the response cache);
+    # disable it to save that request when the cache is off.
+    EXPORT_VALIDATORS: bool = True
+
+    # Parquet/Arrow exports - rows per row group / record batch
+    COLUMNAR_BATCH_ROWS: int = 10000
+
+    # On-the-fly compression of text and JSON responses, negotiated from
+    # Accept-Encoding (zstd when the zstandard package is installed, else gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # CSV conversion worker pool - "process", "thread" or "none" (inline on
+    # the event loop), records per unit of work, and the number of exports
+    # served at once (further requests wait EXPORT_QUEUE_TIMEOUT, then get 503)
+    EXPORT_EXECUTOR: Literal["process", "thread", "none"] = "process"
+    EXPORT_WORKERS: Optional[int] = None
+    EXPORT_CHUNK_RECORDS: int = 500
+    MAX_CONCURRENT_EXPORTS: int = 8
+    EXPORT_QUEUE_TIMEOUT: float = 10.0
+
+    # Full-text search - served from the mirror's tsvector index ("db") or an
+    # embedded SQLite FTS5 index ("index") fed with every record downloaded
+    # from openFDA. SEARCH_INDEX_PATH empty disables the embedded index;
+    # records waiting to be indexed beyond SEARCH_INDEX_MAX_PENDING are dropped.
+    SEARCH_SOURCE: Literal["db", "index"] = "index"
+    SEARCH_INDEX_PATH: Optional[str] = ".cache/search.sqlite3"
+    SEARCH_INDEX_MAX_PENDING: int = 50000
+    SEARCH_MAX_PAGE_SIZE: int = 100
+
+    # Prometheus metrics on /metrics, and per-request Server-Timing headers
+    # with the stages timed before the response headers were sent
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: bool = False
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
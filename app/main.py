@@ -1,8 +1,142 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import Response
 
 from app.core.config import settings
-from app.api.v1.endpoints import downloads_router
+from app.api.v1.endpoints import (
+    aggregates_router,
+    downloads_router,
+    exports_router,
+    search_router,
+)
+from libs.async_db import AsyncPostgresPool
+from libs.cache import DiskCache, LRUCache, TieredCache
+from libs.compression import CompressionMiddleware
+from libs.export_jobs import ExportJobManager
+from libs.http_client import HTTPXClient
+from libs.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, render_metrics
+from libs.rate_limit import AsyncTokenBucket, ConcurrencyLimiter
+from libs.search_index import SearchIndex
+from libs.logger import flush_logging, logger
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown"""
+    app.state.http_client = HTTPXClient(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        http2=settings.HTTP2_ENABLED,
+        rate_limiter=AsyncTokenBucket.per_minute(
+            settings.FDA_RATE_LIMIT_PER_MINUTE, settings.FDA_RATE_LIMIT_BURST
+        ),
+    )
+    logger.info("Upstream HTTP connection pool created")
+    # One limit for every request's fetcher (see get_fda_fetcher)
+    app.state.fda_semaphore = asyncio.Semaphore(settings.FDA_MAX_CONCURRENCY)
+
+    app.state.cache = None
+    if settings.CACHE_ENABLED:
+        disk = None
+        if settings.CACHE_DIR:
+            disk = DiskCache(settings.CACHE_DIR, settings.CACHE_DISK_MAX_BYTES)
+            removed = await asyncio.to_thread(disk.prune)
+            logger.info(f"Pruned {removed} entries from {settings.CACHE_DIR}")
+        app.state.cache = TieredCache(LRUCache(settings.CACHE_MEMORY_MAX_BYTES), disk)
+
+    app.state.search_index = None
+    if settings.SEARCH_INDEX_PATH:
+        app.state.search_index = SearchIndex(
+            settings.SEARCH_INDEX_PATH, max_pending=settings.SEARCH_INDEX_MAX_PENDING
+        )
+        await asyncio.to_thread(app.state.search_index.open)
+        logger.info(f"Search index opened at {settings.SEARCH_INDEX_PATH}")
+
+    app.state.db_pool = None
+    if settings.DB_POOL_ENABLED:
+        app.state.db_pool = AsyncPostgresPool(
+            settings.database_url,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+        )
+        await app.state.db_pool.open()
+
+    app.state.export_executor = create_export_executor()
+    app.state.export_slots = ConcurrencyLimiter(settings.MAX_CONCURRENT_EXPORTS)
+
+    app.state.export_jobs = ExportJobManager(
+        settings.EXPORT_JOBS_DIR,
+        max_workers=settings.EXPORT_JOB_WORKERS,
+        retention=settings.EXPORT_JOB_RETENTION,
+    )
+    restored = await asyncio.to_thread(app.state.export_jobs.load)
+    logger.info(f"Restored {restored} export jobs from {settings.EXPORT_JOBS_DIR}")
+
+    yield
+
+    await app.state.export_jobs.close()
+
+    if app.state.export_executor is not None:
+        app.state.export_executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Export worker pool shut down")
+    if app.state.db_pool is not None:
+        await app.state.db_pool.close()
+        logger.info("Database pool closed")
+    if app.state.search_index is not None:
+        await asyncio.to_thread(app.state.search_index.close)
+        logger.info("Search index closed")
+    if app.state.cache is not None:
+        logger.info(f"Response cache stats: {app.state.cache.stats()}")
+
+    await app.state.http_client.aclose()
+    logger.info("Upstream HTTP connection pool closed")
+    # The log writer thread is stopped at interpreter exit; make sure the
+    # shutdown messages are out before the server reports it has stopped
+    await asyncio.to_thread(flush_logging)
+
+
+def create_export_executor():
+    """Create the worker pool CSV conversion runs on, or None for inline"""
+    if settings.EXPORT_EXECUTOR == "process":
+        # spawn: forking a process that runs an event loop and open sockets
+        # is not safe
+        return ProcessPoolExecutor(
+            max_workers=settings.EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    if settings.EXPORT_EXECUTOR == "thread":
+        return ThreadPoolExecutor(
+            max_workers=settings.EXPORT_WORKERS, thread_name_prefix="export"
+        )
+    return None
+
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, lifespan=lifespan)
+
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
+
+if settings.METRICS_ENABLED:
+    # Added last so it is outermost and times compression too
+    app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics in the text exposition format"""
+        return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
 
 app.include_router(downloads_router, prefix="/api/v1")
+app.include_router(exports_router, prefix="/api/v1")
+app.include_router(aggregates_router, prefix="/api/v1")
+app.include_router(search_router, prefix="/api/v1")
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the fetch -> extract -> CSV path.
+"""
@@ -0,0 +1,162 @@
+"""
+Micro-benchmark of the field extraction engine.
+
+Compares the original per-record extractor (reproduced below as the
+reference) feeding csv.DictWriter with extract_rows feeding csv.writer, on
+synthetic 5000-record payloads, and checks that both produce the same bytes.
+
+Usage:
+    python -m benchmarks.bench_extract [--records 5000] [--repeat 5]
+"""
+
+import argparse
+import csv
+import io
+import time
+
+from benchmarks.synthetic import make_records
+from libs.fda_records import (
+    CSV_FIELDNAMES,
+    extract_event_text,
+    extract_rows,
+)
+
+
+def reference_extract_specific_fields(record: dict) -> dict:
+    """The extractor as it was before the batch engine, kept for comparison"""
+    from datetime import datetime
+
+    def format_date(date_str: str) -> str:
+        if not date_str or date_str == "":
+            return ""
+        try:
+            if len(date_str) == 8:
+                date_obj = datetime.strptime(date_str, "%Y%m%d")
+                return date_obj.strftime("%m-%d-%Y %H:%M:%S")
+            return date_str
+        except (ValueError, TypeError):
+            return date_str
+
+    def safe_get(data, *keys, default=""):
+        for key in keys:
+            if isinstance(data, dict) and key in data:
+                data = data[key]
+            elif isinstance(data, list) and len(data) > 0:
+                data = data[0]
+                if isinstance(data, dict) and key in data:
+                    data = data[key]
+                else:
+                    return default
+            else:
+                return default
+        return data if data is not None else default
+
+    mdr_report_key = record.get("mdr_report_key", "")
+    product_code = safe_get(record, "device", "device_report_product_code")
+    web_address = ""
+    if mdr_report_key and product_code:
+        web_address = f"https://www.accessdata.fda.gov/scripts/cdrh/cfdocs/cfMAUDE/Detail.CFM?MDRFOI__ID={mdr_report_key}&pc={product_code}"
+    event_text = extract_event_text(record.get("mdr_text", []))
+    device_problems = record.get("product_problems", [])
+    device_problem_str = ", ".join(device_problems) if device_problems else ""
+    patient_problems = []
+    patients = record.get("patient", [])
+    if patients:
+        for patient in patients:
+            if "patient_problems" in patient:
+                patient_problems.extend(patient["patient_problems"])
+    patient_problem_str = ", ".join(set(patient_problems)) if patient_problems else ""
+    return {
+        "Web Address": web_address,
+        "Report Number": record.get("report_number", ""),
+        "Event Date": format_date(record.get("date_of_event", "")),
+        "Event Type": record.get("event_type", ""),
+        "Manufacturer": safe_get(record, "device", "manufacturer_d_name"),
+        "Date Received": format_date(record.get("date_received", "")),
+        "Product Code": product_code,
+        "Brand Name": safe_get(record, "device", "brand_name"),
+        "Device Problem": device_problem_str,
+        "Patient Problem": patient_problem_str,
+        "PMA/PMN Number": record.get("pma_pmn_number", ""),
+        "Exemption Number": record.get("exemption_number", ""),
+        "Number of Events": "1",
+        "Event Text": event_text,
+    }
+
+
+def reference_csv(records: list) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDNAMES)
+    writer.writeheader()
+    writer.writerows([reference_extract_specific_fields(r) for r in records])
+    return output.getvalue()
+
+
+def batch_csv(records: list) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_FIELDNAMES)
+    writer.writerows(extract_rows(records))
+    return output.getvalue()
+
+
+def best_of(fn, records: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(records)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(record_count: int = 5000, repeat: int = 5, narrative_length: int = 800):
+    records = make_records(record_count, narrative_length=narrative_length)
+
+    if reference_csv(records) != batch_csv(records):
+        raise SystemExit("Output mismatch between reference and batch extractor")
+
+    results = {}
+    for name, fn in (
+        (
+            "extract/reference",
+            lambda rs: [reference_extract_specific_fields(r) for r in rs],
+        ),
+        ("extract/batch", lambda rs: list(extract_rows(rs))),
+        ("csv/reference", reference_csv),
+        ("csv/batch", batch_csv),
+    ):
+        seconds = best_of(fn, records, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "us_per_record": seconds / record_count * 1e6,
+        }
+    results["extract/speedup"] = (
+        results["extract/reference"]["seconds"] / results["extract/batch"]["seconds"]
+    )
+    results["csv/speedup"] = (
+        results["csv/reference"]["seconds"] / results["csv/batch"]["seconds"]
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--narrative-length", type=int, default=800)
+    args = parser.parse_args()
+
+    results = run(args.records, args.repeat, args.narrative_length)
+    print(f"{args.records} records, best of {args.repeat} (output verified identical)")
+    for name, value in results.items():
+        if isinstance(value, dict):
+            print(
+                f"  {name:<20} {value['seconds'] * 1000:8.1f} ms "
+                f"{value['us_per_record']:8.2f} us/record"
+            )
+        else:
+            print(f"  {name:<20} {value:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
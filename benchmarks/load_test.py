@@ -0,0 +1,397 @@
+"""
+End-to-end load test of the download endpoints against the openFDA stub.
+
+Starts the stub (benchmarks.stub_fda) and the application under uvicorn in
+subprocesses, drives /downloads/csv and /downloads/json at a configurable
+concurrency, runs the extract and json_to_csv micro-benchmarks, and writes
+all results as JSON so runs can be compared over time.
+
+Usage:
+    python -m benchmarks.load_test [--requests 40] [--concurrency 8]
+        [--limit 5000] [--latency 0.02] [--error-rate 0.01]
+        [--output benchmarks/results/run.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_extract import best_of
+from benchmarks.synthetic import make_records
+
+# Settings the application requires; the database is not used by the api
+# source, so placeholders will do
+REQUIRED_SETTINGS = {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "fda",
+    "DB_USER": "fda",
+    "DB_PASSWORD": "fda",
+}
+
+ENDPOINTS = {
+    "csv": "/api/v1/downloads/csv",
+    "json": "/api/v1/downloads/json",
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile, or None without values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max of a list of seconds, in milliseconds"""
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(max(values) if values else None),
+    }
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    """Resident set size of a process in KiB (Linux only, else None)"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def sample_peak_rss(pid: int, peak: dict, interval: float = 0.05):
+    """Record the highest RSS of `pid` in peak["kb"] until cancelled"""
+    while True:
+        rss = read_rss_kb(pid)
+        if rss is not None and rss > (peak.get("kb") or 0):
+            peak["kb"] = rss
+        await asyncio.sleep(interval)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    """Poll `url` until it answers, failing if the process exits first"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} process exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} seconds")
+
+
+async def timed_request(client: httpx.AsyncClient, url: str, params: dict) -> dict:
+    """One request, streamed: status, bytes, time to first byte and total time"""
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    async with client.stream("GET", url, params=params) as response:
+        async for chunk in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+    return {
+        "status": response.status_code,
+        "bytes": size,
+        "ttfb": first_byte if first_byte is not None else time.perf_counter() - started,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+async def run_scenario(
+    base_url: str,
+    path: str,
+    params: dict,
+    requests: int,
+    concurrency: int,
+    headers: dict,
+    pid: Optional[int] = None,
+) -> dict:
+    """
+    Send `requests` requests to one endpoint, `concurrency` at a time.
+
+    Returns:
+        Throughput, latency and time-to-first-byte distributions, status
+        counts and the server's peak RSS during the run
+    """
+    results = []
+    remaining = iter(range(requests))
+    peak: dict = {}
+
+    async def worker(client):
+        for _ in remaining:
+            try:
+                results.append(await timed_request(client, path, params))
+            except httpx.HTTPError as e:
+                results.append({"status": type(e).__name__})
+
+    sampler = None
+    if pid is not None:
+        sampler = asyncio.create_task(sample_peak_rss(pid, peak))
+    started = time.perf_counter()
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, timeout=None
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if sampler is not None:
+        sampler.cancel()
+
+    ok = [r for r in results if r["status"] == 200]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    total_bytes = sum(r["bytes"] for r in ok)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "statuses": statuses,
+        "requests_per_s": round(len(ok) / elapsed, 3),
+        "mb_per_s": round(total_bytes / elapsed / 1e6, 3),
+        "bytes_per_response": total_bytes // len(ok) if ok else 0,
+        "latency": distribution([r["seconds"] for r in ok]),
+        "ttfb": distribution([r["ttfb"] for r in ok]),
+        "peak_rss_mb": round(peak["kb"] / 1024, 1) if peak.get("kb") else None,
+    }
+
+
+def run_micro_benchmarks(records: int, repeat: int, narrative_length: int) -> dict:
+    """Time extract_specific_fields and json_to_csv on synthetic records"""
+    for name, value in REQUIRED_SETTINGS.items():
+        os.environ.setdefault(name, value)
+    from app.api.v1.endpoints.downloads import json_to_csv
+    from libs.fda_records import extract_specific_fields
+
+    data = make_records(records, narrative_length=narrative_length)
+    results = {}
+    for name, fn in (
+        (
+            "extract_specific_fields",
+            lambda rs: [extract_specific_fields(r) for r in rs],
+        ),
+        ("json_to_csv", lambda rs: asyncio.run(json_to_csv(rs))),
+    ):
+        seconds = best_of(fn, data, repeat)
+        results[name] = {
+            "records": records,
+            "seconds": round(seconds, 6),
+            "us_per_record": round(seconds / records * 1e6, 3),
+        }
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def app_environment(args, stub_url: str, workdir: str) -> dict:
+    """Environment of the application process, pointed at the stub"""
+    env = dict(os.environ)
+    env.update(
+        {
+            "FDA_BASE_URL": f"{stub_url}/device/event.json",
+            "CACHE_ENABLED": "true" if args.cache else "false",
+            "FDA_RATE_LIMIT_PER_MINUTE": str(args.rate_limit),
+            "FDA_RATE_LIMIT_BURST": str(max(1, args.rate_limit // 60)),
+            "SEARCH_INDEX_PATH": (
+                os.path.join(workdir, "search.sqlite3") if args.search_index else ""
+            ),
+            "EXPORT_JOBS_DIR": os.path.join(workdir, "jobs"),
+            "CACHE_DIR": os.path.join(workdir, "cache"),
+            "HTTP2_ENABLED": "false",
+        }
+    )
+    for name, value in REQUIRED_SETTINGS.items():
+        env.setdefault(name, value)
+    return env
+
+
+async def run_load(args, app_url: str, app_pid: int) -> dict:
+    start = args.start_date
+    end = start + timedelta(days=args.days - 1)
+    params = {
+        "startDate": start.isoformat(),
+        "endDate": end.isoformat(),
+        "limit": args.limit,
+        "productCode": args.product_codes,
+    }
+    headers = {"Accept-Encoding": args.accept_encoding}
+
+    results = {}
+    for name in args.endpoints:
+        # One warm-up request, so worker pools and connections are up
+        async with httpx.AsyncClient(
+            base_url=app_url, headers=headers, timeout=None
+        ) as client:
+            await timed_request(client, ENDPOINTS[name], params)
+        results[name] = await run_scenario(
+            app_url,
+            ENDPOINTS[name],
+            params,
+            args.requests,
+            args.concurrency,
+            headers,
+            pid=app_pid,
+        )
+        print(f"{name}: {json.dumps(results[name])}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--product-codes", default="FKX")
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=["csv", "json"]
+    )
+    parser.add_argument("--accept-encoding", default="identity")
+    # Stub openFDA
+    parser.add_argument("--stub-records", type=int, default=20000)
+    parser.add_argument(
+        "--start-date", type=date.fromisoformat, default=date(2024, 1, 1)
+    )
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--narrative-length", type=int, default=800)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    # Application
+    parser.add_argument("--cache", action="store_true", help="Enable the cache")
+    parser.add_argument("--search-index", action="store_true")
+    parser.add_argument("--rate-limit", type=int, default=100000)
+    # Micro-benchmarks
+    parser.add_argument("--micro-records", type=int, default=5000)
+    parser.add_argument("--micro-repeat", type=int, default=5)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="JSON results file (default: timestamped)")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    report = {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {
+                key: value.isoformat() if isinstance(value, date) else value
+                for key, value in vars(args).items()
+            },
+        }
+    }
+
+    if not args.skip_micro:
+        report["micro"] = run_micro_benchmarks(
+            args.micro_records, args.micro_repeat, args.narrative_length
+        )
+        print(f"micro: {json.dumps(report['micro'])}")
+
+    if not args.skip_load:
+        stub_port, app_port = free_port(), free_port()
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        app_url = f"http://127.0.0.1:{app_port}"
+        processes = []
+        with tempfile.TemporaryDirectory(prefix="fda-load-test-") as workdir:
+            try:
+                stub = subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.stub_fda",
+                        f"--port={stub_port}",
+                        f"--records={args.stub_records}",
+                        f"--start-date={args.start_date.isoformat()}",
+                        f"--days={args.days}",
+                        f"--narrative-length={args.narrative_length}",
+                        f"--latency={args.latency}",
+                        f"--jitter={args.jitter}",
+                        f"--error-rate={args.error_rate}",
+                        f"--retry-after={args.retry_after}",
+                    ]
+                )
+                processes.append(stub)
+                wait_ready(f"{stub_url}/stats", stub)
+
+                app = subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "uvicorn",
+                        "app.main:app",
+                        f"--port={app_port}",
+                        "--log-level=warning",
+                    ],
+                    env=app_environment(args, stub_url, workdir),
+                )
+                processes.append(app)
+                wait_ready(f"{app_url}/openapi.json", app)
+
+                report["load"] = asyncio.run(run_load(args, app_url, app.pid))
+                report["stub"] = httpx.get(f"{stub_url}/stats").json()
+            finally:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    try:
+                        process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"{started_at.strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
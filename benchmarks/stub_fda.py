@@ -0,0 +1,304 @@
+"""
+Local stand-in for the openFDA device event endpoint.
+
+Serves synthetic records (see benchmarks.synthetic) with openFDA's paging,
+sorting, 404-on-no-match and count= behaviour (including the date_changed
+clause of `since` queries), plus configurable response latency and injected
+429s, so the fetch -> extract -> CSV path can be measured without touching
+the real API.
+
+Usage:
+    python -m benchmarks.stub_fda [--port 8001] [--records 20000]
+        [--latency 0.05] [--error-rate 0.01] [--narrative-length 800]
+"""
+
+import argparse
+import asyncio
+import bisect
+import random
+import re
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from benchmarks.synthetic import make_records
+
+# Either a parenthesised list of codes, "(FKX+LZG)", or a single code
+PRODUCT_CODE_SEARCH = re.compile(
+    r"device_report_product_code:(?:\(([A-Z+]+)\)|([A-Z]{3})\b)"
+)
+DATE_RANGE_SEARCH = re.compile(
+    r"date_received:\[(\d{4}-\d{2}-\d{2})\+TO\+(\d{4}-\d{2}-\d{2})\]"
+)
+# The `since` clause: received or changed on or after a day
+SINCE_SEARCH = re.compile(
+    r"\(date_received:\[(\d{4}-\d{2}-\d{2})\+TO\+\d{4}-\d{2}-\d{2}\]"
+    r"\+date_changed:\[(\d{4}-\d{2}-\d{2})\+TO\+(\d{4}-\d{2}-\d{2})\]\)"
+)
+
+
+def json_response(payload: dict, status_code: int = 200, headers=None) -> Response:
+    return Response(
+        orjson.dumps(payload),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def not_found() -> Response:
+    return json_response(
+        {"error": {"code": "NOT_FOUND", "message": "No matches found!"}}, 404
+    )
+
+
+class StubDataset:
+    def __init__(
+        self,
+        records_per_code: int,
+        start_date: date,
+        days: int,
+        narrative_length: int,
+        seed: int,
+    ):
+        """
+        Synthetic records per product code, generated on first use.
+
+        Args:
+            records_per_code: Records served for every product code
+            start_date: First date_received
+            days: Number of days the records are spread over
+            narrative_length: Approximate characters of event text per record
+            seed: Random seed; the same seed serves the same records
+        """
+        self.records_per_code = records_per_code
+        self.start_date = start_date
+        self.days = days
+        self.narrative_length = narrative_length
+        self.seed = seed
+        self._records: Dict[str, List[dict]] = {}
+        self._dates: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def records(self, product_code: str) -> List[dict]:
+        """Records of a product code, ordered by date_received"""
+        with self._lock:
+            if product_code not in self._records:
+                self._generate(product_code)
+        return self._records[product_code]
+
+    def _generate(self, product_code: str):
+        records = make_records(
+            self.records_per_code,
+            start_date=self.start_date,
+            days=self.days,
+            product_code=product_code,
+            narrative_length=self.narrative_length,
+            seed=self.seed + sum(map(ord, product_code)),
+        )
+        # Keys must be unique across codes, like real MDR report keys
+        offset = sum(map(ord, product_code)) * 10**7
+        for record in records:
+            record["mdr_report_key"] = str(offset + int(record["mdr_report_key"]))
+        self._records[product_code] = records
+        self._dates[product_code] = [r["date_received"] for r in records]
+
+    def select(self, product_codes: List[str], start: str, end: str) -> List[dict]:
+        """Records of the codes received within [start, end] (YYYYMMDD)"""
+        selected = []
+        for code in product_codes:
+            records = self.records(code)
+            dates = self._dates[code]
+            selected.extend(
+                records[
+                    bisect.bisect_left(dates, start) : bisect.bisect_right(dates, end)
+                ]
+            )
+        if len(product_codes) > 1:
+            selected.sort(key=lambda record: record["date_received"])
+        return selected
+
+    @staticmethod
+    def changed_since(records: List[dict], since: str, until: str) -> List[dict]:
+        """
+        Records received on or after `since`, or changed within [since,
+        until]; records without a date_changed count as changed when received
+        """
+        return [
+            record
+            for record in records
+            if record["date_received"] >= since
+            or since <= record.get("date_changed", record["date_received"]) <= until
+        ]
+
+
+def create_stub_app(
+    records_per_code: int = 20000,
+    start_date: date = date(2024, 1, 1),
+    days: int = 90,
+    narrative_length: int = 800,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    retry_after: float = 1.0,
+    seed: int = 42,
+) -> FastAPI:
+    """
+    Build the stub openFDA application.
+
+    Args:
+        records_per_code: Records served for every product code
+        start_date: First date_received of the synthetic records
+        days: Number of days the records are spread over
+        narrative_length: Approximate characters of event text per record
+        latency: Seconds every response is delayed by
+        jitter: Extra random delay of up to this many seconds
+        error_rate: Fraction of requests answered with 429
+        retry_after: Retry-After sent with the injected 429s
+        seed: Random seed for records and injected errors
+    """
+    app = FastAPI(title="openFDA stub")
+    dataset = StubDataset(records_per_code, start_date, days, narrative_length, seed)
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "throttled": 0, "not_found": 0}
+    # Exposed so tests can amend records (e.g. set a date_changed)
+    app.state.dataset = dataset
+    last_updated = (start_date + timedelta(days=days)).isoformat()
+
+    @app.get("/device/event.json")
+    async def device_events(request: Request):
+        stats = app.state.stats
+        stats["requests"] += 1
+        delay = latency + (rng.random() * jitter if jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            stats["throttled"] += 1
+            return json_response(
+                {"error": {"code": "TOO_MANY_REQUESTS", "message": "Slow down"}},
+                429,
+                headers={"Retry-After": str(retry_after)},
+            )
+
+        params = request.query_params
+        search = params.get("search", "").replace(" ", "+")
+        codes_match = PRODUCT_CODE_SEARCH.search(search)
+        range_match = DATE_RANGE_SEARCH.search(search)
+        if codes_match is None or range_match is None:
+            return json_response(
+                {"error": {"code": "BAD_REQUEST", "message": "Unsupported search"}},
+                400,
+            )
+        codes = (codes_match.group(1) or codes_match.group(2)).split("+")
+        start, end = (value.replace("-", "") for value in range_match.groups())
+
+        # Record generation is CPU-bound; keep the event loop responsive
+        selected = await asyncio.to_thread(dataset.select, codes, start, end)
+        since_match = SINCE_SEARCH.search(search)
+        if since_match is not None:
+            since, _, until = (value.replace("-", "") for value in since_match.groups())
+            selected = dataset.changed_since(selected, since, until)
+        if not selected:
+            stats["not_found"] += 1
+            return not_found()
+
+        count_field = params.get("count")
+        if count_field:
+            return json_response(
+                {"results": count_results(selected, count_field, params.get("limit"))}
+            )
+
+        limit = min(int(params.get("limit", 1)), 1000)
+        skip = int(params.get("skip", 0))
+        if skip > 25000:
+            return json_response(
+                {"error": {"code": "BAD_REQUEST", "message": "Skip value too high"}},
+                400,
+            )
+        body = await asyncio.to_thread(
+            orjson.dumps,
+            {
+                "meta": {
+                    "last_updated": last_updated,
+                    "results": {"skip": skip, "limit": limit, "total": len(selected)},
+                },
+                "results": selected[skip : skip + limit],
+            },
+        )
+        return Response(body, media_type="application/json")
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats
+
+    return app
+
+
+def count_results(
+    records: List[dict], count_field: str, limit: Optional[str]
+) -> List[dict]:
+    """openFDA-style count= results for the fields the application counts"""
+    field = count_field.replace(".exact", "")
+    counts: Dict[str, int] = {}
+    for record in records:
+        if field == "date_received":
+            values = [record["date_received"]]
+        elif field == "event_type":
+            values = [record.get("event_type", "")]
+        elif field == "device.manufacturer_d_name":
+            values = [d.get("manufacturer_d_name", "") for d in record["device"]]
+        elif field == "patient.patient_problems":
+            values = {
+                p for patient in record["patient"] for p in patient["patient_problems"]
+            }
+        else:
+            values = []
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+    if field == "date_received":
+        return [{"time": day, "count": counts[day]} for day in sorted(counts)]
+    terms = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [
+        {"term": term, "count": count} for term, count in terms[: int(limit or 100)]
+    ]
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument(
+        "--start-date", type=date.fromisoformat, default=date(2024, 1, 1)
+    )
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--narrative-length", type=int, default=800)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_stub_app(
+        records_per_code=args.records,
+        start_date=args.start_date,
+        days=args.days,
+        narrative_length=args.narrative_length,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
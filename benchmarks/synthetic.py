@@ -0,0 +1,127 @@
+import random
+from datetime import date, timedelta
+from typing import List
+
+EVENT_TYPES = ["Malfunction", "Injury", "Death", "Other", "No answer provided"]
+MANUFACTURERS = [
+    "ACME MEDICAL INC.",
+    "GLOBEX HEALTHCARE",
+    "INITECH DEVICES LLC",
+    "UMBRELLA BIOMEDICAL",
+]
+BRANDS = ["FLOWSAFE", "INFUSAMAX", "PUMPRITE", "VITALINE"]
+DEVICE_PROBLEMS = [
+    "Adverse Event Without Identified Device or Use Problem",
+    "Break",
+    "Fluid/Blood Leak",
+    "Occlusion Within Device",
+    "Material Rupture",
+]
+PATIENT_PROBLEMS = [
+    "No Clinical Signs, Symptoms or Conditions",
+    "No Known Impact Or Consequence To Patient",
+    "Pain",
+    "Swelling/ Edema",
+    "Bruise/Contusion",
+]
+WORDS = (
+    "the patient reported that device was found leaking during use and "
+    "was replaced no further complications were reported investigation "
+    "of the returned sample confirmed a crack near the connector"
+).split()
+
+
+def narrative(rng: random.Random, length: int) -> str:
+    """Random narrative text of roughly `length` characters"""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words).upper()
+
+
+def make_record(
+    rng: random.Random,
+    index: int,
+    date_received: date,
+    product_code: str = "FKX",
+    narrative_length: int = 800,
+) -> dict:
+    """One synthetic record shaped like an openFDA device event"""
+    mdr_report_key = str(10000000 + index)
+    mdr_text = [
+        {
+            "mdr_text_key": f"{mdr_report_key}1",
+            "text_type_code": "Description of Event or Problem",
+            "patient_sequence_number": "1",
+            "text": narrative(rng, narrative_length),
+        }
+    ]
+    for n in range(rng.randint(0, 2)):
+        mdr_text.append(
+            {
+                "mdr_text_key": f"{mdr_report_key}{n + 2}",
+                "text_type_code": "Additional Manufacturer Narrative",
+                "patient_sequence_number": "1",
+                "text": narrative(rng, narrative_length // 2),
+            }
+        )
+    return {
+        "mdr_report_key": mdr_report_key,
+        "report_number": f"{rng.randint(1000000, 9999999)}-2024-{index:05d}",
+        "event_type": rng.choice(EVENT_TYPES),
+        "date_received": date_received.strftime("%Y%m%d"),
+        "date_of_event": (date_received - timedelta(days=rng.randint(0, 60))).strftime(
+            "%Y%m%d"
+        ),
+        "report_source_code": "Manufacturer report",
+        "pma_pmn_number": f"K{rng.randint(100000, 999999)}",
+        "exemption_number": "",
+        "product_problems": rng.sample(DEVICE_PROBLEMS, rng.randint(1, 2)),
+        "device": [
+            {
+                "device_sequence_number": "1",
+                "brand_name": rng.choice(BRANDS),
+                "generic_name": "SET, ADMINISTRATION, INTRAVASCULAR",
+                "manufacturer_d_name": rng.choice(MANUFACTURERS),
+                "device_report_product_code": product_code,
+                "openfda": {"device_name": "Set, Administration, Intravascular"},
+            }
+        ],
+        "patient": [
+            {
+                "patient_sequence_number": "1",
+                "patient_problems": rng.sample(PATIENT_PROBLEMS, rng.randint(1, 3)),
+            }
+        ],
+        "mdr_text": mdr_text,
+    }
+
+
+def make_records(
+    count: int,
+    start_date: date = date(2024, 1, 1),
+    days: int = 90,
+    product_code: str = "FKX",
+    narrative_length: int = 800,
+    seed: int = 42,
+) -> List[dict]:
+    """
+    Build `count` synthetic records spread over `days` days, ordered by
+    date_received like openFDA sorted pages.
+    """
+    rng = random.Random(seed)
+    records = [
+        make_record(
+            rng,
+            index,
+            start_date + timedelta(days=rng.randrange(days)),
+            product_code=product_code,
+            narrative_length=narrative_length,
+        )
+        for index in range(count)
+    ]
+    records.sort(key=lambda record: record["date_received"])
+    return records
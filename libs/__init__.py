@@ -1,5 +1,18 @@
-from .http_client import HTTPXClient
-from .db import PostgresConnector
+from importlib import import_module
+
 from .logger import logger
 
+# Imported on first use, so that importing one submodule (e.g. in an export
+# worker process) does not load the HTTP client or the Postgres driver
+_LAZY_EXPORTS = {
+    "HTTPXClient": "libs.http_client",
+    "PostgresConnector": "libs.db",
+}
+
 __all__ = ["HTTPXClient", "PostgresConnector", "logger"]
+
+
+def __getattr__(name: str):
+    if name in _LAZY_EXPORTS:
+        return getattr(import_module(_LAZY_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
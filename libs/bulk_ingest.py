@@ -0,0 +1,183 @@
+import csv
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import ijson
+
+from libs.db import PostgresConnector
+from libs.fda_records import CSV_FIELDNAMES, extract_row
+from libs.ingest import DeviceEventLoader
+from libs.logger import logger
+
+
+def iter_partition_records(path: str) -> Iterator[dict]:
+    """
+    Stream the records of an openFDA bulk download partition.
+
+    The zip members are parsed incrementally, so only one record is held
+    in memory at a time no matter how large the partition is.
+
+    Args:
+        path: Path to a device-event-*.json.zip file (or a plain .json file)
+
+    Yields:
+        openFDA device event records
+    """
+    if not zipfile.is_zipfile(path):
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "results.item", use_float=True)
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            if not member.endswith(".json"):
+                continue
+            with archive.open(member) as f:
+                yield from ijson.items(f, "results.item", use_float=True)
+
+
+def matches_product_codes(record: dict, product_codes: Optional[set]) -> bool:
+    """Whether any device of the record has one of the product codes"""
+    if not product_codes:
+        return True
+    for device in record.get("device") or []:
+        if device.get("device_report_product_code") in product_codes:
+            return True
+    return False
+
+
+def write_partition_csv(records: Iterable[dict], output_path: str) -> int:
+    """
+    Write records as CSV (same columns as /downloads/csv).
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDNAMES)
+        for record in records:
+            writer.writerow(extract_row(record))
+            rows += 1
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def load_partition_db(records: Iterable[dict], db_config: Dict, batch_size: int) -> int:
+    """
+    Load records into the local mirror over a connection of this process.
+
+    Returns:
+        Number of rows inserted or updated
+    """
+    connector = PostgresConnector(db_config)
+    if not connector.connect():
+        raise RuntimeError("Could not connect to the database")
+    try:
+        loader = DeviceEventLoader(connector, batch_size=batch_size)
+        return loader.load(records)
+    finally:
+        connector.close()
+
+
+def process_partition(
+    path: str,
+    product_codes: Optional[List[str]],
+    output: str,
+    output_dir: Optional[str] = None,
+    db_config: Optional[Dict] = None,
+    batch_size: int = 10000,
+) -> dict:
+    """
+    Filter one partition and emit it as CSV or load it into the database.
+
+    Runs inside a worker process; everything it needs is passed as plain,
+    picklable arguments.
+
+    Returns:
+        Summary with the partition path, records scanned and records emitted
+    """
+    codes = set(product_codes) if product_codes else None
+    scanned = 0
+
+    def filtered():
+        nonlocal scanned
+        for record in iter_partition_records(path):
+            scanned += 1
+            if matches_product_codes(record, codes):
+                yield record
+
+    records = filtered()
+    if output == "csv":
+        name = os.path.basename(path)
+        for suffix in (".zip", ".json"):
+            if name.endswith(suffix):
+                name = name[: -len(suffix)]
+        emitted = write_partition_csv(records, os.path.join(output_dir, f"{name}.csv"))
+    elif output == "db":
+        emitted = load_partition_db(records, db_config, batch_size)
+    else:
+        raise ValueError(f"Unknown output: {output}")
+
+    return {"path": path, "scanned": scanned, "emitted": emitted}
+
+
+def ingest_partitions(
+    paths: List[str],
+    product_codes: Optional[List[str]],
+    output: str,
+    output_dir: Optional[str] = None,
+    db_config: Optional[Dict] = None,
+    workers: Optional[int] = None,
+    batch_size: int = 10000,
+) -> List[dict]:
+    """
+    Ingest openFDA bulk partitions in parallel, one partition per worker.
+
+    Args:
+        paths: Partition files to read
+        product_codes: Keep only events for these product codes (None keeps all)
+        output: "csv" to write one CSV per partition, "db" to load the mirror
+        output_dir: Target folder for CSV output
+        db_config: psycopg2 connection parameters for database output
+        workers: Worker processes (defaults to the number of CPUs)
+        batch_size: Records per COPY batch for database output
+
+    Returns:
+        Per-partition summaries, in completion order
+    """
+    if output == "csv":
+        os.makedirs(output_dir, exist_ok=True)
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                process_partition,
+                path,
+                product_codes,
+                output,
+                output_dir,
+                db_config,
+                batch_size,
+            ): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                logger.exception(f"Failed to ingest {path}: {str(e)}")
+                summary = {"path": path, "error": str(e)}
+            else:
+                logger.info(
+                    f"Ingested {path}: {summary['emitted']} of "
+                    f"{summary['scanned']} records kept"
+                )
+            summaries.append(summary)
+    return summaries
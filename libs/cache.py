@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+from libs.logger import logger
+
+
+def _json_size(value: Any) -> int:
+    """Approximate in-memory cost of a value by its JSON encoded length"""
+    return len(orjson.dumps(value))
+
+
+class LRUCache:
+    def __init__(self, max_bytes: int):
+        """
+        In-process cache evicting least recently used entries by total size.
+
+        Sizes are whatever the caller passes to `set`; TieredCache uses the
+        JSON encoded length, so the bound is approximate, not the exact
+        memory held by the decoded values.
+
+        Args:
+            max_bytes: Upper bound for the summed size of all cached entries
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, size = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.current_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int):
+        """Store a value of the given size, evicting old entries to make room"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (time.time() + ttl, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        """
+        On-disk cache with one JSON file per entry, surviving restarts.
+
+        When a write takes the files over `max_bytes`, the least recently used
+        ones (by modification time, refreshed on reads) are deleted until they
+        fit in 90% of it, so eviction does not run on every write.
+
+        Args:
+            directory: Folder holding the cache files (created if missing)
+            max_bytes: Upper bound for the summed size of the files, or None
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current_bytes = sum(size for _, _, size in self._files())
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, int]]:
+        """
+        Read an entry from disk.
+
+        Returns:
+            (value, remaining ttl, size in bytes), or None if missing or expired
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            entry = orjson.loads(payload)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache file {path}: {str(e)}")
+            self._remove(path)
+            return None
+
+        remaining = entry["expires_at"] - time.time()
+        if remaining <= 0 or entry.get("key") != key:
+            self._remove(path)
+            return None
+        if self.max_bytes is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return entry["value"], remaining, len(payload)
+
+    def set(self, key: str, value: Any, ttl: float) -> int:
+        """
+        Write an entry atomically.
+
+        Returns:
+            Size of the written file in bytes
+        """
+        path = self._path(key)
+        payload = orjson.dumps(
+            {"key": key, "expires_at": time.time() + ttl, "value": value}
+        )
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self.current_bytes += len(payload) - replaced
+            over_limit = (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            )
+        if over_limit:
+            self.evict(int(self.max_bytes * 0.9))
+        return len(payload)
+
+    def evict(self, target_bytes: int) -> int:
+        """
+        Delete the least recently used files until the rest fit in
+        `target_bytes`.
+
+        Returns:
+            Number of files removed
+        """
+        files = sorted(self._files())
+        total = sum(size for _, _, size in files)
+        removed = 0
+        for _, path, size in files:
+            if total <= target_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} entries from {self.directory}")
+        return removed
+
+    def _files(self) -> List[Tuple[float, str, int]]:
+        """(modification time, path, size) of every cache file"""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def prune(self) -> int:
+        """
+        Delete expired entries, then the least recently used ones if the rest
+        still exceed `max_bytes`.
+
+        Returns:
+            Number of files removed
+        """
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as f:
+                    expires_at = orjson.loads(f.read())["expires_at"]
+            except (OSError, ValueError, KeyError):
+                expires_at = 0
+            if expires_at <= now:
+                self._remove(path)
+                removed += 1
+        if self.max_bytes is not None and self.current_bytes > self.max_bytes:
+            removed += self.evict(int(self.max_bytes * 0.9))
+        return removed
+
+    def _remove(self, path: str):
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            self.current_bytes -= size
+
+
+class TieredCache:
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        """
+        Two-tier cache: an in-process LRU in front of an optional disk tier.
+
+        Values must be JSON serializable. Disk I/O runs in a worker thread so
+        the event loop is never blocked.
+
+        Args:
+            memory: In-process tier
+            disk: Persistent tier, or None for memory only
+        """
+        self.memory = memory
+        self.disk = disk
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look a key up in memory, then on disk (promoting disk hits)"""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                value, remaining, size = entry
+                self.memory.set(key, value, remaining, size)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        """Store a value in both tiers for `ttl` seconds"""
+        if self.disk is not None:
+            try:
+                size = await asyncio.to_thread(self.disk.set, key, value, ttl)
+            except OSError as e:
+                logger.warning(f"Could not write cache entry to disk: {str(e)}")
+                size = await asyncio.to_thread(_json_size, value)
+        else:
+            size = await asyncio.to_thread(_json_size, value)
+        self.memory.set(key, value, ttl, size)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory usage"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (
+                (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+            ),
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.current_bytes,
+        }
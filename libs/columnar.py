@@ -0,0 +1,209 @@
+import asyncio
+import time
+from datetime import date
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional
+from typing import Sequence, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar exports are optional
+    pa = None
+
+from libs.csv_export import aiter_records
+from libs.fda_records import CSV_FIELDNAMES
+from libs.metrics import observe_stage
+
+# Columns holding "MM-DD-YYYY 00:00:00" dates, stored as date32
+DATE_COLUMNS = {"Event Date", "Date Received"}
+# Integer columns
+INT_COLUMNS = {"Number of Events"}
+# Low-cardinality text, dictionary-encoded in Arrow (Parquet dictionary-encodes
+# every column and falls back to plain pages where that does not pay off)
+DICTIONARY_COLUMNS = {
+    "Event Type",
+    "Manufacturer",
+    "Product Code",
+    "Brand Name",
+    "Device Problem",
+    "Patient Problem",
+    "PMA/PMN Number",
+    "Exemption Number",
+}
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Rows per Parquet row group / Arrow record batch
+DEFAULT_BATCH_ROWS = 10000
+
+
+def columnar_available() -> bool:
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+
+def export_schema() -> "pa.Schema":
+    """Arrow schema of the export, with the CSV columns in CSV order"""
+    fields = []
+    for name in CSV_FIELDNAMES:
+        if name in DATE_COLUMNS:
+            type_ = pa.date32()
+        elif name in INT_COLUMNS:
+            type_ = pa.int32()
+        elif name in DICTIONARY_COLUMNS:
+            type_ = pa.dictionary(pa.int32(), pa.string())
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(name, type_))
+    return pa.schema(fields)
+
+
+def parse_csv_date(value: str) -> Optional[date]:
+    """Parse a "MM-DD-YYYY 00:00:00" CSV date, or None if empty or invalid"""
+    if not value or len(value) < 10:
+        return None
+    try:
+        return date(int(value[6:10]), int(value[0:2]), int(value[3:5]))
+    except ValueError:
+        return None
+
+
+def rows_to_batch(rows: List[Sequence], schema: "pa.Schema") -> "pa.RecordBatch":
+    """
+    Build a typed record batch from rows in CSV_FIELDNAMES order.
+
+    Rows are the CSV rows of either source (extract_row output or the
+    database's CSV_SELECT), so both produce the same file.
+    """
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if field.name in DATE_COLUMNS:
+            arrays.append(pa.array([parse_csv_date(v) for v in values], pa.date32()))
+        elif field.name in INT_COLUMNS:
+            arrays.append(
+                pa.array(
+                    [int(v) if v not in ("", None) else None for v in values]
+                ).cast(pa.int32())
+            )
+        elif field.name in DICTIONARY_COLUMNS:
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object collecting what a writer produced since last drain"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ColumnarWriter:
+    def __init__(self, fmt: str):
+        """
+        Incremental Parquet or Arrow IPC stream writer.
+
+        Every `write` adds one row group (Parquet) or record batch (Arrow) and
+        returns the bytes produced so far, so the file can be streamed.
+
+        Args:
+            fmt: "parquet" or "arrow"
+        """
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.schema = export_schema()
+        self._sink = _ChunkSink()
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(
+                self._sink, self.schema, compression="zstd", use_dictionary=True
+            )
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def write(self, rows: List[Sequence]) -> bytes:
+        self._writer.write_batch(rows_to_batch(rows, self.schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+async def iter_columnar(
+    items: Union[Iterable, AsyncIterable],
+    fmt: str,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    to_row: Optional[Callable] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream items as a Parquet file or Arrow IPC stream, one batch at a time.
+
+    At most `batch_rows` items are held in memory. Conversion and encoding
+    run in a worker thread; pyarrow releases the GIL for most of it.
+
+    Args:
+        items: CSV rows, or records turned into rows by `to_row`
+        fmt: "parquet" or "arrow"
+        batch_rows: Rows per row group / record batch
+        to_row: Optional function turning an item into a CSV row
+
+    Yields:
+        Chunks of the encoded file
+    """
+    writer = ColumnarWriter(fmt)
+    seconds = {"extract": 0.0, "columnar_encode": 0.0}
+
+    def write(batch):
+        started = time.perf_counter()
+        if to_row is not None:
+            batch = [to_row(item) for item in batch]
+        extracted = time.perf_counter()
+        data = writer.write(batch)
+        seconds["extract"] += extracted - started
+        seconds["columnar_encode"] += time.perf_counter() - extracted
+        return data
+
+    try:
+        batch = []
+        async for item in aiter_records(items):
+            batch.append(item)
+            if len(batch) >= batch_rows:
+                data = await asyncio.to_thread(write, batch)
+                batch = []
+                if data:
+                    yield data
+        if batch:
+            data = await asyncio.to_thread(write, batch)
+            if data:
+                yield data
+        yield await asyncio.to_thread(writer.close)
+    finally:
+        if to_row is not None:
+            observe_stage("extract", seconds["extract"])
+        observe_stage("columnar_encode", seconds["columnar_encode"])
@@ -0,0 +1,266 @@
+import asyncio
+import zlib
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+# Content types worth compressing; everything else is passed through
+COMPRESSIBLE_TYPES = ("text/", "application/json")
+
+
+def available_encodings() -> List[str]:
+    """Content codings this server can produce, most preferred first"""
+    if zstandard is not None:
+        return ["zstd", "gzip"]
+    return ["gzip"]
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str], supported: List[str]
+) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    The client's q-values win; ties go to the order of `supported`.
+
+    Args:
+        accept_encoding: Value of the Accept-Encoding request header
+        supported: Codings the server can produce, most preferred first
+
+    Returns:
+        The chosen coding, or None to send the body as-is
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str, gzip_level: int = 6, zstd_level: int = 3):
+        """
+        Incremental gzip or zstd compressor.
+
+        Every `compress` call flushes, so each chunk can be sent right away
+        and the client decodes the stream as it arrives.
+
+        Args:
+            encoding: "gzip" or "zstd"
+            gzip_level: zlib compression level (1-9)
+            zstd_level: zstd compression level (1-22)
+        """
+        self.encoding = encoding
+        if encoding == "gzip":
+            # wbits=31 writes a gzip header and trailer
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        elif encoding == "zstd" and zstandard is not None:
+            self._zstd = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it"""
+        if self.encoding == "gzip":
+            return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+        return self._zstd.compress(data) + self._zstd.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """Compress the last chunk and end the stream"""
+        if self.encoding == "gzip":
+            return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH)
+        return self._zstd.compress(data) + self._zstd.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH
+        )
+
+
+async def aiter_gzip(
+    chunks: AsyncIterable[Union[str, bytes]], level: int = 6
+) -> AsyncIterator[bytes]:
+    """
+    Compress a stream of chunks into a gzip file, chunk by chunk.
+
+    zlib releases the GIL, so compression runs in a worker thread without
+    holding up the event loop.
+    """
+    compressor = StreamCompressor("gzip", gzip_level=level)
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        yield await asyncio.to_thread(compressor.compress, chunk)
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        encodings: Optional[List[str]] = None,
+    ):
+        """
+        ASGI middleware compressing text and JSON responses on the fly.
+
+        The coding (zstd or gzip) is negotiated from Accept-Encoding, and
+        streamed bodies are compressed chunk by chunk, in a worker thread,
+        as they are sent. Only complete (200) text and JSON responses are
+        negotiated, and those always get Vary: Accept-Encoding. Anything
+        else - partial content, responses offering byte ranges or already
+        carrying a Content-Encoding - is left alone, since ranges and
+        validators refer to the unencoded body.
+
+        Args:
+            app: ASGI application to wrap
+            minimum_size: Complete bodies smaller than this are sent as-is
+            gzip_level: zlib compression level (1-9)
+            zstd_level: zstd compression level (1-22)
+            encodings: Codings to offer, most preferred first (default: all
+                available)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.encodings = [
+            coding
+            for coding in (encodings or available_encodings())
+            if coding in available_encodings()
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1"), self.encodings
+        )
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Rewrites the messages of one response, compressing its body"""
+
+    def __init__(
+        self, middleware: CompressionMiddleware, encoding: Optional[str], send
+    ):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[dict] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message: dict):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            if not is_negotiable(message):
+                self.passthrough = True
+                return
+            self._add_vary()
+            if self.encoding is None:
+                self.passthrough = True
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._flush_start()
+                await self._send(message)
+                return
+            self.compressor = StreamCompressor(
+                self.encoding,
+                gzip_level=self.middleware.gzip_level,
+                zstd_level=self.middleware.zstd_level,
+            )
+            self._rewrite_start_headers()
+            await self._flush_start()
+
+        # zlib and zstd release the GIL, so the event loop keeps running
+        if more_body:
+            data = await asyncio.to_thread(self.compressor.compress, body)
+        else:
+            data = await asyncio.to_thread(self.compressor.finish, body)
+        if data or not more_body:
+            await self._send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+
+    def _rewrite_start_headers(self):
+        headers = []
+        for name, value in self.start_message.get("headers", []):
+            if name.lower() == b"content-length":
+                continue
+            if name.lower() == b"etag" and not value.startswith(b"W/"):
+                # The encoded body is not byte-identical to the original
+                value = b"W/" + value
+            headers.append((name, value))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        self.start_message = {**self.start_message, "headers": headers}
+
+    def _add_vary(self):
+        headers = list(self.start_message.get("headers", []))
+        vary = [value for name, value in headers if name.lower() == b"vary"]
+        if not any(b"accept-encoding" in value.lower() for value in vary):
+            headers.append((b"vary", b"Accept-Encoding"))
+            self.start_message = {**self.start_message, "headers": headers}
+
+    async def _flush_start(self):
+        if self.start_message is not None:
+            message, self.start_message = self.start_message, None
+            await self._send(message)
+
+
+def is_negotiable(start_message: dict) -> bool:
+    """Whether a response may be sent with a negotiated content coding"""
+    if start_message.get("status", 200) != 200:
+        return False
+    headers = _header_dict(start_message.get("headers", []))
+    if (
+        b"content-encoding" in headers
+        or b"content-range" in headers
+        or b"accept-ranges" in headers
+    ):
+        return False
+    content_type = headers.get(b"content-type", b"").decode("latin-1")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _header_dict(headers: List[Tuple[bytes, bytes]]) -> Dict[bytes, bytes]:
+    return {name.lower(): value for name, value in headers}
@@ -0,0 +1,75 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+
+def make_etag(*parts) -> str:
+    """
+    Weak entity tag fingerprinting the given parts.
+
+    Weak, because the same content may be sent with different content
+    codings by the compression middleware.
+    """
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8"))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def http_date(moment: datetime) -> str:
+    """Format a timestamp as an HTTP date (naive timestamps are UTC)"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    """Parse an HTTP date, or None if it is not one"""
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an entity tag"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> bool:
+    """
+    Whether a GET can be answered with 304 Not Modified.
+
+    If-Modified-Since is only considered when If-None-Match is absent, as
+    RFC 9110 requires.
+
+    Args:
+        if_none_match: Value of the If-None-Match request header
+        if_modified_since: Value of the If-Modified-Since request header
+        etag: Current entity tag of the resource
+        last_modified: When the resource last changed, if known
+    """
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if if_modified_since is None or last_modified is None:
+        return False
+    since = parse_http_date(if_modified_since)
+    if since is None:
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= since
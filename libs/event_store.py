@@ -0,0 +1,255 @@
+from datetime import date, datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from libs.async_db import AsyncPostgresPool
+from libs.search_index import RESULT_FIELDS
+
+# CSV columns rendered by the database, in CSV_FIELDNAMES order and
+# formatted exactly like extract_specific_fields
+CSV_SELECT = """
+SELECT
+    COALESCE(web_address, ''),
+    COALESCE(report_number, ''),
+    COALESCE(to_char(event_date, 'MM-DD-YYYY') || ' 00:00:00', ''),
+    COALESCE(event_type, ''),
+    COALESCE(manufacturer, ''),
+    COALESCE(to_char(date_received, 'MM-DD-YYYY') || ' 00:00:00', ''),
+    COALESCE(product_code, ''),
+    COALESCE(brand_name, ''),
+    COALESCE(device_problem, ''),
+    COALESCE(patient_problem, ''),
+    COALESCE(pma_pmn_number, ''),
+    COALESCE(exemption_number, ''),
+    number_of_events::text,
+    COALESCE(event_text, '')
+FROM device_events
+WHERE product_code = ANY($1::text[]) AND date_received BETWEEN $2 AND $3
+  AND ($5::timestamptz IS NULL OR updated_at > $5)
+ORDER BY date_received, mdr_report_key
+LIMIT $4
+"""
+
+RAW_SELECT = """
+SELECT raw::text
+FROM device_events
+WHERE product_code = ANY($1::text[]) AND date_received BETWEEN $2 AND $3
+ORDER BY date_received, mdr_report_key
+LIMIT $4
+"""
+
+EXISTS_SELECT = """
+SELECT EXISTS (
+    SELECT 1 FROM device_events
+    WHERE product_code = ANY($1::text[]) AND date_received BETWEEN $2 AND $3
+      AND ($4::timestamptz IS NULL OR updated_at > $4)
+)
+"""
+
+# Fingerprint of the reports in a range: how many there are and when the
+# last one was added or changed (reports are never deleted from the mirror)
+VERSION_SELECT = """
+SELECT count(*), max(updated_at)
+FROM device_events
+WHERE product_code = ANY($1::text[]) AND date_received BETWEEN $2 AND $3
+  AND ($4::timestamptz IS NULL OR updated_at > $4)
+"""
+
+# Top values of one rollup dimension over a date range
+COUNTS_SELECT = """
+SELECT value, SUM(events)::bigint AS events
+FROM device_event_daily_counts
+WHERE dimension = $1 AND product_code = ANY($2::text[]) AND day BETWEEN $3 AND $4
+GROUP BY value
+ORDER BY events DESC, value
+LIMIT $5
+"""
+
+# Events per month, from the event_type rollup (one per report)
+MONTH_COUNTS_SELECT = """
+SELECT to_char(day, 'YYYY-MM') AS month, SUM(events)::bigint AS events
+FROM device_event_daily_counts
+WHERE dimension = 'event_type' AND product_code = ANY($1::text[])
+  AND day BETWEEN $2 AND $3
+GROUP BY month
+ORDER BY month
+"""
+
+# Full-text search over the search_vector column (see SEARCH_SCHEMA_SQL).
+# Hits are ranked first; headlines are only built for the returned page.
+SEARCH_SELECT = """
+WITH query AS (SELECT websearch_to_tsquery('english', $1) AS q),
+top AS (
+    SELECT e.mdr_report_key, ts_rank_cd(e.search_vector, query.q) AS rank
+    FROM device_events e, query
+    WHERE e.search_vector @@ query.q
+      AND e.product_code = ANY($2::text[])
+      AND ($3::date IS NULL OR e.date_received >= $3)
+      AND ($4::date IS NULL OR e.date_received <= $4)
+    ORDER BY rank DESC, e.date_received DESC, e.mdr_report_key
+    LIMIT $5 OFFSET $6
+)
+SELECT e.mdr_report_key, e.report_number, e.product_code,
+       e.date_received::text, e.event_type, e.manufacturer, e.brand_name,
+       e.web_address, top.rank,
+       ts_headline('english', COALESCE(e.event_text, ''), query.q,
+                   'StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=24')
+FROM top
+JOIN device_events e USING (mdr_report_key)
+CROSS JOIN query
+ORDER BY top.rank DESC, e.date_received DESC, e.mdr_report_key
+"""
+
+
+class DeviceEventStore:
+    def __init__(self, pool: AsyncPostgresPool, prefetch: int = 1000):
+        """
+        Read device events from the local mirror built by DeviceEventLoader.
+
+        Args:
+            pool: Open asynchronous connection pool
+            prefetch: Rows fetched per server-side cursor round trip
+        """
+        self.pool = pool
+        self.prefetch = prefetch
+
+    async def has_events(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        since: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Whether any event for the product codes falls in the date range (and
+        was added or changed after `since`)
+        """
+        return await self.pool.fetchval(
+            EXISTS_SELECT, list(product_codes), start_date, end_date, since
+        )
+
+    async def version(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        since: Optional[datetime] = None,
+    ) -> Tuple[int, Optional[datetime]]:
+        """
+        Number of events in the range and when one was last added or changed.
+
+        Args:
+            product_codes: Device product codes
+            start_date: Start of the date_received range
+            end_date: End of the date_received range
+            since: Only count events added or changed after this time
+
+        Returns:
+            (count, last updated_at), the latter None without events
+        """
+        rows = await self.pool.fetch(
+            VERSION_SELECT, list(product_codes), start_date, end_date, since
+        )
+        return rows[0][0], rows[0][1]
+
+    async def iter_csv_rows(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        limit: int,
+        since: Optional[datetime] = None,
+    ) -> AsyncIterator[tuple]:
+        """
+        Stream CSV-ready rows ordered by date_received, optionally only of
+        the events added or changed after `since`
+        """
+        async for row in self.pool.iter_rows(
+            CSV_SELECT,
+            list(product_codes),
+            start_date,
+            end_date,
+            limit,
+            since,
+            prefetch=self.prefetch,
+        ):
+            yield tuple(row)
+
+    async def iter_raw_json(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        limit: int,
+    ) -> AsyncIterator[str]:
+        """Stream the original openFDA records as JSON text"""
+        async for row in self.pool.iter_rows(
+            RAW_SELECT,
+            list(product_codes),
+            start_date,
+            end_date,
+            limit,
+            prefetch=self.prefetch,
+        ):
+            yield row[0]
+
+    async def count_by(
+        self,
+        dimension: str,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        limit: int,
+    ) -> List[dict]:
+        """
+        Count events per value of a dimension from the rollup tables.
+
+        Args:
+            dimension: event_type, manufacturer, patient_problem or month
+            product_codes: Device product codes
+            start_date: Start of the date_received range
+            end_date: End of the date_received range
+            limit: Number of values to return (ignored for month)
+
+        Returns:
+            {"term", "count"} items, largest first (chronological for month)
+        """
+        if dimension == "month":
+            rows = await self.pool.fetch(
+                MONTH_COUNTS_SELECT, list(product_codes), start_date, end_date
+            )
+        else:
+            rows = await self.pool.fetch(
+                COUNTS_SELECT,
+                dimension,
+                list(product_codes),
+                start_date,
+                end_date,
+                limit,
+            )
+        return [{"term": row[0], "count": row[1]} for row in rows]
+
+    async def search(
+        self,
+        query: str,
+        product_codes: Sequence[str],
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: int,
+        offset: int = 0,
+    ) -> List[dict]:
+        """
+        Find reports matching a web-search style query, best matches first.
+
+        Returns:
+            Hits with the RESULT_FIELDS keys
+        """
+        rows = await self.pool.fetch(
+            SEARCH_SELECT,
+            query,
+            list(product_codes),
+            start_date,
+            end_date,
+            limit,
+            offset,
+        )
+        return [dict(zip(RESULT_FIELDS, row)) for row in rows]
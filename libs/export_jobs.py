@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from libs.logger import logger
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Opens the export for a job: gets a progress callback, returns the file chunks
+ChunkOpener = Callable[
+    [Callable[[int], None]], Awaitable[AsyncIterator[Union[str, bytes]]]
+]
+
+
+def job_key(params: dict) -> str:
+    """Stable key of a job's parameters, used to deduplicate jobs"""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExportJob:
+    def __init__(
+        self,
+        job_id: str,
+        key: str,
+        params: dict,
+        filename: str,
+        media_type: str,
+        limit: int,
+    ):
+        """
+        State of one background export.
+
+        Args:
+            job_id: Unique job id
+            key: Parameter key (see job_key)
+            params: Export parameters, as requested
+            filename: Name the file is downloaded as
+            media_type: Content type of the file
+            limit: Maximum number of records, used to report progress
+        """
+        self.id = job_id
+        self.key = key
+        self.params = params
+        self.filename = filename
+        self.media_type = media_type
+        self.limit = limit
+        self.status = PENDING
+        self.records = 0
+        self.bytes_written = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        """Fraction done; `limit` is an upper bound until the job completes"""
+        if self.status == COMPLETED:
+            return 1.0
+        return min(1.0, self.records / self.limit) if self.limit else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "key": self.key,
+            "params": self.params,
+            "filename": self.filename,
+            "media_type": self.media_type,
+            "limit": self.limit,
+            "status": self.status,
+            "records": self.records,
+            "bytes_written": self.bytes_written,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExportJob":
+        job = cls(
+            data["id"],
+            data["key"],
+            data["params"],
+            data["filename"],
+            data["media_type"],
+            data["limit"],
+        )
+        for name in (
+            "status",
+            "records",
+            "bytes_written",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ):
+            setattr(job, name, data.get(name))
+        return job
+
+
+class ExportJobManager:
+    def __init__(self, directory: str, max_workers: int = 2, retention: float = 86400):
+        """
+        Run exports in the background and keep their files on disk.
+
+        Jobs with the same parameters are deduplicated while they are pending
+        or running, and once completed for as long as the caller considers
+        the data fresh (see `submit`). Job metadata is stored next to the
+        files, so completed jobs survive restarts.
+
+        Args:
+            directory: Folder holding the files and job metadata
+            max_workers: Jobs running at the same time
+            retention: Seconds a finished job (and its file) is kept
+        """
+        self.directory = directory
+        self.retention = retention
+        self.jobs: Dict[str, ExportJob] = {}
+        self._by_key: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_workers)
+        os.makedirs(directory, exist_ok=True)
+
+    def file_path(self, job: ExportJob) -> str:
+        return os.path.join(self.directory, f"{job.id}.data")
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: ExportJob):
+        path = self._meta_path(job.id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def _remove(self, job: ExportJob):
+        for path in (
+            self.file_path(job),
+            f"{self.file_path(job)}.part",
+            self._meta_path(job.id),
+        ):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.jobs.pop(job.id, None)
+        if self._by_key.get(job.key) == job.id:
+            del self._by_key[job.key]
+
+    def load(self) -> int:
+        """
+        Restore jobs from disk, dropping expired ones. Jobs that were still
+        running when the process stopped are marked failed.
+
+        Returns:
+            Number of jobs restored
+        """
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    job = ExportJob.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable export job {name}: {str(e)}")
+                continue
+            self.jobs[job.id] = job
+            if job.status in (PENDING, RUNNING):
+                job.status = FAILED
+                job.error = "Interrupted by a restart"
+                job.finished_at = time.time()
+                self._save(job)
+            elif job.status == COMPLETED:
+                self._by_key[job.key] = job.id
+        self.prune()
+        return len(self.jobs)
+
+    def prune(self) -> int:
+        """
+        Delete finished jobs older than the retention period.
+
+        Returns:
+            Number of jobs removed
+        """
+        cutoff = time.time() - self.retention
+        expired = [
+            job
+            for job in self.jobs.values()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job in expired:
+            self._remove(job)
+        return len(expired)
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self.jobs.get(job_id)
+
+    def submit(
+        self,
+        params: dict,
+        filename: str,
+        media_type: str,
+        limit: int,
+        open_chunks: ChunkOpener,
+        max_age: Optional[float] = None,
+    ) -> Tuple[ExportJob, bool]:
+        """
+        Queue an export, or return the existing job with the same parameters.
+
+        Args:
+            params: Export parameters, used for deduplication
+            filename: Name the file is downloaded as
+            media_type: Content type of the file
+            limit: Maximum number of records, used to report progress
+            open_chunks: Starts the export (see ChunkOpener)
+            max_age: Seconds a completed job's file may be handed out again,
+                e.g. the cache TTL of its date range (default: retention)
+
+        Returns:
+            (job, whether it was newly created)
+        """
+        self.prune()
+        key = job_key(params)
+        existing = self.jobs.get(self._by_key.get(key, ""))
+        if existing is not None and existing.status != FAILED:
+            if existing.status != COMPLETED or max_age is None:
+                return existing, False
+            if existing.finished_at + max_age > time.time():
+                return existing, False
+
+        job = ExportJob(uuid.uuid4().hex, key, params, filename, media_type, limit)
+        self.jobs[job.id] = job
+        self._by_key[key] = job.id
+        self._save(job)
+        self._tasks[job.id] = asyncio.create_task(self._run(job, open_chunks))
+        return job, True
+
+    async def _run(self, job: ExportJob, open_chunks: ChunkOpener):
+        async with self._semaphore:
+            job.status = RUNNING
+            job.started_at = time.time()
+            await asyncio.to_thread(self._save, job)
+
+            def progress(records: int):
+                job.records = records
+
+            path = self.file_path(job)
+            part_path = f"{path}.part"
+            try:
+                chunks = await open_chunks(progress)
+                with open(part_path, "wb") as f:
+                    async for chunk in chunks:
+                        if isinstance(chunk, str):
+                            chunk = chunk.encode("utf-8")
+                        await asyncio.to_thread(f.write, chunk)
+                        job.bytes_written += len(chunk)
+                os.replace(part_path, path)
+                job.status = COMPLETED
+                logger.info(
+                    f"Export job {job.id} completed: {job.records} records, "
+                    f"{job.bytes_written} bytes"
+                )
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "Cancelled"
+                raise
+            except Exception as e:
+                logger.exception(f"Export job {job.id} failed: {str(e)}")
+                job.status = FAILED
+                job.error = getattr(e, "detail", None) or str(e)
+            finally:
+                job.finished_at = time.time()
+                if job.status != COMPLETED:
+                    try:
+                        os.remove(part_path)
+                    except OSError:
+                        pass
+                await asyncio.to_thread(self._save, job)
+                self._tasks.pop(job.id, None)
+
+    async def close(self):
+        """Cancel the jobs still queued or running"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
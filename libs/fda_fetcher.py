@@ -0,0 +1,838 @@
+import asyncio
+import heapq
+import io
+import math
+import time
+from collections import deque
+from datetime import date, timedelta
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, Tuple, Union
+
+import httpx
+import ijson
+
+from libs.cache import TieredCache
+from libs.http_client import HTTPXClient, HTTPError
+from libs.logger import logger
+from libs.metrics import observe_stage
+from libs.search_index import SearchIndex
+
+# openFDA hard limits: at most 1000 records per page and a skip of at most 25000
+MAX_PAGE_SIZE = 1000
+MAX_SKIP = 25000
+# Streamed records are handed to the search index in batches of this size
+INDEX_BATCH_RECORDS = 100
+
+
+def build_search(
+    product_code: Union[str, Sequence[str]],
+    start_date: date,
+    end_date: date,
+    since: Optional[date] = None,
+) -> str:
+    """
+    Build the openFDA search expression for a date range and one product
+    code, or any of several. With `since`, only reports received or changed
+    (a new report version) on or after that day match.
+    """
+    if not isinstance(product_code, str):
+        codes = list(product_code)
+        product_code = codes[0] if len(codes) == 1 else f"({'+'.join(codes)})"
+    start_date_str = start_date.strftime("%Y-%m-%d")
+    end_date_str = end_date.strftime("%Y-%m-%d")
+    search = (
+        f"device.device_report_product_code:{product_code}"
+        f"+AND+date_received:[{start_date_str}+TO+{end_date_str}]"
+    )
+    if since is not None:
+        since_str = since.strftime("%Y-%m-%d")
+        search += (
+            f"+AND+(date_received:[{since_str}+TO+{end_date_str}]"
+            f"+date_changed:[{since_str}+TO+{date.today():%Y-%m-%d}])"
+        )
+    return search
+
+
+def split_date_range(
+    start_date: date, end_date: date, parts: int
+) -> List[Tuple[date, date]]:
+    """
+    Split an inclusive date range into consecutive, non-overlapping sub-ranges.
+
+    Args:
+        start_date: First day of the range
+        end_date: Last day of the range
+        parts: Desired number of sub-ranges
+
+    Returns:
+        List of (start, end) tuples in ascending order
+    """
+    total_days = (end_date - start_date).days + 1
+    parts = max(1, min(parts, total_days))
+    span = math.ceil(total_days / parts)
+
+    ranges = []
+    current = start_date
+    while current <= end_date:
+        sub_end = min(current + timedelta(days=span - 1), end_date)
+        ranges.append((current, sub_end))
+        current = sub_end + timedelta(days=1)
+    return ranges
+
+
+def cache_ttl_for_range(
+    end_date: date,
+    recent_days: int,
+    recent_ttl: float,
+    historical_ttl: float,
+    today: Optional[date] = None,
+) -> float:
+    """
+    Pick a cache TTL for a date range based on how recent it is.
+
+    MAUDE reports for months that closed long ago rarely change, while the
+    last few months are still being filled in.
+
+    Args:
+        end_date: Last day of the queried range
+        recent_days: Ranges ending within this many days count as recent
+        recent_ttl: TTL in seconds for recent ranges
+        historical_ttl: TTL in seconds for historical ranges
+        today: Reference date (defaults to today)
+
+    Returns:
+        TTL in seconds
+    """
+    today = today or date.today()
+    if end_date >= today - timedelta(days=recent_days):
+        return recent_ttl
+    return historical_ttl
+
+
+def cache_key(
+    product_code: str,
+    start_date: date,
+    end_date: date,
+    limit: int,
+    since: Optional[date] = None,
+) -> str:
+    """Cache key of a complete record query"""
+    key = f"records:{product_code}:{start_date}:{end_date}:{limit}"
+    return key if since is None else f"{key}:since:{since}"
+
+
+def page_cache_key(url: str) -> str:
+    """Cache key of the raw body of a single page"""
+    return f"page:{url}"
+
+
+def parse_record_date(date_str: Optional[str]) -> Optional[date]:
+    """Parse an openFDA YYYYMMDD date, or None if invalid"""
+    try:
+        return date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_page_records(body: bytes) -> Iterator[dict]:
+    """Decode the records of a downloaded page one at a time"""
+    items = ijson.items(io.BytesIO(body), "results.item", use_float=True)
+    decoding = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                record = next(items)
+            except StopIteration:
+                return
+            finally:
+                decoding += time.perf_counter() - started
+            yield record
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON response: {e}") from e
+    finally:
+        observe_stage("json_decode", decoding)
+
+
+class _RecordStream:
+    """Bookkeeping of one streamed query, shared by all of its pages"""
+
+    def __init__(self, fetcher: "FDAFetcher"):
+        self.fetcher = fetcher
+        # Reports already yielded, as pages overlap once a query restarts
+        self.seen_keys = set()
+        self.emitted = 0
+        # Latest date_received seen, where a restarted query picks up
+        self.last_received = None
+        self._to_index = []
+
+    def accept(self, record: dict) -> bool:
+        """
+        Track a downloaded record and queue it for the search index.
+
+        Returns:
+            Whether to yield it (False for a report already yielded)
+        """
+        self._to_index.append(record)
+        if len(self._to_index) >= INDEX_BATCH_RECORDS:
+            self.flush_index()
+        self.last_received = record.get("date_received") or self.last_received
+        report_key = record.get("mdr_report_key")
+        if report_key:
+            if report_key in self.seen_keys:
+                return False
+            self.seen_keys.add(report_key)
+        self.emitted += 1
+        return True
+
+    def flush_index(self):
+        """Hand the records queued so far to the search index"""
+        self.fetcher.index_records(self._to_index)
+        self._to_index = []
+
+
+class FDAFetcher:
+    def __init__(
+        self,
+        http_client: HTTPXClient,
+        base_url: str,
+        page_size: int = MAX_PAGE_SIZE,
+        max_concurrency: int = 4,
+        cache: Optional[TieredCache] = None,
+        recent_days: int = 90,
+        recent_ttl: float = 3600,
+        historical_ttl: float = 30 * 24 * 3600,
+        prefetch_pages: int = 2,
+        search_index: Optional[SearchIndex] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+    ):
+        """
+        Fetch openFDA device events across as many pages as a query needs.
+
+        Args:
+            http_client: Client used for the upstream calls
+            base_url: openFDA endpoint, e.g. https://api.fda.gov/device/event.json
+            page_size: Records requested per page (capped at openFDA's 1000)
+            max_concurrency: Maximum number of pages in flight at once
+            cache: Optional response cache for complete queries and pages
+            recent_days: Ranges ending within this many days use `recent_ttl`
+            recent_ttl: Cache TTL in seconds for recent ranges
+            historical_ttl: Cache TTL in seconds for older ranges
+            search_index: Optional full-text index fed with every record
+                downloaded from openFDA
+            semaphore: Limit on upstream requests shared with other fetchers,
+                e.g. application-wide; defaults to one of `max_concurrency`
+        """
+        self.http_client = http_client
+        self.base_url = base_url
+        self.cache = cache
+        self.recent_days = recent_days
+        self.recent_ttl = recent_ttl
+        self.historical_ttl = historical_ttl
+        self.search_index = search_index
+        self.page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        self.max_concurrency = max(1, max_concurrency)
+        self.prefetch_pages = max(1, prefetch_pages)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.semaphore = semaphore
+
+    def build_url(self, search: str, limit: int, skip: int = 0) -> str:
+        """Build the URL of a single page, sorted so pages line up by date"""
+        return (
+            f"{self.base_url}"
+            f"?limit={limit}"
+            f"&skip={skip}"
+            f"&sort=date_received:asc"
+            f"&search={search}"
+        )
+
+    async def fetch_page(self, search: str, limit: int, skip: int = 0) -> dict:
+        """
+        Fetch a single page, treating openFDA's "no matches" 404 as empty.
+
+        Returns:
+            The decoded openFDA response (with at least a "results" key)
+        """
+        async with self.semaphore:
+            try:
+                return await self.http_client.async_get(
+                    self.build_url(search, limit, skip)
+                )
+            except HTTPError as e:
+                if e.status_code == 404:
+                    return {"meta": {"results": {"total": 0}}, "results": []}
+                raise
+
+    async def open_page_stream(
+        self, product_code: str, start_date: date, end_date: date, limit: int
+    ) -> Optional[httpx.Response]:
+        """
+        Request a single page and return it undecoded, for passthrough.
+
+        Returns:
+            The streamed upstream response (see HTTPXClient.open_stream), or
+            None when openFDA has no matches
+        """
+        search = build_search(product_code, start_date, end_date)
+        async with self.semaphore:
+            try:
+                return await self.http_client.open_stream(
+                    self.build_url(search, min(limit, MAX_PAGE_SIZE))
+                )
+            except HTTPError as e:
+                if e.status_code == 404:
+                    return None
+                raise
+
+    async def fetch_counts(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        count_field: str,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Run an openFDA count query, counted once per report across the codes.
+
+        Results are cached like record queries.
+
+        Args:
+            product_codes: Device product codes (reports matching any of them)
+            start_date: Start of the date_received range
+            end_date: End of the date_received range
+            count_field: Field to count, e.g. event_type.exact
+            limit: Number of terms to return (openFDA default 100, max 1000)
+
+        Returns:
+            openFDA count results: {"term", "count"} items, or {"time",
+            "count"} items for date fields
+        """
+        search = build_search(product_codes, start_date, end_date)
+        url = f"{self.base_url}?search={search}&count={count_field}"
+        if limit is not None:
+            url += f"&limit={limit}"
+
+        key = f"counts:{url}"
+        if self.cache is not None:
+            results = await self.cache.get(key)
+            if results is not None:
+                return results
+
+        async with self.semaphore:
+            try:
+                response = await self.http_client.async_get(url)
+                results = response.get("results") or []
+            except HTTPError as e:
+                if e.status_code != 404:
+                    raise
+                results = []
+
+        if self.cache is not None:
+            await self.cache.set(key, results, self.cache_ttl(end_date))
+        return results
+
+    async def fetch_version(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        since: Optional[date] = None,
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Number of matching reports and the date openFDA last updated them.
+
+        Costs a single one-record request, cached like record queries so it
+        stays consistent with cached results.
+
+        Returns:
+            (total, meta.last_updated as YYYY-MM-DD or None)
+        """
+        search = build_search(product_codes, start_date, end_date, since)
+        key = f"version:{search}"
+        if self.cache is not None:
+            version = await self.cache.get(key)
+            if version is not None:
+                return tuple(version)
+
+        page = await self.fetch_page(search, 1)
+        meta = page.get("meta", {})
+        version = (meta.get("results", {}).get("total", 0), meta.get("last_updated"))
+
+        if self.cache is not None:
+            await self.cache.set(key, list(version), self.cache_ttl(end_date, since))
+        return version
+
+    async def fetch_records(
+        self,
+        product_code: str,
+        start_date: date,
+        end_date: date,
+        limit: int,
+        since: Optional[date] = None,
+    ) -> List[dict]:
+        """
+        Fetch up to `limit` records for a product code and date range.
+
+        Complete results are served from and stored in the cache (if any),
+        with a TTL depending on how recent the range is.
+
+        Args:
+            product_code: Device product code, e.g. FKX
+            start_date: Start of the date_received range
+            end_date: End of the date_received range
+            limit: Maximum number of records to return
+            since: Only reports received or changed on or after this day
+
+        Returns:
+            Records ordered by date_received, without duplicate reports
+        """
+        if self.cache is None:
+            records = await self._fetch_records(
+                product_code, start_date, end_date, limit, since
+            )
+            self.index_records(records)
+            return records
+
+        key = cache_key(product_code, start_date, end_date, limit, since)
+        records = await self.cache.get(key)
+        if records is None:
+            records = await self._fetch_records(
+                product_code, start_date, end_date, limit, since
+            )
+            self.index_records(records)
+            await self.cache.set(key, records, self.cache_ttl(end_date, since))
+        return records
+
+    def index_records(self, records: List[dict]):
+        """Queue downloaded records for the search index, if there is one"""
+        if self.search_index is not None:
+            self.search_index.submit(records)
+
+    def cache_ttl(self, end_date: date, since: Optional[date] = None) -> float:
+        """
+        Cache TTL in seconds for a range ending on `end_date`. Changes since
+        a day can appear at any time, so those queries count as recent.
+        """
+        if since is not None:
+            return self.recent_ttl
+        return cache_ttl_for_range(
+            end_date, self.recent_days, self.recent_ttl, self.historical_ttl
+        )
+
+    async def iter_records(
+        self,
+        product_code: str,
+        start_date: date,
+        end_date: date,
+        limit: int,
+        since: Optional[date] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Stream up to `limit` records in date_received order as they download.
+
+        The first page is parsed incrementally, so the first record is
+        available as soon as it arrives. Once it turns out to be full, up to
+        `prefetch_pages` following pages are downloaded (undecoded) while the
+        current one is being consumed, so a long export takes about the time
+        of its slowest pages rather than the sum of all of them. Concurrent
+        identical exports share those downloads (see HTTPXClient.get_bytes);
+        only the streamed first page is requested by each of them, on
+        purpose, so none waits for another's first page. Memory is
+        bounded by the prefetch window's raw pages plus one decoded record
+        (and up to INDEX_BATCH_RECORDS waiting for the search index).
+        Once skip would pass openFDA's limit, the query restarts from the
+        last date seen; reports already sent are skipped.
+
+        With a response cache, a complete result cached by `fetch_records`
+        is served as is. Otherwise every page is read from and stored in
+        the cache as its raw body, keyed by URL (the streamed first page
+        once it has fully arrived), so repeated exports of a range are
+        served from the cache while memory stays bounded by a few pages.
+
+        Args:
+            product_code: Device product code, e.g. FKX
+            start_date: Start of the date_received range
+            end_date: End of the date_received range
+            limit: Maximum number of records to yield
+            since: Only reports received or changed on or after this day
+
+        Yields:
+            Records ordered by date_received, without duplicate reports
+        """
+        ttl = self.cache_ttl(end_date, since)
+        if self.cache is not None:
+            records = await self.cache.get(
+                cache_key(product_code, start_date, end_date, limit, since)
+            )
+            if records is not None:
+                for record in records:
+                    yield record
+                return
+
+        stream = _RecordStream(self)
+        search_start = start_date
+        while stream.emitted < limit:
+            search = build_search(product_code, search_start, end_date, since)
+            page_limit = min(self.page_size, limit - stream.emitted)
+            received = 0
+            try:
+                async for record in self.iter_first_page(
+                    self.build_url(search, page_limit), ttl
+                ):
+                    received += 1
+                    if stream.accept(record):
+                        yield record
+            except HTTPError as e:
+                if e.status_code != 404:
+                    raise
+            finally:
+                stream.flush_index()
+            if received < page_limit:
+                return
+
+            # The first page was full: fetch the next ones ahead of time
+            pending = deque()
+            requested = 0
+            skip = received
+            try:
+                while True:
+                    while len(pending) < self.prefetch_pages and skip <= MAX_SKIP:
+                        size = min(self.page_size, limit - stream.emitted - requested)
+                        if size <= 0:
+                            break
+                        task = asyncio.ensure_future(
+                            self.fetch_page_bytes(search, size, skip, ttl)
+                        )
+                        pending.append((task, size))
+                        requested += size
+                        skip += size
+                    if not pending:
+                        break
+
+                    task, size = pending.popleft()
+                    body = await task
+                    requested -= size
+                    received = 0
+                    try:
+                        for record in iter_page_records(body):
+                            received += 1
+                            if stream.accept(record):
+                                yield record
+                    finally:
+                        stream.flush_index()
+                    if received < size:
+                        return
+            finally:
+                for task, _ in pending:
+                    task.cancel()
+                await asyncio.gather(
+                    *(task for task, _ in pending), return_exceptions=True
+                )
+
+            if stream.emitted >= limit:
+                return
+            # Too deep for skip paging: continue from the last day seen
+            last_day = parse_record_date(stream.last_received)
+            if last_day is None or last_day <= search_start:
+                logger.warning(
+                    f"{product_code} on {search_start} has more records "
+                    f"than can be paged, stopping after {stream.emitted}"
+                )
+                return
+            search_start = last_day
+
+    async def iter_first_page(self, url: str, ttl: float) -> AsyncIterator[dict]:
+        """
+        Records of the first page of a streamed query.
+
+        Served from the page cache when it has the page. Otherwise they are
+        parsed as the body arrives, and the body is cached once complete
+        (a consumer stopping early leaves the cache alone).
+        """
+        if self.cache is None:
+            async for record in self.http_client.iter_json_items(url):
+                yield record
+            return
+
+        key = page_cache_key(url)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            for record in iter_page_records(cached.encode("utf-8")):
+                yield record
+            return
+
+        chunks = []
+        async for record in self.http_client.iter_json_items(url, body=chunks):
+            yield record
+        await self.cache.set(key, b"".join(chunks).decode("utf-8"), ttl)
+
+    async def fetch_page_bytes(
+        self, search: str, limit: int, skip: int, ttl: Optional[float] = None
+    ) -> bytes:
+        """
+        Download a single page without decoding it.
+
+        With a response cache and a `ttl`, the body is read from and stored
+        in the cache (as text, the cache holding JSON values).
+
+        Returns:
+            The response body, or an empty document for openFDA's "no
+            matches" 404
+        """
+        url = self.build_url(search, limit, skip)
+        key = page_cache_key(url)
+        caching = self.cache is not None and ttl is not None
+        if caching:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached.encode("utf-8")
+
+        async with self.semaphore:
+            try:
+                body = await self.http_client.get_bytes(url)
+            except HTTPError as e:
+                if e.status_code == 404:
+                    return b'{"results": []}'
+                raise
+
+        if caching:
+            await self.cache.set(key, body.decode("utf-8"), ttl)
+        return body
+
+    async def _fetch_records(
+        self,
+        product_code: str,
+        start_date: date,
+        end_date: date,
+        limit: int,
+        since: Optional[date] = None,
+    ) -> List[dict]:
+        """
+        Fetch up to `limit` records straight from openFDA.
+
+        The first page reports the total number of matches. The remaining
+        pages are then fetched concurrently with skip, and ranges too large
+        for skip are split into date sub-ranges that are fetched the same way.
+
+        Args:
+            product_code: Device product code, e.g. FKX
+            start_date: Start of the date_received range
+            end_date: End of the date_received range
+            limit: Maximum number of records to return
+            since: Only reports received or changed on or after this day
+
+        Returns:
+            Records ordered by date_received, without duplicate reports
+        """
+        search = build_search(product_code, start_date, end_date, since)
+        first_page = await self.fetch_page(search, min(self.page_size, limit))
+        results = first_page.get("results") or []
+        total = first_page.get("meta", {}).get("results", {}).get("total", 0)
+
+        wanted = min(limit, total)
+        if wanted <= len(results):
+            return results[:wanted]
+
+        if wanted > MAX_SKIP + self.page_size and start_date < end_date:
+            # Too deep for skip paging: fetch date sub-ranges instead
+            parts = math.ceil(total / MAX_SKIP)
+            sub_ranges = split_date_range(start_date, end_date, parts * 2)
+            logger.info(
+                f"Splitting {product_code} {start_date}..{end_date} "
+                f"({total} records) into {len(sub_ranges)} sub-ranges"
+            )
+            # Fetch sub-ranges in waves so we stop once enough records are in
+            chunks = []
+            fetched = 0
+            for i in range(0, len(sub_ranges), self.max_concurrency):
+                wave = await asyncio.gather(
+                    *(
+                        self._fetch_records(
+                            product_code, sub_start, sub_end, wanted, since
+                        )
+                        for sub_start, sub_end in sub_ranges[
+                            i : i + self.max_concurrency
+                        ]
+                    )
+                )
+                chunks.extend(wave)
+                fetched += sum(len(chunk) for chunk in wave)
+                if fetched >= wanted:
+                    break
+            return merge_records(chunks, wanted)
+
+        if wanted > MAX_SKIP + self.page_size:
+            logger.warning(
+                f"{product_code} on {start_date} has {total} records, "
+                f"only the first {MAX_SKIP + self.page_size} can be paged"
+            )
+            wanted = MAX_SKIP + self.page_size
+
+        skips = range(len(results), wanted, self.page_size)
+        pages = await asyncio.gather(
+            *(
+                self.fetch_page(search, min(self.page_size, wanted - skip), skip)
+                for skip in skips
+            )
+        )
+        return merge_records(
+            [results] + [page.get("results") or [] for page in pages], wanted
+        )
+
+    async def fetch_records_multi(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        limit: int,
+        since: Optional[date] = None,
+    ) -> List[dict]:
+        """
+        Fetch up to `limit` records across several product codes.
+
+        Codes are fetched concurrently (pacing is left to the shared rate
+        limiter), then merged in date_received order with ties broken by
+        the order of `product_codes`. A report filed under several of the
+        codes appears once.
+
+        Returns:
+            Records ordered by date_received, without duplicate reports
+        """
+        if len(product_codes) == 1:
+            return await self.fetch_records(
+                product_codes[0], start_date, end_date, limit, since
+            )
+        chunks = await asyncio.gather(
+            *(
+                self.fetch_records(code, start_date, end_date, limit, since)
+                for code in product_codes
+            )
+        )
+        return merge_records(chunks, limit)
+
+    def iter_records_multi(
+        self,
+        product_codes: Sequence[str],
+        start_date: date,
+        end_date: date,
+        limit: int,
+        since: Optional[date] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Stream up to `limit` records across several product codes.
+
+        Every code is streamed with `iter_records` at the same time and the
+        streams are merged as records arrive, in the same order (and with the
+        same deduplication) as `fetch_records_multi`.
+        """
+        if len(product_codes) == 1:
+            return self.iter_records(
+                product_codes[0], start_date, end_date, limit, since
+            )
+        return merge_record_streams(
+            [
+                self.iter_records(code, start_date, end_date, limit, since)
+                for code in product_codes
+            ],
+            limit,
+            prefetch=self.page_size,
+        )
+
+
+def merge_records(chunks: List[List[dict]], limit: int) -> List[dict]:
+    """
+    Merge already-sorted record chunks in date_received order.
+
+    Chunks come from consecutive pages or consecutive date sub-ranges, so a
+    stable sort keeps the upstream order within a day. Reports that appear on
+    two pages (possible when records shift between page requests) are dropped.
+
+    Args:
+        chunks: Lists of openFDA records
+        limit: Maximum number of records to return
+
+    Returns:
+        Merged list of at most `limit` records
+    """
+    merged = []
+    seen_keys = set()
+    for chunk in chunks:
+        for record in chunk:
+            key = record.get("mdr_report_key")
+            if key:
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+            merged.append(record)
+
+    merged.sort(key=lambda record: record.get("date_received", ""))
+    return merged[:limit]
+
+
+async def merge_record_streams(
+    streams: List[AsyncIterator[dict]], limit: int, prefetch: int = MAX_PAGE_SIZE
+) -> AsyncIterator[dict]:
+    """
+    Merge record streams that are each ordered by date_received.
+
+    Every stream is read ahead by a background task into a queue of
+    `prefetch` records, so the streams download concurrently while memory
+    stays bounded. Ties on date_received go to the earlier stream; reports
+    already yielded are skipped. An error in any stream is raised here.
+
+    Args:
+        streams: Async iterators of openFDA records
+        limit: Maximum number of records to yield
+        prefetch: Records buffered per stream
+
+    Yields:
+        Merged records, at most `limit`
+    """
+    done = object()
+    queues = [asyncio.Queue(prefetch) for _ in streams]
+
+    async def pump(stream, queue):
+        try:
+            async for record in stream:
+                await queue.put(record)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    tasks = [
+        asyncio.create_task(pump(stream, queue))
+        for stream, queue in zip(streams, queues)
+    ]
+    heap = []
+    sequence = 0
+
+    async def pull(index):
+        nonlocal sequence
+        item = await queues[index].get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        sequence += 1
+        heapq.heappush(heap, (item.get("date_received") or "", index, sequence, item))
+
+    try:
+        for index in range(len(streams)):
+            await pull(index)
+        seen_keys = set()
+        emitted = 0
+        while heap and emitted < limit:
+            _, index, _, record = heapq.heappop(heap)
+            await pull(index)
+            key = record.get("mdr_report_key")
+            if key:
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+            emitted += 1
+            yield record
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
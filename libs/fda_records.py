@@ -0,0 +1,246 @@
+import calendar
+from datetime import datetime
+from typing import Iterable, Iterator
+
+# Define the exact field order we want
+CSV_FIELDNAMES = [
+    "Web Address",
+    "Report Number",
+    "Event Date",
+    "Event Type",
+    "Manufacturer",
+    "Date Received",
+    "Product Code",
+    "Brand Name",
+    "Device Problem",
+    "Patient Problem",
+    "PMA/PMN Number",
+    "Exemption Number",
+    "Number of Events",
+    "Event Text",
+]
+
+
+WEB_ADDRESS_PREFIX = (
+    "https://www.accessdata.fda.gov/scripts/cdrh/cfdocs/cfMAUDE/Detail.CFM?MDRFOI__ID="
+)
+
+# Days per month, used to validate YYYYMMDD dates without parsing them
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def format_date(date_str: str) -> str:
+    """
+    Reformat an FDA YYYYMMDD date as "MM-DD-YYYY 00:00:00".
+
+    Valid dates are rearranged with string slices. Anything unusual goes
+    through strptime/strftime so the result is the same as it has always
+    been, and values that are not valid dates are returned unchanged.
+    """
+    if not date_str:
+        return ""
+    if (
+        type(date_str) is str
+        and len(date_str) == 8
+        and date_str.isascii()
+        and date_str.isdigit()
+    ):
+        year = int(date_str[:4])
+        month = int(date_str[4:6])
+        day = int(date_str[6:])
+        if (
+            year >= 1000
+            and 1 <= month <= 12
+            and 1 <= day <= _DAYS_IN_MONTH[month]
+            and (month != 2 or day < 29 or calendar.isleap(year))
+        ):
+            return f"{date_str[4:6]}-{date_str[6:]}-{date_str[:4]} 00:00:00"
+    try:
+        # FDA dates are in YYYYMMDD format
+        if len(date_str) == 8:
+            date_obj = datetime.strptime(date_str, "%Y%m%d")
+            return date_obj.strftime("%m-%d-%Y %H:%M:%S")
+        return date_str
+    except (ValueError, TypeError):
+        return date_str
+
+
+def _first_device(record: dict):
+    """The device entry the CSV columns are read from (first of the list)"""
+    device = record.get("device")
+    if isinstance(device, list):
+        device = device[0] if device else None
+    return device if isinstance(device, dict) else None
+
+
+def _device_value(device, key: str):
+    if device is None:
+        return ""
+    value = device.get(key)
+    return value if value is not None else ""
+
+
+def extract_row(record: dict) -> tuple:
+    """
+    Extract the CSV columns of one FDA device event record.
+
+    Args:
+        record: Single FDA device event record
+
+    Returns:
+        Tuple of values in CSV_FIELDNAMES order
+    """
+    get = record.get
+    device = _first_device(record)
+    mdr_report_key = get("mdr_report_key", "")
+    product_code = _device_value(device, "device_report_product_code")
+
+    # Construct web address
+    web_address = ""
+    if mdr_report_key and product_code:
+        web_address = f"{WEB_ADDRESS_PREFIX}{mdr_report_key}&pc={product_code}"
+
+    device_problems = get("product_problems", [])
+
+    patient_problems = []
+    patients = get("patient", [])
+    if patients:
+        for patient in patients:
+            if "patient_problems" in patient:
+                patient_problems.extend(patient["patient_problems"])
+
+    return (
+        web_address,
+        get("report_number", ""),
+        format_date(get("date_of_event", "")),
+        get("event_type", ""),
+        _device_value(device, "manufacturer_d_name"),
+        format_date(get("date_received", "")),
+        product_code,
+        _device_value(device, "brand_name"),
+        ", ".join(device_problems) if device_problems else "",
+        ", ".join(set(patient_problems)) if patient_problems else "",
+        get("pma_pmn_number", ""),
+        get("exemption_number", ""),
+        "1",  # Each record represents one event
+        extract_event_text(get("mdr_text", [])),
+    )
+
+
+def extract_rows(records: Iterable[dict]) -> Iterator[tuple]:
+    """
+    Extract CSV rows from a batch (list or iterator) of records.
+
+    Args:
+        records: FDA device event records
+
+    Yields:
+        Tuples of values in CSV_FIELDNAMES order
+    """
+    for record in records:
+        yield extract_row(record)
+
+
+def extract_specific_fields(record: dict) -> dict:
+    """
+    Extract only the specific fields we need from FDA device event record.
+
+    Args:
+        record: Single FDA device event record
+
+    Returns:
+        Dictionary with only the required fields
+    """
+    return dict(zip(CSV_FIELDNAMES, extract_row(record)))
+
+
+def extract_event_text(mdr_text_list: list) -> str:
+    """
+    Extract and combine event description and manufacturer narrative from MDR text entries.
+    Ensures only the first unique 'Description of Event or Problem' is included,
+    while all 'Additional Manufacturer Narrative' entries are concatenated.
+
+    Args:
+        mdr_text_list: List of MDR text entries
+
+    Returns:
+        Combined event text string
+    """
+    event_description = ""
+    manufacturer_narratives = []  # List to collect all narratives
+    seen_descriptions = set()  # Set to track unique descriptions
+
+    # Process each text entry
+    for text_entry in mdr_text_list:
+        text_type = text_entry.get("text_type_code", "")
+        text_content = text_entry.get("text", "").strip()
+
+        if text_type == "Description of Event or Problem" and text_content:
+            # Add only if not seen before
+            if text_content not in seen_descriptions:
+                event_description = text_content
+                seen_descriptions.add(text_content)
+        elif text_type == "Additional Manufacturer Narrative" and text_content:
+            # Collect all narratives
+            manufacturer_narratives.append(text_content)
+
+    # Build the combined text
+    combined_text = ""
+    if event_description:
+        combined_text += f"Event Description: {event_description}"
+    if manufacturer_narratives:
+        # Join all narratives with a space
+        narrative_text = " ".join(manufacturer_narratives)
+        if combined_text:
+            combined_text += f" Manufacturer Narrative: {narrative_text}"
+        else:
+            combined_text = f"Manufacturer Narrative: {narrative_text}"
+
+    return combined_text
+
+
+def parse_field_paths(fields: str) -> dict:
+    """
+    Turn a comma-separated list of (dotted) field paths into a projection tree.
+
+    "mdr_report_key,device.brand_name" becomes
+    {"mdr_report_key": None, "device": {"brand_name": None}}, where None keeps
+    the whole value.
+    """
+    tree = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                # The parent is already kept whole
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def project_record(value, tree: dict):
+    """
+    Keep only the fields of a projection tree, descending into lists of objects.
+
+    Args:
+        value: openFDA record (or nested value of one)
+        tree: Projection tree built by parse_field_paths
+
+    Returns:
+        A new value holding only the selected fields
+    """
+    if isinstance(value, list):
+        return [project_record(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: value[key] if subtree is None else project_record(value[key], subtree)
+        for key, subtree in tree.items()
+        if key in value
+    }
@@ -1,16 +1,126 @@
 import httpx
+import ijson
+import orjson
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from tenacity import (
     retry,
     stop_after_attempt,
     wait_exponential,
-    retry_if_exception_type,
+    retry_if_exception,
 )
-from typing import Optional
+from tenacity.wait import wait_base
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from libs.logger import logger
+from libs.metrics import (
+    count_upstream_response,
+    count_upstream_retry,
+    observe_stage,
+    stage_timer,
+)
+from libs.rate_limit import AsyncTokenBucket
+from libs.singleflight import SingleFlight
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Never sleep longer than this between attempts, whatever Retry-After says
+MAX_RETRY_WAIT = 60.0
+
+
+class HTTPError(Exception):
+    """Raised when the upstream server answers with an error status code"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class RequestError(Exception):
+    """Raised when the request could not be sent or no response was received"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delay in seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Retry transport failures, 429s and 5xx responses"""
+    if isinstance(exc, HTTPError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, RequestError)
+
+
+def log_retry(call: str):
+    """tenacity before_sleep hook: log the failed attempt and count the retry"""
+
+    def before_sleep(retry_state):
+        count_upstream_retry(call)
+        logger.warning(
+            f"Retrying upstream {call} (attempt {retry_state.attempt_number}) "
+            f"due to {retry_state.outcome.exception()}"
+        )
+
+    return before_sleep
+
+
+class wait_retry_after(wait_base):
+    """Wait as long as the server's Retry-After asks, else fall back"""
+
+    def __init__(self, fallback: wait_base, max_wait: float = MAX_RETRY_WAIT):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception()
+        if isinstance(exc, HTTPError) and exc.retry_after is not None:
+            return min(exc.retry_after, self.max_wait)
+        return self.fallback(retry_state)
 
 
 class HTTPXClient:
-    def __init__(self):
-        """Initialize the HTTPX client with HTTP/2 support"""
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        rate_limiter: Optional[AsyncTokenBucket] = None,
+    ):
+        """
+        Initialize the HTTPX client with HTTP/2 support.
+
+        A single connection pool is shared by every call made through this
+        instance, so create it once (e.g. for the application lifetime) and
+        close it with `aclose()` when done.
+
+        Args:
+            max_connections: Maximum number of open connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept open
+            http2: Multiplex requests over HTTP/2 where the server supports it
+            rate_limiter: Limiter paced before every attempt, including retries
+        """
         # Essential headers for production
         self.headers = {
             "User-Agent": "FDA-DB-Checkup/1.0",
@@ -20,29 +130,220 @@ class HTTPXClient:
         }
         # Configure timeouts: 5s connect, 30s read
         self.timeout = httpx.Timeout(5.0, read=30.0)
+        # Pool limits, shared by every request (and retry) of this client
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
         # Explicitly enable HTTP/2 support
-        self.http2 = True
+        self.http2 = http2
+        self.rate_limiter = rate_limiter
+        # Identical requests in flight at the same time share one call
+        self.single_flight = SingleFlight()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled httpx client, created on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                headers=self.headers,
+                limits=self.limits,
+            )
+        return self._client
+
+    async def aclose(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "HTTPXClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def async_get(self, url: str, params: Optional[dict] = None) -> dict:
+        """
+        Make an asynchronous GET request with HTTP/2 over the shared pool.
+
+        Concurrent calls for the same URL and params are coalesced into one
+        upstream request whose decoded result is shared (do not mutate it).
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        return await self.single_flight.do(key, lambda: self._get(url, params))
+
+    async def get_bytes(self, url: str, params: Optional[dict] = None) -> bytes:
+        """
+        GET a complete response body without decoding it.
+
+        Rate limited, retried and coalesced like `async_get`; the shared
+        result is immutable bytes.
+        """
+        key = ("bytes", url, tuple(sorted((params or {}).items())))
+        return await self.single_flight.do(key, lambda: self._get_bytes(url, params))
+
+    async def _get(self, url: str, params: Optional[dict] = None) -> dict:
+        """Rate-limited GET, retried by tenacity, decoded with orjson"""
+        content = await self._get_bytes(url, params)
+        try:
+            # orjson decodes straight from bytes, several times faster than json
+            with stage_timer("json_decode"):
+                return orjson.loads(content)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON response: {e}") from e
 
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((httpx.ConnectError, httpx.TimeoutException)),
-        # before_sleep=lambda retry_state: logger.warning(
-        #     f"Retrying {retry_state.fn.__name__} due to {retry_state.outcome.exception()}"
-        # )
+        stop=stop_after_attempt(5),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=10)),
+        retry=retry_if_exception(is_retryable),
+        reraise=True,
+        before_sleep=log_retry("GET"),
     )
-    async def async_get(self, url: str, params: Optional[dict] = None) -> dict:
-        """Make an asynchronous GET request with HTTP/2."""
-        async with httpx.AsyncClient(
-            http2=self.http2, timeout=self.timeout, headers=self.headers
-        ) as client:
-            try:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                raise HTTPError(f"HTTP error occurred: {e}") from e
-            except httpx.RequestError as e:
-                raise RequestError(f"Request error occurred: {e}") from e
-            except ValueError as e:
-                raise ValueError(f"Invalid JSON response: {e}") from e
+    async def _get_bytes(self, url: str, params: Optional[dict] = None) -> bytes:
+        """Single rate-limited GET attempt, retried by tenacity"""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        try:
+            with stage_timer("upstream"):
+                response = await self.client.get(url, params=params)
+            count_upstream_response(response.status_code)
+            response.raise_for_status()
+            return response.content
+        except httpx.HTTPStatusError as e:
+            raise HTTPError(
+                f"HTTP error occurred: {e}",
+                status_code=e.response.status_code,
+                retry_after=parse_retry_after(e.response.headers.get("Retry-After")),
+            ) from e
+        except httpx.RequestError as e:
+            count_upstream_response("error")
+            raise RequestError(f"Request error occurred: {e}") from e
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=10)),
+        retry=retry_if_exception(is_retryable),
+        reraise=True,
+        before_sleep=log_retry("stream"),
+    )
+    async def open_stream(
+        self, url: str, params: Optional[dict] = None
+    ) -> httpx.Response:
+        """
+        Send a rate-limited GET and return as soon as the headers arrive.
+
+        The body is not read, so it can be passed on while it is still
+        downloading. Errors are retried like `async_get` until then. The
+        caller must consume the body with `iter_body` (or `aclose()` it).
+        """
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        try:
+            request = self.client.build_request("GET", url, params=params)
+            with stage_timer("upstream"):
+                response = await self.client.send(request, stream=True)
+        except httpx.RequestError as e:
+            count_upstream_response("error")
+            raise RequestError(f"Request error occurred: {e}") from e
+        count_upstream_response(response.status_code)
+
+        if response.is_error:
+            await response.aclose()
+            raise HTTPError(
+                f"HTTP error occurred: {response.status_code} for url {url}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+            )
+        return response
+
+    async def iter_json_items(
+        self,
+        url: str,
+        prefix: str = "results.item",
+        params: Optional[dict] = None,
+        body: Optional[List[bytes]] = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Parse the items under `prefix` incrementally while the body downloads.
+
+        Only one item is held in memory at a time, so consumers can start on
+        the first record while the rest of the response is still in transit.
+        Errors before the first byte are retried like `async_get`.
+        Unlike `async_get`, identical calls are not coalesced: each caller
+        consumes its own response as it arrives.
+
+        Args:
+            url: URL to GET
+            prefix: ijson prefix of the items, "results.item" for openFDA
+            params: Query parameters
+            body: If given, the raw body chunks are appended to it as they
+                are read, e.g. to cache the response once it is complete
+
+        Yields:
+            Decoded items, in document order
+        """
+        response = await self.open_stream(url, params)
+        reader = _BodyReader(response, body)
+        items = ijson.items_async(reader, prefix, use_float=True).__aiter__()
+        # Body download and parsing interleave; time spent waiting for the
+        # body is tracked by the reader, the rest of each step is decoding
+        parsing = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    parsing += time.perf_counter() - started
+                yield item
+        except httpx.RequestError as e:
+            raise RequestError(f"Request error occurred: {e}") from e
+        except ijson.JSONError as e:
+            raise ValueError(f"Invalid JSON response: {e}") from e
+        finally:
+            await response.aclose()
+            observe_stage("upstream_body", reader.seconds)
+            observe_stage("json_decode", max(0.0, parsing - reader.seconds))
+
+
+class _BodyReader:
+    """Async file-like view of a streamed response body, as read by ijson"""
+
+    def __init__(self, response: httpx.Response, keep: Optional[List[bytes]] = None):
+        self._chunks = response.aiter_bytes()
+        # Chunks read so far, if the caller wants the raw body too
+        self._keep = keep
+        # Time spent waiting for the body
+        self.seconds = 0.0
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b""
+        started = time.perf_counter()
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+        finally:
+            self.seconds += time.perf_counter() - started
+        if self._keep is not None:
+            self._keep.append(chunk)
+        return chunk
+
+
+async def iter_body(response: httpx.Response) -> AsyncIterator[bytes]:
+    """Yield the body of a streamed response as it arrives, then close it"""
+    try:
+        async for chunk in response.aiter_bytes():
+            yield chunk
+    except httpx.RequestError as e:
+        raise RequestError(f"Request error occurred: {e}") from e
+    finally:
+        await response.aclose()
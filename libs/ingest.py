@@ -0,0 +1,294 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from itertools import islice
+from typing import Iterable, List, Optional
+
+import psycopg2
+
+from libs.db import PostgresConnector
+from libs.fda_records import extract_specific_fields
+from libs.logger import logger
+from libs.rollups import (
+    ROLLUP_SCHEMA_SQL,
+    all_partitions,
+    changed_partitions,
+    refresh_partitions,
+)
+from libs.search_index import SEARCH_SCHEMA_SQL
+
+# Local mirror of openFDA device events, one row per MDR report
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS device_events (
+    mdr_report_key   TEXT PRIMARY KEY,
+    report_number    TEXT,
+    product_code     TEXT,
+    date_received    DATE,
+    event_date       DATE,
+    event_type       TEXT,
+    manufacturer     TEXT,
+    brand_name       TEXT,
+    device_problem   TEXT,
+    patient_problem  TEXT,
+    pma_pmn_number   TEXT,
+    exemption_number TEXT,
+    number_of_events INTEGER NOT NULL DEFAULT 1,
+    event_text       TEXT,
+    web_address      TEXT,
+    raw              JSONB NOT NULL,
+    ingested_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at       TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS device_events_report_number_idx
+    ON device_events (report_number);
+CREATE INDEX IF NOT EXISTS device_events_product_code_date_received_idx
+    ON device_events (product_code, date_received);
+CREATE INDEX IF NOT EXISTS device_events_date_received_idx
+    ON device_events (date_received);
+CREATE INDEX IF NOT EXISTS device_events_product_code_updated_at_idx
+    ON device_events (product_code, updated_at);
+"""
+
+# Columns written through COPY, in CSV order
+COLUMNS = [
+    "mdr_report_key",
+    "report_number",
+    "product_code",
+    "date_received",
+    "event_date",
+    "event_type",
+    "manufacturer",
+    "brand_name",
+    "device_problem",
+    "patient_problem",
+    "pma_pmn_number",
+    "exemption_number",
+    "number_of_events",
+    "event_text",
+    "web_address",
+    "raw",
+]
+
+# Session-local staging table, emptied at the end of every transaction
+STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS device_events_staging
+    (LIKE device_events INCLUDING DEFAULTS)
+    ON COMMIT DELETE ROWS
+"""
+
+COPY_SQL = (
+    f"COPY device_events_staging ({', '.join(COLUMNS)}) "
+    f"FROM STDIN WITH (FORMAT csv)"
+)
+
+# Move staged rows into the mirror; unchanged reports are left untouched.
+# Returns a (product_code, month, upserted) row for every changed report -
+# upserted true for its new values and false for the values it had before -
+# so the rollups of both the old and the new month can be refreshed when an
+# update moves a report to another month or product code. All statements of
+# the query see the same snapshot, so "previous" reads the pre-update rows.
+UPSERT_SQL = f"""
+WITH previous AS (
+    SELECT e.product_code, date_trunc('month', e.date_received)::date AS month
+    FROM device_events e
+    JOIN device_events_staging s USING (mdr_report_key)
+    WHERE e.raw IS DISTINCT FROM s.raw
+),
+upserted AS (
+    INSERT INTO device_events ({', '.join(COLUMNS)})
+    SELECT DISTINCT ON (mdr_report_key) {', '.join(COLUMNS)}
+    FROM device_events_staging
+    ORDER BY mdr_report_key
+    ON CONFLICT (mdr_report_key) DO UPDATE SET
+        {', '.join(f"{c} = EXCLUDED.{c}" for c in COLUMNS[1:])},
+        updated_at = now()
+    WHERE device_events.raw IS DISTINCT FROM EXCLUDED.raw
+    RETURNING product_code, date_trunc('month', date_received)::date AS month
+)
+SELECT product_code, month, true FROM upserted
+UNION ALL
+SELECT product_code, month, false FROM previous
+"""
+
+
+def parse_fda_date(date_str: Optional[str]) -> Optional[str]:
+    """Convert an openFDA YYYYMMDD date to ISO format, or None if invalid"""
+    if not date_str or len(date_str) != 8:
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y%m%d").date().isoformat()
+    except (ValueError, TypeError):
+        return None
+
+
+def _clean(value) -> Optional[str]:
+    """Empty values become NULL; NUL characters are not allowed in Postgres text"""
+    if value is None or value == "":
+        return None
+    return str(value).replace("\x00", "")
+
+
+def _strip_nul(value):
+    """Recursively remove NUL characters from the strings of a JSON value"""
+    if isinstance(value, str):
+        return value.replace("\x00", "")
+    if isinstance(value, list):
+        return [_strip_nul(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _strip_nul(item) for key, item in value.items()}
+    return value
+
+
+def record_to_row(record: dict) -> Optional[list]:
+    """
+    Turn an openFDA record into a row of COLUMNS.
+
+    Returns:
+        The row, or None if the record has no mdr_report_key
+    """
+    mdr_report_key = record.get("mdr_report_key")
+    if not mdr_report_key:
+        return None
+
+    fields = extract_specific_fields(record)
+    raw = json.dumps(record, ensure_ascii=False)
+    if "\\u0000" in raw:
+        # Postgres JSONB rejects the \u0000 escape
+        raw = json.dumps(_strip_nul(record), ensure_ascii=False)
+    return [
+        _clean(mdr_report_key),
+        _clean(fields["Report Number"]),
+        _clean(fields["Product Code"]),
+        parse_fda_date(record.get("date_received")),
+        parse_fda_date(record.get("date_of_event")),
+        _clean(fields["Event Type"]),
+        _clean(fields["Manufacturer"]),
+        _clean(fields["Brand Name"]),
+        _clean(fields["Device Problem"]),
+        _clean(fields["Patient Problem"]),
+        _clean(fields["PMA/PMN Number"]),
+        _clean(fields["Exemption Number"]),
+        fields["Number of Events"],
+        _clean(fields["Event Text"]),
+        _clean(fields["Web Address"]),
+        raw,
+    ]
+
+
+class DeviceEventLoader:
+    def __init__(self, connector: PostgresConnector, batch_size: int = 10000):
+        """
+        Bulk-load openFDA device events into the local Postgres mirror.
+
+        Every batch is streamed with COPY into a temporary staging table and
+        upserted on mdr_report_key in the same transaction, so loads are
+        idempotent and re-loading unchanged reports is a no-op. The daily
+        count rollups of the months a batch changed are refreshed in the same
+        transaction, and Postgres maintains the full-text search column.
+
+        Args:
+            connector: Connected PostgresConnector
+            batch_size: Records per COPY/upsert transaction
+        """
+        self.connector = connector
+        self.batch_size = batch_size
+
+    def ensure_schema(self):
+        """
+        Create the device_events and rollup tables and their indexes,
+        including the full-text search index
+        """
+        conn = self.connector.conn
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA_SQL)
+            cursor.execute(SEARCH_SCHEMA_SQL)
+            cursor.execute(ROLLUP_SCHEMA_SQL)
+        conn.commit()
+
+    def rebuild_rollups(
+        self, start_date: Optional[date] = None, end_date: Optional[date] = None
+    ) -> int:
+        """
+        Recompute the rollups of every month holding events (optionally only
+        the months of a date range), one month per transaction.
+
+        Returns:
+            Number of partitions refreshed
+        """
+        conn = self.connector.conn
+        with conn.cursor() as cursor:
+            partitions = all_partitions(cursor, start_date, end_date)
+        conn.commit()
+
+        for partition in sorted(partitions):
+            try:
+                with conn.cursor() as cursor:
+                    refresh_partitions(cursor, [partition])
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                logger.exception(f"Rollup refresh of {partition} failed: {str(e)}")
+                raise
+        logger.info(f"Rebuilt rollups of {len(partitions)} partitions")
+        return len(partitions)
+
+    def load(self, records: Iterable[dict]) -> int:
+        """
+        Load records in batches.
+
+        Args:
+            records: Iterable of raw openFDA device event records
+
+        Returns:
+            Number of rows inserted or updated
+        """
+        iterator = iter(records)
+        total = 0
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                break
+            total += self.load_batch(batch)
+        return total
+
+    def load_batch(self, records: List[dict]) -> int:
+        """
+        COPY one batch into staging and upsert it in a single transaction.
+
+        Returns:
+            Number of rows inserted or updated
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        skipped = 0
+        for record in records:
+            row = record_to_row(record)
+            if row is None:
+                skipped += 1
+                continue
+            writer.writerow(row)
+        if skipped:
+            logger.warning(f"Skipped {skipped} records without mdr_report_key")
+        buffer.seek(0)
+
+        conn = self.connector.conn
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(STAGING_SQL)
+                cursor.copy_expert(COPY_SQL, buffer)
+                cursor.execute(UPSERT_SQL)
+                rows = cursor.fetchall()
+                upserted = sum(1 for row in rows if row[2])
+                refreshed = refresh_partitions(cursor, changed_partitions(rows))
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.exception(f"Bulk load of {len(records)} records failed: {str(e)}")
+            raise
+
+        logger.info(
+            f"Loaded batch of {len(records)} records, {upserted} upserted, "
+            f"{refreshed} rollup partitions refreshed"
+        )
+        return upserted
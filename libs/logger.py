@@ -1,32 +1,278 @@
+import atexit
+import copy
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+import orjson
+
+# Logging is configured from the environment, because this module is
+# imported (and the logger created) before any application settings load:
+#   LOG_LEVEL       - minimum level (default INFO)
+#   LOG_FORMAT      - "text" or "json" (one JSON object per line)
+#   LOG_FILE        - rotating log file, empty to log to stdout only
+#   LOG_QUEUE_SIZE  - records buffered for the writer thread
+#   LOG_OVERFLOW    - when the buffer is full: "drop" the new record,
+#                     "drop_oldest" or "block" until there is room
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_FILE = os.environ.get("LOG_FILE", "fda_db_checkup.log")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_OVERFLOW = os.environ.get("LOG_OVERFLOW", "drop").lower()
+
+# Longest a "block" overflow waits before dropping the record anyway
+MAX_BLOCK_SECONDS = 1.0
+# Longest shutdown waits for the listener to write out the queue
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+_exception_formatter = logging.Formatter()
+
+
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue, overflow: str = "drop"):
+        """
+        Queue handler that never lets a full queue stall the caller for long.
+
+        Args:
+            log_queue: Bounded queue drained by the listener thread
+            overflow: "drop" the new record, "drop_oldest" queued record, or
+                "block" up to MAX_BLOCK_SECONDS for room
+        """
+        super().__init__(log_queue)
+        self.overflow = overflow
+        # Records dropped and not reported yet, counted from any thread
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, as they may change or not be picklable,
+        # but leave formatting (and the exception apart from the message) to
+        # the listener's formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if not _start_listener():
+            # Shut down: nothing drains the queue any more
+            _write(record)
+            return
+        dropped = self.dropped
+        if dropped:
+            # Report drops as soon as there is room again
+            try:
+                self.queue.put_nowait(self._dropped_record(dropped))
+                self._count_dropped(-dropped)
+            except queue.Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == "block":
+            try:
+                self.queue.put(record, timeout=MAX_BLOCK_SECONDS)
+                return
+            except queue.Full:
+                pass
+        elif self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self._count_dropped(1)
+                self.queue.put_nowait(record)
+                return
+            except (queue.Empty, queue.Full):
+                pass
+        self._count_dropped(1)
+
+    def _count_dropped(self, count: int):
+        with self._dropped_lock:
+            self.dropped += count
+
+    def _dropped_record(self, dropped: int) -> logging.LogRecord:
+        return logging.LogRecord(
+            self.name or "fda_db_checkup",
+            logging.WARNING,
+            __file__,
+            0,
+            f"Log queue full, dropped {dropped} records",
+            None,
+            None,
+        )
+
+
+class DrainingQueueListener(QueueListener):
+    """Queue listener whose shutdown cannot fail or hang on a full queue"""
+
+    def enqueue_sentinel(self):
+        # The base class uses put_nowait, which raises queue.Full when the
+        # queue is saturated; wait for the listener to make room instead
+        self.queue.put(self._sentinel, timeout=SHUTDOWN_TIMEOUT)
+
+    def stop(self):
+        try:
+            self.enqueue_sentinel()
+        except queue.Full:
+            sys.stderr.write("Log listener did not drain the queue, giving up\n")
+            return
+        self._thread.join(SHUTDOWN_TIMEOUT)
+        self._thread = None
+
+
+_listener: Optional[QueueListener] = None
+_listener_started = False
+# The listener's handlers, written to directly once it has been shut down
+_handlers: List[logging.Handler] = []
+_listener_lock = threading.Lock()
+_queue: Optional[queue.Queue] = None
 
 
 def setup_logger():
+    """
+    Create the application logger.
+
+    Log calls only put the record on a bounded queue; a background listener
+    thread formats it and does the (blocking) console and file I/O,
+    including rotation, so logging from the event loop never waits on disk.
+    The thread is started and the log file opened with the first record,
+    so processes that only import this module (such as export workers)
+    never touch the file.
+    """
+    global _listener, _queue, _handlers
+
     # Create a logger instance
     logger = logging.getLogger("fda_db_checkup")
-    logger.setLevel(logging.INFO)  # Default log level: INFO
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
 
     # Define log message format
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        )
 
-    # Add console handler to output logs to stdout
+    # Console handler to output logs to stdout
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
+
+    # File handler to save logs to a file
+    if LOG_FILE:
+        file_handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, delay=True
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
 
-    # Add file handler to save logs to a file
-    file_handler = RotatingFileHandler(
-        "fda_db_checkup.log", maxBytes=10 * 1024 * 1024, backupCount=5
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    _queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(_queue, overflow=LOG_OVERFLOW)
+    logger.addHandler(queue_handler)
+
+    _listener = DrainingQueueListener(_queue, *handlers, respect_handler_level=True)
+    _handlers = handlers
 
     return logger
 
 
+def _start_listener() -> bool:
+    """
+    Start the listener thread, once.
+
+    Returns:
+        Whether the listener is running, False once it has been shut down
+    """
+    global _listener_started
+    if _listener_started:
+        return True
+    with _listener_lock:
+        if not _listener_started and _listener is not None:
+            _listener.start()
+            atexit.register(shutdown_logging)
+            _listener_started = True
+        return _listener_started
+
+
+def _write(record: logging.LogRecord):
+    """Hand a record to the handlers directly, as the listener would"""
+    for handler in _handlers:
+        if record.levelno >= handler.level:
+            handler.handle(record)
+
+
+def flush_logging(timeout: float = 5.0):
+    """Wait until the listener has written every queued record"""
+    deadline = time.monotonic() + timeout
+    while _queue is not None and _queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(0.01)
+
+
+def shutdown_logging():
+    """
+    Write out the queued records and stop the listener thread. Records
+    logged afterwards are written synchronously.
+    """
+    global _listener, _listener_started
+    with _listener_lock:
+        if _listener is None or not _listener_started:
+            return
+        _listener.stop()
+        _listener = None
+        _listener_started = False
+    # Records queued behind the listener's sentinel
+    while True:
+        try:
+            record = _queue.get_nowait()
+        except queue.Empty:
+            break
+        if record is not QueueListener._sentinel:
+            _write(record)
+        _queue.task_done()
+    for handler in logger.handlers:
+        if isinstance(handler, BoundedQueueHandler) and handler.dropped:
+            sys.stderr.write(f"Log queue full, dropped {handler.dropped} records\n")
+
+
 # Instantiate the logger for use across the application
 logger = setup_logger()
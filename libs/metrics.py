@@ -0,0 +1,253 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Optional, Union
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram
+    from prometheus_client import generate_latest
+except ImportError:  # metrics are optional; everything below becomes a no-op
+    Counter = Histogram = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage durations range from sub-millisecond CSV chunks to slow upstream pages
+STAGE_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECORD_BUCKETS = (1, 10, 100, 1000, 5000, 10000, 25000, 50000, 100000)
+BYTE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+
+class _NoopMetric:
+    """Stand-in for a metric when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+
+def metrics_available() -> bool:
+    """Whether prometheus_client is installed"""
+    return Histogram is not None
+
+
+def _histogram(name: str, documentation: str, labels, buckets):
+    if Histogram is None:
+        return _NoopMetric()
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labels):
+    if Counter is None:
+        return _NoopMetric()
+    return Counter(name, documentation, labels)
+
+
+STAGE_SECONDS = _histogram(
+    "fda_stage_seconds",
+    "Time spent in each processing stage of the export path",
+    ["stage"],
+    STAGE_BUCKETS,
+)
+UPSTREAM_RESPONSES = _counter(
+    "fda_upstream_responses", "openFDA responses by status code", ["status"]
+)
+UPSTREAM_RETRIES = _counter(
+    "fda_upstream_retries", "openFDA calls retried after a failure", ["call"]
+)
+EXPORT_RECORDS = _histogram(
+    "fda_export_records", "Records per export", ["format"], RECORD_BUCKETS
+)
+EXPORT_BYTES = _histogram(
+    "fda_export_bytes", "Bytes per export", ["format"], BYTE_BUCKETS
+)
+REQUEST_SECONDS = _histogram(
+    "fda_http_request_seconds",
+    "Time until the last byte of each API response was sent",
+    ["method", "route", "status"],
+    REQUEST_BUCKETS,
+)
+
+# Stage durations of the request being handled, for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+# Resolved label children, so the hot path skips the labels() lookup
+_stage_children: Dict[str, object] = {}
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record time spent in a stage, for /metrics and the current request"""
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_SECONDS.labels(stage)
+    child.observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block as one observation of `stage`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def count_upstream_response(status: Union[int, str]):
+    """Count an openFDA response by status code ("error" without one)"""
+    UPSTREAM_RESPONSES.labels(str(status)).inc()
+
+
+def count_upstream_retry(call: str):
+    """Count a retried openFDA call"""
+    UPSTREAM_RETRIES.labels(call).inc()
+
+
+def observe_export(fmt: str, records: int, size: int):
+    """Record the size of a finished export"""
+    EXPORT_RECORDS.labels(fmt).observe(records)
+    EXPORT_BYTES.labels(fmt).observe(size)
+
+
+async def track_export(
+    chunks: AsyncIterable[Union[str, bytes]],
+    fmt: str,
+    records: Callable[[], int],
+) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Pass export chunks through, recording records and bytes once it ends.
+
+    Args:
+        chunks: Chunks of the export file
+        fmt: Export format, used as label
+        records: Returns the number of records exported so far
+    """
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        observe_export(fmt, records(), size)
+
+
+def render_metrics() -> bytes:
+    """Current metrics in the Prometheus text format"""
+    if not metrics_available():
+        return b""
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, server_timing: bool = False):
+        """
+        ASGI middleware timing every HTTP response.
+
+        Durations land in fda_http_request_seconds, labelled with the route
+        template rather than the raw path. With `server_timing`, the stages
+        timed while the request was handled are sent in a Server-Timing
+        header. Headers go out before a streamed body, so for streamed
+        exports it only covers the work done up to the first chunk.
+
+        Args:
+            app: ASGI application to wrap
+            server_timing: Add the Server-Timing response header
+        """
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append(
+                        (b"server-timing", server_timing_header(timings, started))
+                    )
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            REQUEST_SECONDS.labels(
+                scope["method"], route_label(scope), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def route_label(scope) -> str:
+    """
+    Route template of a request as mounted, e.g. /api/v1/exports/{job_id}.
+
+    The matched route only knows its path within the router that declares
+    it, so the prefixes it was included or mounted under are recovered from
+    the request path, after root_path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    root_path = scope.get("root_path", "")
+    path = scope.get("path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    prefix = ""
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is not None:
+        match = _prefixed(path_regex.pattern).match(path)
+        if match:
+            prefix = match.group(1)
+    return root_path + prefix + template
+
+
+@lru_cache(maxsize=None)
+def _prefixed(pattern: str) -> re.Pattern:
+    """A route's anchored path regex, allowing (and capturing) any prefix"""
+    return re.compile("^(.*?)" + pattern.removeprefix("^"))
+
+
+def server_timing_header(timings: Dict[str, float], started: float) -> bytes:
+    """Server-Timing value: one entry per stage plus the total so far"""
+    entries = [
+        f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+    ]
+    entries.append(f"total;dur={(time.perf_counter() - started) * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncTokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        """
+        Async token-bucket rate limiter shared by every caller in the process.
+
+        Tokens refill continuously at `rate` per second up to `capacity`, so
+        short bursts are allowed while the long-run rate stays bounded.
+        Waiters are served in arrival order.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: int, burst: int) -> "AsyncTokenBucket":
+        """Create a limiter allowing `requests_per_minute` with `burst` tokens"""
+        return cls(rate=requests_per_minute / 60.0, capacity=burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int):
+        """
+        Cap the number of operations running at once.
+
+        Unlike a plain semaphore, acquiring gives up after a timeout so the
+        caller can reject the request instead of queueing it forever.
+
+        Args:
+            limit: Maximum number of slots held at the same time
+        """
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take a slot, waiting at most `timeout` seconds (None waits forever).
+
+        Returns:
+            True if a slot was taken, False on timeout
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        """Give a slot back"""
+        self.active -= 1
+        self._semaphore.release()
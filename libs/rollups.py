@@ -0,0 +1,106 @@
+from datetime import date
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Daily event counts per product code and dimension value, derived from
+# device_events. Maintained per calendar month: whenever a load changes
+# reports of a month, that month is recomputed.
+ROLLUP_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS device_event_daily_counts (
+    product_code TEXT NOT NULL,
+    day          DATE NOT NULL,
+    dimension    TEXT NOT NULL,
+    value        TEXT NOT NULL,
+    events       INTEGER NOT NULL,
+    PRIMARY KEY (dimension, product_code, day, value)
+);
+CREATE INDEX IF NOT EXISTS device_event_daily_counts_day_idx
+    ON device_event_daily_counts (day);
+"""
+
+# Dimensions kept in the rollup table. Monthly totals are derived from
+# event_type, which every report has exactly once.
+ROLLUP_DIMENSIONS = ("event_type", "manufacturer", "patient_problem")
+
+# Partitions are (product_code, first day of month) pairs
+DELETE_PARTITIONS_SQL = """
+DELETE FROM device_event_daily_counts c
+USING unnest(%s::text[], %s::date[]) AS part(product_code, month)
+WHERE c.product_code = part.product_code
+  AND c.day >= part.month
+  AND c.day < part.month + interval '1 month'
+"""
+
+INSERT_PARTITIONS_SQL = """
+INSERT INTO device_event_daily_counts (product_code, day, dimension, value, events)
+SELECT e.product_code, e.date_received, d.dimension, d.value, count(*)
+FROM device_events e
+JOIN unnest(%s::text[], %s::date[]) AS part(product_code, month)
+  ON e.product_code = part.product_code
+ AND e.date_received >= part.month
+ AND e.date_received < part.month + interval '1 month'
+CROSS JOIN LATERAL (
+    SELECT 'event_type', COALESCE(e.event_type, '')
+    UNION ALL
+    SELECT 'manufacturer', COALESCE(e.manufacturer, '')
+    UNION ALL
+    (
+        SELECT DISTINCT 'patient_problem', problem
+        FROM jsonb_array_elements(
+            CASE WHEN jsonb_typeof(e.raw -> 'patient') = 'array'
+                 THEN e.raw -> 'patient' ELSE '[]'::jsonb END
+        ) AS patient,
+        jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(patient -> 'patient_problems') = 'array'
+                 THEN patient -> 'patient_problems' ELSE '[]'::jsonb END
+        ) AS problem
+    )
+) AS d(dimension, value)
+GROUP BY e.product_code, e.date_received, d.dimension, d.value
+"""
+
+# Serializes refreshes of the same partition from concurrent loaders
+LOCK_PARTITION_SQL = "SELECT pg_advisory_xact_lock(hashtext(%s))"
+
+ALL_PARTITIONS_SQL = """
+SELECT DISTINCT product_code, date_trunc('month', date_received)::date
+FROM device_events
+WHERE product_code IS NOT NULL AND date_received IS NOT NULL
+  AND (%s::date IS NULL OR date_received >= %s::date)
+  AND (%s::date IS NULL OR date_received <= %s::date)
+"""
+
+
+def refresh_partitions(cursor, partitions: Iterable[Tuple[str, date]]) -> int:
+    """
+    Recompute the rollups of the given (product_code, month) partitions.
+
+    Runs on the caller's cursor, so it commits (or rolls back) together
+    with the load that changed the partitions.
+
+    Returns:
+        Number of partitions refreshed
+    """
+    partitions = sorted(set(partitions))
+    if not partitions:
+        return 0
+    # Always locked in the same (sorted) order, so loaders cannot deadlock
+    for code, month in partitions:
+        cursor.execute(LOCK_PARTITION_SQL, (f"rollup:{code}:{month}",))
+    codes = [code for code, _ in partitions]
+    months = [month for _, month in partitions]
+    cursor.execute(DELETE_PARTITIONS_SQL, (codes, months))
+    cursor.execute(INSERT_PARTITIONS_SQL, (codes, months))
+    return len(partitions)
+
+
+def all_partitions(
+    cursor, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> List[Tuple[str, date]]:
+    """List the (product_code, month) partitions holding events"""
+    cursor.execute(ALL_PARTITIONS_SQL, (start_date, start_date, end_date, end_date))
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def changed_partitions(rows: Iterable[tuple]) -> Set[Tuple[str, date]]:
+    """Partitions named by the (product_code, month, ...) rows of an upsert"""
+    return {(row[0], row[1]) for row in rows if row[0] and row[1]}
@@ -0,0 +1,321 @@
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Iterable, List, Optional, Sequence
+
+from libs.fda_records import extract_specific_fields
+from libs.logger import logger
+
+# Full-text search over the local Postgres mirror. The tsvector is a stored
+# generated column, so Postgres keeps it (and the GIN index) up to date on
+# every insert and update. Brand name weighs more than manufacturer, which
+# weighs more than the event text.
+SEARCH_SCHEMA_SQL = """
+ALTER TABLE device_events ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(brand_name, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(manufacturer, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(event_text, '')), 'C')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS device_events_search_idx
+    ON device_events USING GIN (search_vector);
+"""
+
+# Embedded index for setups without the database: event rows plus an
+# external-content FTS5 table kept in sync by triggers
+SQLITE_SCHEMA_SQL = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS events (
+    id             INTEGER PRIMARY KEY,
+    mdr_report_key TEXT NOT NULL UNIQUE,
+    report_number  TEXT,
+    product_code   TEXT,
+    date_received  TEXT,
+    event_type     TEXT,
+    manufacturer   TEXT,
+    brand_name     TEXT,
+    event_text     TEXT,
+    web_address    TEXT
+);
+CREATE INDEX IF NOT EXISTS events_product_code_date_received_idx
+    ON events (product_code, date_received);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    brand_name, manufacturer, event_text,
+    content = 'events', content_rowid = 'id', tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS events_ai AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts (rowid, brand_name, manufacturer, event_text)
+    VALUES (new.id, new.brand_name, new.manufacturer, new.event_text);
+END;
+CREATE TRIGGER IF NOT EXISTS events_ad AFTER DELETE ON events BEGIN
+    INSERT INTO events_fts (events_fts, rowid, brand_name, manufacturer, event_text)
+    VALUES ('delete', old.id, old.brand_name, old.manufacturer, old.event_text);
+END;
+CREATE TRIGGER IF NOT EXISTS events_au AFTER UPDATE ON events BEGIN
+    INSERT INTO events_fts (events_fts, rowid, brand_name, manufacturer, event_text)
+    VALUES ('delete', old.id, old.brand_name, old.manufacturer, old.event_text);
+    INSERT INTO events_fts (rowid, brand_name, manufacturer, event_text)
+    VALUES (new.id, new.brand_name, new.manufacturer, new.event_text);
+END;
+"""
+
+# Columns of a search row, in UPSERT_SQL order
+COLUMNS = [
+    "mdr_report_key",
+    "report_number",
+    "product_code",
+    "date_received",
+    "event_type",
+    "manufacturer",
+    "brand_name",
+    "event_text",
+    "web_address",
+]
+
+# Rows whose text did not change are left alone, so the FTS table is only
+# rewritten for reports that were actually updated
+UPSERT_SQL = f"""
+INSERT INTO events ({', '.join(COLUMNS)})
+VALUES ({', '.join('?' for _ in COLUMNS)})
+ON CONFLICT (mdr_report_key) DO UPDATE SET
+    {', '.join(f"{c} = excluded.{c}" for c in COLUMNS[1:])}
+WHERE ({', '.join(f"events.{c}" for c in COLUMNS[1:])})
+    IS NOT ({', '.join(f"excluded.{c}" for c in COLUMNS[1:])})
+"""
+
+# Column weights for bm25: brand name, manufacturer, event text
+BM25_WEIGHTS = "10.0, 5.0, 1.0"
+
+# Hits ranked on the whole match set first; snippets (the expensive part)
+# are only built for the page that is returned
+SQLITE_SEARCH_SQL = f"""
+WITH top AS (
+    SELECT e.id, -bm25(events_fts, {BM25_WEIGHTS}) AS rank
+    FROM events_fts
+    JOIN events e ON e.id = events_fts.rowid
+    WHERE events_fts MATCH ?
+      AND e.product_code IN ({{codes}})
+      AND (? IS NULL OR e.date_received >= ?)
+      AND (? IS NULL OR e.date_received <= ?)
+    ORDER BY rank DESC, e.date_received DESC, e.mdr_report_key
+    LIMIT ? OFFSET ?
+)
+SELECT e.mdr_report_key, e.report_number, e.product_code, e.date_received,
+       e.event_type, e.manufacturer, e.brand_name, e.web_address, top.rank,
+       snippet(events_fts, 2, '<b>', '</b>', '…', 24)
+FROM top
+JOIN events e ON e.id = top.id
+JOIN events_fts ON events_fts.rowid = top.id
+WHERE events_fts MATCH ?
+ORDER BY top.rank DESC, e.date_received DESC, e.mdr_report_key
+"""
+
+# Fields returned with every hit, shared by both backends
+RESULT_FIELDS = [
+    "mdr_report_key",
+    "report_number",
+    "product_code",
+    "date_received",
+    "event_type",
+    "manufacturer",
+    "brand_name",
+    "web_address",
+    "rank",
+    "snippet",
+]
+
+# Quoted phrases, or runs of anything but whitespace
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def fts5_query(text: str) -> str:
+    """
+    Translate a web-search style query into an FTS5 query.
+
+    Words and "quoted phrases" must all match; OR between terms matches
+    either, a leading - excludes a term and a trailing * matches a prefix.
+    Everything else is quoted, so user input never hits FTS5 syntax errors.
+
+    Returns:
+        The FTS5 query, or "" if the text holds no terms
+    """
+    parts: List[str] = []
+    for phrase, word in _QUERY_TOKEN.findall(text):
+        if word.upper() == "OR":
+            if parts and parts[-1] != "OR":
+                parts.append("OR")
+            continue
+        negate = word.startswith("-") and len(word) > 1
+        if negate:
+            word = word[1:]
+        prefix = word.endswith("*") and len(word) > 1
+        term = (phrase or word.rstrip("*")).replace('"', "").strip()
+        if not term:
+            continue
+        term = f'"{term}"' + ("*" if prefix else "")
+        if negate:
+            if not parts or parts[-1] == "OR":
+                # FTS5's NOT needs a left-hand side
+                continue
+            term = f"NOT {term}"
+        parts.append(term)
+    while parts and parts[-1] == "OR":
+        parts.pop()
+    return " ".join(parts)
+
+
+def _iso_date(value: Optional[str]) -> Optional[str]:
+    """Convert an openFDA YYYYMMDD date to ISO format, or None"""
+    if not value or len(value) != 8 or not value.isdigit():
+        return None
+    return f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+
+
+def record_to_search_row(record: dict) -> Optional[tuple]:
+    """
+    Turn an openFDA record into a row of COLUMNS.
+
+    Returns:
+        The row, or None if the record has no mdr_report_key
+    """
+    mdr_report_key = record.get("mdr_report_key")
+    if not mdr_report_key:
+        return None
+    fields = extract_specific_fields(record)
+    return (
+        mdr_report_key,
+        fields["Report Number"],
+        fields["Product Code"],
+        _iso_date(record.get("date_received")),
+        fields["Event Type"],
+        fields["Manufacturer"],
+        fields["Brand Name"],
+        fields["Event Text"],
+        fields["Web Address"],
+    )
+
+
+class SearchIndex:
+    def __init__(self, path: str, max_pending: int = 50000):
+        """
+        Embedded SQLite FTS5 index over event text, manufacturer and brand
+        name, for setups without the Postgres mirror.
+
+        Records are added incrementally as they are fetched. Writes go
+        through a single background thread so they never hold up a request;
+        searches use their own (WAL) read connections and are not blocked by
+        writes.
+
+        Args:
+            path: SQLite database file
+            max_pending: Records queued for indexing before further batches
+                are dropped (they are indexed the next time they are fetched)
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="search-index"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def open(self):
+        """Create the index file and tables if needed"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = self._connect()
+        self._writer.executescript(SQLITE_SCHEMA_SQL)
+        self._writer.commit()
+
+    def close(self):
+        """Finish queued writes and close the writer connection"""
+        self._executor.shutdown(wait=True)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def add(self, records: Iterable[dict]) -> int:
+        """
+        Insert or update records in the index, in one transaction.
+
+        Returns:
+            Number of records written
+        """
+        rows = [row for row in map(record_to_search_row, records) if row]
+        if not rows:
+            return 0
+        with self._writer:
+            self._writer.executemany(UPSERT_SQL, rows)
+        return len(rows)
+
+    def submit(self, records: List[dict]):
+        """Queue records for indexing on the writer thread without waiting"""
+        if not records:
+            return
+        with self._lock:
+            if self.pending + len(records) > self.max_pending:
+                logger.warning(
+                    f"Search index queue full, skipping {len(records)} records"
+                )
+                return
+            self.pending += len(records)
+        self._executor.submit(self._add_queued, records)
+
+    def _add_queued(self, records: List[dict]):
+        try:
+            self.add(records)
+        except sqlite3.Error as e:
+            logger.exception(f"Indexing {len(records)} records failed: {str(e)}")
+        finally:
+            with self._lock:
+                self.pending -= len(records)
+
+    def search(
+        self,
+        query: str,
+        product_codes: Sequence[str],
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: int,
+        offset: int = 0,
+    ) -> List[dict]:
+        """
+        Find reports matching a query, best matches first.
+
+        Args:
+            query: Web-search style query (see fts5_query)
+            product_codes: Device product codes
+            start_date: Optional start of the date_received range
+            end_date: Optional end of the date_received range
+            limit: Number of hits to return
+            offset: Number of hits to skip
+
+        Returns:
+            Hits with the RESULT_FIELDS keys
+        """
+        match = fts5_query(query)
+        if not match:
+            return []
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+
+        codes = list(product_codes)
+        dates = [start_date.isoformat() if start_date else None] * 2
+        dates += [end_date.isoformat() if end_date else None] * 2
+        rows = conn.execute(
+            SQLITE_SEARCH_SQL.format(codes=", ".join("?" for _ in codes)),
+            [match, *codes, *dates, limit, offset, match],
+        ).fetchall()
+        return [dict(zip(RESULT_FIELDS, row)) for row in rows]
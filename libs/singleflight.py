@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesce identical in-flight calls so they share a single execution.
+
+        The first caller for a key starts the work; callers arriving while it
+        is still running await the same task and receive the same result (or
+        exception). Results are shared objects and must not be mutated.
+        """
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn` for `key`, or join the call already running for it.
+
+        Args:
+            key: Identity of the call
+            fn: Zero-argument coroutine function doing the actual work
+
+        Returns:
+            The result of the shared call
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        # Shield so one caller giving up does not cancel the others' work
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
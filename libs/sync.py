@@ -0,0 +1,302 @@
+import asyncio
+import math
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from libs.fda_fetcher import FDAFetcher, split_date_range
+from libs.ingest import DeviceEventLoader, parse_fda_date
+from libs.logger import logger
+
+# Sync bookkeeping: per product code, the latest date_received loaded and
+# the day of the last incremental run (changes are synced from there), plus
+# the windows completed by each backfill job so an interrupted run can resume
+SYNC_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS sync_watermarks (
+    product_code TEXT PRIMARY KEY,
+    high_water   DATE NOT NULL,
+    synced_on    DATE,
+    updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE sync_watermarks ADD COLUMN IF NOT EXISTS synced_on DATE;
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    job_name     TEXT NOT NULL,
+    product_code TEXT NOT NULL,
+    window_start DATE NOT NULL,
+    window_end   DATE NOT NULL,
+    records      INTEGER NOT NULL,
+    completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (job_name, product_code, window_start, window_end)
+);
+"""
+
+# Effectively unbounded: a sync window always fetches every matching record
+WINDOW_RECORD_LIMIT = 10**9
+
+
+class SyncWorker:
+    def __init__(
+        self,
+        fetcher: FDAFetcher,
+        loader: DeviceEventLoader,
+        window_days: int = 7,
+        concurrency: int = 4,
+        initial_start: date = date(2015, 1, 1),
+    ):
+        """
+        Keep the local mirror up to date with openFDA.
+
+        A sync run loads the reports received since the stored high-water
+        mark, split into windows that are fetched concurrently, and the
+        older reports openFDA changed (date_changed) since the previous
+        run, with a single query over their whole range.
+
+        Args:
+            fetcher: openFDA fetcher (without a response cache)
+            loader: Loader writing into the local mirror
+            window_days: Days covered by each fetched window
+            concurrency: Windows fetched at the same time
+            initial_start: Where to start when a product code was never synced
+        """
+        self.fetcher = fetcher
+        self.loader = loader
+        self.window_days = window_days
+        self.concurrency = concurrency
+        self.initial_start = initial_start
+        # The psycopg2 connection is not safe for concurrent use
+        self._db_lock = asyncio.Lock()
+
+    @property
+    def conn(self):
+        return self.loader.connector.conn
+
+    def ensure_schema(self):
+        """Create the mirror and sync bookkeeping tables if missing"""
+        self.loader.ensure_schema()
+        with self.conn.cursor() as cursor:
+            cursor.execute(SYNC_SCHEMA_SQL)
+        self.conn.commit()
+
+    def get_watermark(self, product_code: str) -> Tuple[Optional[date], Optional[date]]:
+        """(high-water date_received, day of the last incremental run)"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT high_water, synced_on FROM sync_watermarks
+                WHERE product_code = %s
+                """,
+                (product_code,),
+            )
+            row = cursor.fetchone()
+        self.conn.commit()
+        return (row[0], row[1]) if row else (None, None)
+
+    def set_watermark(
+        self, product_code: str, high_water: date, synced_on: Optional[date] = None
+    ):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO sync_watermarks (product_code, high_water, synced_on)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (product_code) DO UPDATE
+                SET high_water = GREATEST(sync_watermarks.high_water,
+                                          EXCLUDED.high_water),
+                    synced_on = COALESCE(EXCLUDED.synced_on,
+                                         sync_watermarks.synced_on),
+                    updated_at = now()
+                """,
+                (product_code, high_water, synced_on),
+            )
+        self.conn.commit()
+
+    def completed_windows(
+        self, job_name: str, product_code: str
+    ) -> List[Tuple[date, date]]:
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT window_start, window_end FROM sync_checkpoints
+                WHERE job_name = %s AND product_code = %s
+                """,
+                (job_name, product_code),
+            )
+            rows = cursor.fetchall()
+        self.conn.commit()
+        return [(row[0], row[1]) for row in rows]
+
+    def record_checkpoint(
+        self,
+        job_name: str,
+        product_code: str,
+        window: Tuple[date, date],
+        records: int,
+    ):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO sync_checkpoints
+                    (job_name, product_code, window_start, window_end, records)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (job_name, product_code, window_start, window_end)
+                DO UPDATE SET records = EXCLUDED.records, completed_at = now()
+                """,
+                (job_name, product_code, window[0], window[1], records),
+            )
+        self.conn.commit()
+
+    async def sync(self, product_code: str, today: Optional[date] = None) -> int:
+        """
+        Incrementally sync one product code up to today.
+
+        Reports received from the high-water day on are fetched in full
+        (reports of that day may have arrived after the last run). Earlier
+        reports are only fetched if their date_changed is on or after the
+        day of the last run (or the high-water mark, for marks stored
+        before runs were recorded), so amended reports are picked up
+        without re-pulling their date range.
+
+        Returns:
+            Number of rows inserted or updated
+        """
+        today = today or date.today()
+        async with self._db_lock:
+            watermark, synced_on = await asyncio.to_thread(
+                self.get_watermark, product_code
+            )
+
+        if watermark is None:
+            logger.info(f"Syncing {product_code} from {self.initial_start} to {today}")
+            upserted, high_water = await self._run_windows(
+                product_code, self.initial_start, today
+            )
+        else:
+            changed_since = synced_on or watermark
+            logger.info(
+                f"Syncing {product_code}: received from {watermark} to {today}, "
+                f"changed since {changed_since}"
+            )
+            upserted, high_water = await self._run_windows(
+                product_code, watermark, today
+            )
+            if watermark > self.initial_start:
+                changed, _ = await self._run_windows(
+                    product_code,
+                    self.initial_start,
+                    watermark - timedelta(days=1),
+                    since=changed_since,
+                )
+                upserted += changed
+            high_water = max(high_water or watermark, watermark)
+
+        if high_water is not None:
+            async with self._db_lock:
+                await asyncio.to_thread(
+                    self.set_watermark, product_code, high_water, today
+                )
+        logger.info(
+            f"Sync of {product_code} done: {upserted} rows upserted, "
+            f"high-water mark {high_water}"
+        )
+        return upserted
+
+    async def backfill(
+        self,
+        product_code: str,
+        start_date: date,
+        end_date: date,
+        job_name: Optional[str] = None,
+    ) -> int:
+        """
+        Load an arbitrary date range, resuming from the checkpoints of a
+        previous run with the same job name.
+
+        Returns:
+            Number of rows inserted or updated
+        """
+        job_name = job_name or f"backfill-{start_date}-{end_date}"
+        async with self._db_lock:
+            done = set(
+                await asyncio.to_thread(self.completed_windows, job_name, product_code)
+            )
+        if done:
+            logger.info(f"Resuming {job_name}: {len(done)} windows already completed")
+
+        upserted, high_water = await self._run_windows(
+            product_code, start_date, end_date, job_name=job_name, skip=done
+        )
+        if high_water is not None:
+            async with self._db_lock:
+                await asyncio.to_thread(self.set_watermark, product_code, high_water)
+        logger.info(f"{job_name} for {product_code} done: {upserted} rows upserted")
+        return upserted
+
+    async def _run_windows(
+        self,
+        product_code: str,
+        start_date: date,
+        end_date: date,
+        job_name: Optional[str] = None,
+        skip: Optional[set] = None,
+        since: Optional[date] = None,
+    ) -> Tuple[int, Optional[date]]:
+        """
+        Fetch the range window by window (concurrently) and load each window
+        as soon as it arrives. With `since`, only the reports received or
+        changed on or after that day are fetched, in a single window: they
+        are few and spread over the whole range. If a window fails, the
+        fetches still running are cancelled.
+
+        Returns:
+            (rows upserted, latest date_received loaded)
+        """
+        if since is not None:
+            windows = [(start_date, end_date)]
+        else:
+            total_days = (end_date - start_date).days + 1
+            windows = [
+                window
+                for window in split_date_range(
+                    start_date, end_date, math.ceil(total_days / self.window_days)
+                )
+                if window not in (skip or set())
+            ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(window):
+            async with semaphore:
+                records = await self.fetcher.fetch_records(
+                    product_code, window[0], window[1], WINDOW_RECORD_LIMIT, since
+                )
+            return window, records
+
+        upserted = 0
+        high_water = None
+        tasks = [asyncio.ensure_future(fetch(window)) for window in windows]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                window, records = await next_done
+                async with self._db_lock:
+                    upserted += await asyncio.to_thread(self.loader.load, records)
+                    if job_name:
+                        await asyncio.to_thread(
+                            self.record_checkpoint,
+                            job_name,
+                            product_code,
+                            window,
+                            len(records),
+                        )
+                for record in records:
+                    received = parse_fda_date(record.get("date_received"))
+                    if received and (high_water is None or received > high_water):
+                        high_water = received
+                logger.info(
+                    f"{product_code} {window[0]}..{window[1]}: {len(records)} records"
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if high_water is not None:
+            high_water = date.fromisoformat(high_water)
+        return upserted, high_water
@@ -0,0 +1,18 @@
+import os
+import sys
+from pathlib import Path
+
+# Run from anywhere: make the repository root importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Settings require the database components; tests never connect
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "fda",
+    "DB_USER": "fda",
+    "DB_PASSWORD": "unused",
+    # Keep test runs from writing fda_db_checkup.log
+    "LOG_FILE": "",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,38 @@
+import os
+import time
+
+from libs.cache import DiskCache
+
+VALUE = "x" * 1000
+
+
+def test_disk_cache_evicts_least_recently_used_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=4500)
+    for i in range(4):
+        cache.set(f"key{i}", VALUE, 3600)
+        # Modification times must differ for the eviction order
+        os.utime(cache._path(f"key{i}"), (time.time() - 100 + i,) * 2)
+    assert cache.get("key0") is not None
+
+    cache.set("key4", VALUE, 3600)
+    assert cache.current_bytes <= 4050
+    assert cache.current_bytes == sum(
+        os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)
+    )
+    # key0 was read last, so key1 and key2 went first
+    assert cache.get("key1") is None and cache.get("key2") is None
+    assert cache.get("key0") is not None and cache.get("key4") is not None
+
+
+def test_disk_cache_counts_existing_files_and_prunes_to_the_limit(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    for i in range(5):
+        cache.set(f"key{i}", VALUE, 3600)
+    cache.set("expired", VALUE, -1)
+    size = cache.current_bytes
+
+    reopened = DiskCache(str(tmp_path), max_bytes=size // 2)
+    assert reopened.current_bytes == size
+    assert reopened.prune() >= 4
+    assert 0 < reopened.current_bytes <= size // 2 * 0.9
+    assert len(os.listdir(tmp_path)) < 3
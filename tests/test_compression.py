@@ -0,0 +1,61 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+from libs.compression import CompressionMiddleware
+
+BODY = "report_number,event_type\n" * 2000
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse(BODY, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/partial")
+    async def partial():
+        return Response(
+            BODY[100:].encode(),
+            status_code=206,
+            media_type="text/csv",
+            headers={"Content-Range": f"bytes 100-{len(BODY) - 1}/{len(BODY)}"},
+        )
+
+    return app
+
+
+client = TestClient(create_app())
+
+
+def test_compresses_complete_text_responses():
+    response = client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.text == BODY
+
+
+def test_vary_without_compression():
+    response = client.get("/text", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == '"v1"'
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_partial_content_is_not_compressed():
+    response = client.get("/partial", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert response.content == BODY[100:].encode()
@@ -0,0 +1,61 @@
+import asyncio
+
+from libs.export_jobs import COMPLETED, ExportJobManager
+
+PARAMS = {"product_codes": ["FKX"], "start_date": "2024-01-01", "limit": 10}
+
+
+async def open_chunks(progress):
+    async def chunks():
+        progress(1)
+        yield "header\n"
+        yield "row\n"
+
+    return chunks()
+
+
+async def finished_job(manager, max_age=None):
+    job, created = manager.submit(
+        PARAMS, "export.csv", "text/csv", 10, open_chunks, max_age=max_age
+    )
+    await asyncio.gather(*manager._tasks.values())
+    return job, created
+
+
+def test_completed_job_is_reused_while_fresh(tmp_path):
+    async def run():
+        manager = ExportJobManager(str(tmp_path))
+        job, created = await finished_job(manager)
+        assert created and job.status == COMPLETED
+        again, created = await finished_job(manager, max_age=3600)
+        assert again is job and not created
+
+    asyncio.run(run())
+
+
+def test_stale_completed_job_is_rerun(tmp_path):
+    async def run():
+        manager = ExportJobManager(str(tmp_path))
+        job, _ = await finished_job(manager)
+        job.finished_at -= 7200
+        fresh, created = await finished_job(manager, max_age=3600)
+        assert created and fresh is not job
+        assert fresh.status == COMPLETED
+        # Later requests get the new file
+        again, created = await finished_job(manager, max_age=3600)
+        assert again is fresh and not created
+
+    asyncio.run(run())
+
+
+def test_finished_job_is_saved(tmp_path):
+    async def run():
+        manager = ExportJobManager(str(tmp_path))
+        job, _ = await finished_job(manager)
+        restored = ExportJobManager(str(tmp_path))
+        assert restored.load() == 1
+        assert restored.get(job.id).status == COMPLETED
+        with open(restored.file_path(job), encoding="utf-8") as f:
+            assert f.read() == "header\nrow\n"
+
+    asyncio.run(run())
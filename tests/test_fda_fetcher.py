@@ -0,0 +1,113 @@
+import asyncio
+from datetime import date
+
+import httpx
+
+from benchmarks.stub_fda import create_stub_app
+from libs.cache import LRUCache, TieredCache
+from libs.fda_fetcher import FDAFetcher
+from libs.http_client import HTTPXClient
+
+START = date(2024, 1, 1)
+END = date(2024, 3, 31)
+
+
+class RecordingIndex:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, records):
+        self.records.extend(records)
+
+
+def stub_fetcher(records_per_code=1050, **kwargs):
+    stub_app = create_stub_app(records_per_code=records_per_code, days=90)
+    client = HTTPXClient()
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub_app))
+    fetcher = FDAFetcher(client, "http://stub/device/event.json", **kwargs)
+    return fetcher, stub_app
+
+
+async def collect(records):
+    return [record async for record in records]
+
+
+def test_iter_records_pages_through_prefetched_pages():
+    index = RecordingIndex()
+    fetcher, stub_app = stub_fetcher(
+        page_size=100, prefetch_pages=3, search_index=index
+    )
+    records = asyncio.run(collect(fetcher.iter_records("FKX", START, END, 5000)))
+
+    keys = [record["mdr_report_key"] for record in records]
+    assert len(keys) == 1050
+    assert len(set(keys)) == 1050
+    dates = [record["date_received"] for record in records]
+    assert dates == sorted(dates)
+    # Every downloaded record reached the index, in small batches
+    assert len(index.records) == 1050
+    # 11 pages, plus whatever was prefetched beyond the last one
+    assert 11 <= stub_app.state.stats["requests"] <= 11 + 2
+
+
+def test_iter_records_stops_at_limit():
+    fetcher, _ = stub_fetcher(page_size=100, prefetch_pages=2)
+    records = asyncio.run(collect(fetcher.iter_records("FKX", START, END, 250)))
+    assert len(records) == 250
+
+
+def test_iter_records_serves_repeated_exports_from_the_page_cache():
+    cache = TieredCache(LRUCache(64 * 1024 * 1024))
+    fetcher, stub_app = stub_fetcher(page_size=100, prefetch_pages=2, cache=cache)
+
+    first = asyncio.run(collect(fetcher.iter_records("FKX", START, END, 5000)))
+    requests = stub_app.state.stats["requests"]
+    second = asyncio.run(collect(fetcher.iter_records("FKX", START, END, 5000)))
+
+    assert second == first
+    assert stub_app.state.stats["requests"] == requests
+
+
+def test_iter_records_serves_a_cached_complete_result():
+    cache = TieredCache(LRUCache(64 * 1024 * 1024))
+    fetcher, stub_app = stub_fetcher(page_size=100, cache=cache)
+
+    records = asyncio.run(fetcher.fetch_records("FKX", START, END, 300))
+    requests = stub_app.state.stats["requests"]
+    streamed = asyncio.run(collect(fetcher.iter_records("FKX", START, END, 300)))
+
+    assert streamed == records
+    assert stub_app.state.stats["requests"] == requests
+
+
+class InFlightClient:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def get_bytes(self, url):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return b'{"results": []}'
+
+
+def test_fetchers_sharing_a_semaphore_share_the_limit():
+    async def run():
+        client = InFlightClient()
+        semaphore = asyncio.Semaphore(2)
+        fetchers = [
+            FDAFetcher(client, "http://stub", max_concurrency=2, semaphore=semaphore)
+            for _ in range(3)
+        ]
+        await asyncio.gather(
+            *(
+                fetcher.fetch_page_bytes("x", 100, skip)
+                for fetcher in fetchers
+                for skip in range(0, 400, 100)
+            )
+        )
+        return client.peak
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,94 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_extract import reference_extract_specific_fields
+from libs.fda_records import (
+    CSV_FIELDNAMES,
+    extract_row,
+    extract_specific_fields,
+    format_date,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture(scope="module")
+def records():
+    return json.loads((FIXTURES / "device_events.json").read_text())
+
+
+def test_columns_of_a_full_record(records):
+    row = dict(zip(CSV_FIELDNAMES, extract_row(records[0])))
+    assert row == {
+        "Web Address": (
+            "https://www.accessdata.fda.gov/scripts/cdrh/cfdocs/cfMAUDE/"
+            "Detail.CFM?MDRFOI__ID=18300001&pc=FRN"
+        ),
+        "Report Number": "3005334138-2024-00012",
+        "Event Date": "01-15-2024 00:00:00",
+        "Event Type": "Malfunction",
+        "Manufacturer": "ACME MEDICAL INC.",
+        "Date Received": "02-29-2024 00:00:00",
+        "Product Code": "FRN",
+        "Brand Name": "ACME PUMP",
+        "Device Problem": "Device Alarm System, Battery Problem",
+        "Patient Problem": "No Clinical Signs, Symptoms or Conditions",
+        "PMA/PMN Number": "K123456",
+        "Exemption Number": "E2019001",
+        "Number of Events": "1",
+        "Event Text": (
+            "Event Description: Pump alarmed. "
+            "Manufacturer Narrative: Device evaluated. No fault found."
+        ),
+    }
+
+
+def test_patient_problems_are_deduplicated(records):
+    row = dict(zip(CSV_FIELDNAMES, extract_row(records[1])))
+    assert sorted(row["Patient Problem"].split(", ")) == ["Pain", "Swelling"]
+    assert row["Device Problem"] == ""
+
+
+def test_single_device_and_missing_values(records):
+    row = dict(zip(CSV_FIELDNAMES, extract_row(records[1])))
+    assert row["Product Code"] == "LZG"
+    assert row["Manufacturer"] == "SINGLE DEVICE CORP"
+    assert row["Brand Name"] == ""
+    assert row["Event Text"] == "Manufacturer Narrative: Narrative only."
+
+    row = dict(zip(CSV_FIELDNAMES, extract_row(records[2])))
+    assert row["Web Address"] == ""
+    assert row["Product Code"] == ""
+    assert row["Patient Problem"] == ""
+    assert row["Event Text"] == ""
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("20240115", "01-15-2024 00:00:00"),
+        ("20240229", "02-29-2024 00:00:00"),
+        # Years below 1000 keep going through strftime, whose (unpadded on
+        # glibc) output the fast path must not change
+        (
+            "09990101",
+            datetime(999, 1, 1).strftime("%m-%d-%Y %H:%M:%S"),
+        ),
+        ("20230230", "20230230"),
+        ("2023", "2023"),
+        ("", ""),
+        (None, ""),
+    ],
+)
+def test_format_date(value, expected):
+    assert format_date(value) == expected
+
+
+def test_matches_reference_extractor(records):
+    for record in records:
+        assert extract_specific_fields(record) == reference_extract_specific_fields(
+            record
+        )
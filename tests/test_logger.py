@@ -0,0 +1,38 @@
+import io
+import logging
+import sys
+
+import pytest
+
+from libs.logger import flush_logging, logger, shutdown_logging
+
+# libs.logger the module, shadowed on the package by the logger it creates
+logger_module = sys.modules["libs.logger"]
+
+
+@pytest.fixture
+def console():
+    stream = io.StringIO()
+    handler = next(
+        h for h in logger_module._handlers if type(h) is logging.StreamHandler
+    )
+    previous = handler.setStream(stream)
+    yield stream
+    handler.setStream(previous)
+
+
+def test_records_after_shutdown_are_still_written(console):
+    logger.info("before shutdown")
+    flush_logging()
+    shutdown_logging()
+    logger.info("after shutdown")
+    # A second shutdown (e.g. at exit) is harmless
+    shutdown_logging()
+    logger.warning("after the second shutdown")
+
+    lines = console.getvalue().splitlines()
+    assert [line.rsplit(" - ", 1)[-1] for line in lines[-3:]] == [
+        "before shutdown",
+        "after shutdown",
+        "after the second shutdown",
+    ]
@@ -0,0 +1,60 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from libs.metrics import REQUEST_SECONDS, MetricsMiddleware, metrics_available
+
+pytestmark = pytest.mark.skipif(
+    not metrics_available(), reason="prometheus_client is not installed"
+)
+
+
+def observed_routes():
+    return {
+        sample.labels["route"]
+        for metric in REQUEST_SECONDS.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_count")
+    }
+
+
+@pytest.fixture(scope="module")
+def client():
+    router = APIRouter(prefix="/jobs")
+
+    @router.get("/{job_id}")
+    async def get_job(job_id: str):
+        return {"id": job_id}
+
+    @router.get("/{job_id}/files/{name:path}")
+    async def get_file(job_id: str, name: str):
+        return {"name": name}
+
+    sub_app = FastAPI()
+    sub_app.include_router(router, prefix="/v2")
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.mount("/mounted", sub_app)
+    with TestClient(MetricsMiddleware(app)) as client:
+        yield client
+
+
+def test_route_label_includes_router_prefix(client):
+    assert client.get("/api/v1/jobs/abc").status_code == 200
+    assert "/api/v1/jobs/{job_id}" in observed_routes()
+
+
+def test_route_label_with_path_parameter(client):
+    assert client.get("/api/v1/jobs/abc/files/a/b.csv").status_code == 200
+    assert "/api/v1/jobs/{job_id}/files/{name:path}" in observed_routes()
+
+
+def test_route_label_includes_mount_path(client):
+    assert client.get("/mounted/v2/jobs/abc").status_code == 200
+    assert "/mounted/v2/jobs/{job_id}" in observed_routes()
+
+
+def test_unmatched_route(client):
+    assert client.get("/nowhere").status_code == 404
+    assert "unmatched" in observed_routes()
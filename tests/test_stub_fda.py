@@ -0,0 +1,183 @@
+import csv
+import io
+from datetime import date
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_fda import create_stub_app
+from libs.fda_fetcher import build_search
+from libs.columnar import columnar_available
+from libs.fda_records import CSV_FIELDNAMES
+
+RECORDS = 300
+START = date(2024, 1, 1)
+END = date(2024, 3, 31)
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with TestClient(create_stub_app(records_per_code=RECORDS, days=90)) as client:
+        yield client
+
+
+def search(stub, codes, **params):
+    return stub.get(
+        "/device/event.json",
+        params={"search": build_search(codes, START, END), **params},
+    )
+
+
+def test_single_code_total(stub):
+    response = search(stub, "FKX", limit=1)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["meta"]["results"]["total"] == RECORDS
+    assert body["results"][0]["device"][0]["device_report_product_code"] == "FKX"
+
+
+def test_two_codes_match_either_sorted_by_date(stub):
+    response = search(stub, ["FKX", "LZG"], limit=1000)
+    body = response.json()
+    assert body["meta"]["results"]["total"] == 2 * RECORDS
+    dates = [record["date_received"] for record in body["results"]]
+    assert dates == sorted(dates)
+    codes = {
+        record["device"][0]["device_report_product_code"] for record in body["results"]
+    }
+    assert codes == {"FKX", "LZG"}
+
+
+def test_skip_pages_through_results(stub):
+    everything = search(stub, "FKX", limit=RECORDS).json()["results"]
+    pages = [
+        search(stub, "FKX", limit=100, skip=skip).json()["results"]
+        for skip in range(0, RECORDS, 100)
+    ]
+    assert [record for page in pages for record in page] == everything
+    assert search(stub, "FKX", limit=100, skip=RECORDS).json()["results"] == []
+
+
+def test_limit_capped_at_page_size(stub):
+    body = search(stub, ["FKX", "LZG", "DXN", "MAF"], limit=5000).json()
+    assert body["meta"]["results"]["limit"] == 1000
+    assert len(body["results"]) == 1000
+
+
+def test_skip_beyond_maximum_rejected(stub):
+    response = search(stub, "FKX", limit=1, skip=25001)
+    assert response.status_code == 400
+
+
+def test_no_match_is_404(stub):
+    response = stub.get(
+        "/device/event.json",
+        params={
+            "search": build_search("FKX", date(2020, 1, 1), date(2020, 12, 31)),
+            "limit": 1,
+        },
+    )
+    assert response.status_code == 404
+    assert response.json()["error"]["code"] == "NOT_FOUND"
+
+
+def test_unsupported_search_rejected(stub):
+    response = stub.get("/device/event.json", params={"search": "foo:bar"})
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The application, with openFDA replaced by the stub"""
+    from app.core.config import settings
+    from app.main import app
+    from libs.http_client import HTTPXClient
+
+    stub_app = create_stub_app(records_per_code=RECORDS, days=90)
+    monkeypatch.setattr(settings, "CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "EXPORT_EXECUTOR", "none")
+    monkeypatch.setattr(settings, "SEARCH_INDEX_PATH", "")
+    monkeypatch.setattr(settings, "DOWNLOAD_SOURCE", "api")
+
+    init = HTTPXClient.__init__
+
+    def stub_client(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=stub_app),
+            base_url="https://api.fda.gov",
+        )
+
+    monkeypatch.setattr(HTTPXClient, "__init__", stub_client)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_csv_export_end_to_end(api):
+    response = api.get(
+        "/api/v1/downloads/csv",
+        params={
+            "startDate": START.isoformat(),
+            "endDate": END.isoformat(),
+            "productCode": "FKX,LZG",
+            "limit": 450,
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 450
+    assert list(rows[0]) == CSV_FIELDNAMES
+    assert len({row["Web Address"] for row in rows}) == 450
+    assert {row["Product Code"] for row in rows} == {"FKX", "LZG"}
+
+
+def test_export_validators_allow_a_304(api):
+    params = {
+        "startDate": START.isoformat(),
+        "endDate": END.isoformat(),
+        "productCode": "FKX",
+        "limit": 10,
+    }
+    response = api.get("/api/v1/downloads/csv", params=params)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+
+    response = api.get(
+        "/api/v1/downloads/csv", params=params, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_delta_without_changes_is_an_empty_export(api, fmt):
+    if fmt != "csv" and not columnar_available():
+        pytest.skip("pyarrow is not installed")
+    params = {
+        "startDate": "2020-01-01",
+        "endDate": "2020-12-31",
+        "productCode": "FKX",
+        "since": "2024-06-01",
+    }
+    response = api.get(f"/api/v1/downloads/{fmt}", params=params)
+    assert response.status_code == 200
+    if fmt == "csv":
+        assert list(csv.reader(io.StringIO(response.text))) == [CSV_FIELDNAMES]
+    else:
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        if fmt == "parquet":
+            table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+        else:
+            table = pyarrow.ipc.open_stream(response.content).read_all()
+        assert table.num_rows == 0
+
+    # Without `since`, the same empty range is missing data
+    del params["since"]
+    assert api.get(f"/api/v1/downloads/{fmt}", params=params).status_code == 404
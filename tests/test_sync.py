@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from libs.sync import SyncWorker
+
+
+class FakeFetcher:
+    def __init__(self, fail_on=None, delay=0.0):
+        self.calls = []
+        self.cancelled = 0
+        self.fail_on = fail_on
+        self.delay = delay
+
+    async def fetch_records(
+        self, product_code, start_date, end_date, limit, since=None
+    ):
+        self.calls.append((start_date, end_date, since))
+        if start_date == self.fail_on:
+            raise RuntimeError("upstream failed")
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return [
+            {"mdr_report_key": str(start_date), "date_received": f"{end_date:%Y%m%d}"}
+        ]
+
+
+class FakeLoader:
+    def __init__(self):
+        self.loaded = []
+
+    def load(self, records):
+        self.loaded.extend(records)
+        return len(records)
+
+
+class MemorySyncWorker(SyncWorker):
+    """SyncWorker keeping its watermarks in memory instead of Postgres"""
+
+    def __init__(self, fetcher, watermarks=None, **kwargs):
+        super().__init__(fetcher, FakeLoader(), **kwargs)
+        self.watermarks = dict(watermarks or {})
+
+    def get_watermark(self, product_code):
+        return self.watermarks.get(product_code, (None, None))
+
+    def set_watermark(self, product_code, high_water, synced_on=None):
+        self.watermarks[product_code] = (high_water, synced_on)
+
+    def completed_windows(self, job_name, product_code):
+        return []
+
+    def record_checkpoint(self, job_name, product_code, window, records):
+        pass
+
+
+def test_incremental_sync_fetches_new_and_changed_reports():
+    fetcher = FakeFetcher()
+    worker = MemorySyncWorker(
+        fetcher,
+        {"FKX": (date(2024, 6, 10), date(2024, 6, 12))},
+        window_days=7,
+        initial_start=date(2015, 1, 1),
+    )
+    upserted = asyncio.run(worker.sync("FKX", today=date(2024, 6, 20)))
+
+    received = sorted(call for call in fetcher.calls if call[2] is None)
+    changed = [call for call in fetcher.calls if call[2] is not None]
+    # New reports: from the high-water day on, in windows
+    assert received[0][0] == date(2024, 6, 10)
+    assert received[-1][1] == date(2024, 6, 20)
+    assert len(received) == 2
+    # Changed reports: one query over everything older, keyed on the last run
+    assert changed == [(date(2015, 1, 1), date(2024, 6, 9), date(2024, 6, 12))]
+    assert upserted == 3
+    assert worker.watermarks["FKX"] == (date(2024, 6, 20), date(2024, 6, 20))
+
+
+def test_first_sync_starts_at_initial_start():
+    fetcher = FakeFetcher()
+    worker = MemorySyncWorker(fetcher, window_days=30, initial_start=date(2024, 1, 1))
+    asyncio.run(worker.sync("FKX", today=date(2024, 3, 31)))
+
+    assert all(since is None for _, _, since in fetcher.calls)
+    assert min(start for start, _, _ in fetcher.calls) == date(2024, 1, 1)
+    assert worker.watermarks["FKX"] == (date(2024, 3, 31), date(2024, 3, 31))
+
+
+def test_failed_window_cancels_the_other_fetches():
+    fetcher = FakeFetcher(fail_on=date(2024, 1, 1), delay=10.0)
+    worker = MemorySyncWorker(fetcher, window_days=7, concurrency=4)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await worker.backfill("FKX", date(2024, 1, 1), date(2024, 2, 29), "job")
+        await asyncio.sleep(0)
+        return [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+
+    leftover = asyncio.run(run())
+    assert leftover == []
+    # Every fetch that got going, except the failed one, was cancelled
+    assert fetcher.cancelled == len(fetcher.calls) - 1
+    assert worker.loader.loaded == []
@@ -0,0 +1,135 @@
+"""
+SyncWorker against a real Postgres, started with pgserver or taken from
+TEST_DATABASE_URL; skipped when neither is available.
+"""
+
+import asyncio
+import os
+from datetime import date
+
+import httpx
+import pytest
+
+from benchmarks.stub_fda import create_stub_app
+from libs.db import PostgresConnector
+from libs.fda_fetcher import FDAFetcher
+from libs.http_client import HTTPXClient
+from libs.ingest import DeviceEventLoader
+from libs.sync import SyncWorker
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+
+@pytest.fixture(scope="module")
+def database_url(tmp_path_factory):
+    url = os.environ.get("TEST_DATABASE_URL")
+    if url:
+        yield url
+        return
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(
+        str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="stop"
+    )
+    yield server.get_uri()
+    server.cleanup()
+
+
+@pytest.fixture
+def conn(database_url):
+    conn = psycopg2.connect(database_url)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "DROP TABLE IF EXISTS sync_watermarks, sync_checkpoints, "
+            "device_events CASCADE"
+        )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def make_worker(conn, stub_app):
+    connector = PostgresConnector({})
+    connector.conn = conn
+    connector.cursor = conn.cursor()
+    client = HTTPXClient()
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub_app))
+    fetcher = FDAFetcher(client, "http://stub/device/event.json", page_size=100)
+    return SyncWorker(
+        fetcher,
+        DeviceEventLoader(connector, batch_size=200),
+        window_days=30,
+        initial_start=date(2024, 1, 1),
+    )
+
+
+def query(conn, sql, *params):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    conn.commit()
+    return rows
+
+
+def test_schema_adds_synced_on_to_existing_watermarks(conn):
+    with conn.cursor() as cursor:
+        # The table as created before runs were recorded
+        cursor.execute("""
+            CREATE TABLE sync_watermarks (
+                product_code TEXT PRIMARY KEY,
+                high_water   DATE NOT NULL,
+                updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            INSERT INTO sync_watermarks VALUES ('FKX', '2024-02-01', now());
+            """)
+    conn.commit()
+    worker = make_worker(conn, create_stub_app(records_per_code=10))
+    worker.ensure_schema()
+    worker.ensure_schema()
+
+    assert worker.get_watermark("FKX") == (date(2024, 2, 1), None)
+    worker.set_watermark("FKX", date(2024, 1, 15), date(2024, 3, 1))
+    # The high-water mark never moves back
+    assert worker.get_watermark("FKX") == (date(2024, 2, 1), date(2024, 3, 1))
+    worker.set_watermark("FKX", date(2024, 2, 10))
+    assert worker.get_watermark("FKX") == (date(2024, 2, 10), date(2024, 3, 1))
+
+
+def test_incremental_sync_loads_new_and_changed_reports(conn):
+    stub_app = create_stub_app(records_per_code=500, days=90, narrative_length=50)
+    worker = make_worker(conn, stub_app)
+    worker.ensure_schema()
+
+    first = asyncio.run(worker.sync("FKX", today=date(2024, 2, 15)))
+    count, latest = query(
+        conn, "SELECT count(*), max(date_received) FROM device_events"
+    )[0]
+    assert first == count > 0
+    assert latest <= date(2024, 2, 15)
+    assert worker.get_watermark("FKX") == (latest, date(2024, 2, 15))
+
+    # openFDA amends an old report after the first run
+    records = stub_app.state.dataset.records("FKX")
+    amended = records[0]
+    amended["event_type"] = "Death"
+    amended["date_changed"] = "20240301"
+    requests = stub_app.state.stats["requests"]
+
+    second = asyncio.run(worker.sync("FKX", today=date(2024, 4, 30)))
+    assert query(conn, "SELECT count(*) FROM device_events")[0][0] == 500
+    assert (
+        query(
+            conn,
+            "SELECT raw->>'event_type' FROM device_events WHERE mdr_report_key = %s",
+            amended["mdr_report_key"],
+        )[0][0]
+        == "Death"
+    )
+    # New reports plus the amended one, without re-pulling the first run
+    assert second == 500 - count + 1
+    assert stub_app.state.stats["requests"] - requests < 10
+    high_water, synced_on = worker.get_watermark("FKX")
+    assert synced_on == date(2024, 4, 30)
+
+    # Nothing changed since: nothing is upserted
+    assert asyncio.run(worker.sync("FKX", today=date(2024, 5, 1))) == 0
+    assert worker.get_watermark("FKX") == (high_water, date(2024, 5, 1))